@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlmodel import Session, select
+
+from app.core.Auth import decode_access_token
+from app.models.Goal import Usuario
+
+
+V = TypeVar("V")
+
+
+def ObtenerTTLCacheAuth() -> float:
+    """Segundos que vive una entrada (MYPLANU_CACHE_AUTH_TTL); 0 desactiva la cache."""
+    try:
+        return max(0.0, float(os.getenv("MYPLANU_CACHE_AUTH_TTL", "60")))
+    except Exception:
+        return 60.0
+
+
+def ObtenerMaximoCacheAuth() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_CACHE_AUTH_MAX", "10000")))
+    except Exception:
+        return 10000
+
+
+class CacheTTL(Generic[V]):
+    """LRU acotada con expiracion por entrada; segura entre hilos del mismo proceso."""
+
+    def __init__(self, MaxEntradas: int, TTL: float) -> None:
+        self.MaxEntradas = MaxEntradas
+        self.TTL = TTL
+        self._Datos: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._Candado = threading.Lock()
+
+    def Obtener(self, Clave: Hashable) -> Optional[V]:
+        with self._Candado:
+            entrada = self._Datos.get(Clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence <= time.monotonic():
+                del self._Datos[Clave]
+                return None
+            self._Datos.move_to_end(Clave)
+            return valor
+
+    def Poner(self, Clave: Hashable, Valor: V, TTL: Optional[float] = None) -> None:
+        ttl = self.TTL if TTL is None else min(TTL, self.TTL)
+        if ttl <= 0:
+            return
+        with self._Candado:
+            self._Datos[Clave] = (time.monotonic() + ttl, Valor)
+            self._Datos.move_to_end(Clave)
+            while len(self._Datos) > self.MaxEntradas:
+                self._Datos.popitem(last=False)
+
+    def Invalidar(self, Clave: Hashable) -> None:
+        with self._Candado:
+            self._Datos.pop(Clave, None)
+
+    def Limpiar(self) -> None:
+        with self._Candado:
+            self._Datos.clear()
+
+
+@dataclass(frozen=True)
+class UsuarioSesion:
+    """Datos minimos del usuario autenticado que usan las vistas."""
+
+    Id: int
+    ZonaHoraria: Optional[str]
+    EliminadoEn: Optional[datetime]
+
+
+_Tokens: CacheTTL[Dict[str, Any]] = CacheTTL(ObtenerMaximoCacheAuth(), ObtenerTTLCacheAuth())
+_Usuarios: CacheTTL[UsuarioSesion] = CacheTTL(ObtenerMaximoCacheAuth(), ObtenerTTLCacheAuth())
+
+
+def DecodificarTokenCacheado(Token: str) -> Optional[Dict[str, Any]]:
+    """Claims verificados del JWT; la firma solo se valida la primera vez que se ve el token."""
+    claims = _Tokens.Obtener(Token)
+    if claims is not None:
+        return claims
+    claims = decode_access_token(Token)
+    if claims is None:
+        return None
+    restante = _Tokens.TTL
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        # Nunca mantener un token en cache mas alla de su expiracion
+        restante = exp - time.time()
+    _Tokens.Poner(Token, claims, TTL=restante)
+    return claims
+
+
+def ObtenerUsuarioSesion(SesionBD: Session, UsuarioId: int) -> Optional[UsuarioSesion]:
+    usuario = _Usuarios.Obtener(UsuarioId)
+    if usuario is not None:
+        return usuario
+    fila = SesionBD.exec(
+        select(Usuario.Id, Usuario.ZonaHoraria, Usuario.EliminadoEn).where(Usuario.Id == UsuarioId)
+    ).first()
+    if fila is None:
+        return None
+    usuario = UsuarioSesion(Id=fila[0], ZonaHoraria=fila[1], EliminadoEn=fila[2])
+    _Usuarios.Poner(UsuarioId, usuario)
+    return usuario
+
+
+def InvalidarUsuario(UsuarioId: Optional[int]) -> None:
+    if UsuarioId is not None:
+        _Usuarios.Invalidar(UsuarioId)
+
+
+def LimpiarCacheAuth() -> None:
+    _Tokens.Limpiar()
+    _Usuarios.Limpiar()
@@ -0,0 +1,80 @@
+import os
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.CacheAuth import CacheTTL
+
+
+# Roles derivados de ParticipanteEvento, por evento o por meta. La propiedad
+# (PropietarioId) y el borrado logico se leen de la entidad en cada consulta,
+# asi que solo los cambios de participantes invalidan estas entradas.
+ClaveRoles = Tuple[str, int]
+_CLAVE_SESION = "RolesParticipante"
+
+
+def ObtenerTTLCachePermisos() -> float:
+    """Segundos que vive una entrada (MYPLANU_CACHE_PERMISOS_TTL); 0 deja solo la memo por peticion."""
+    try:
+        return max(0.0, float(os.getenv("MYPLANU_CACHE_PERMISOS_TTL", "30")))
+    except Exception:
+        return 30.0
+
+
+def ObtenerMaximoCachePermisos() -> int:
+    """Eventos/metas cuyos roles se recuerdan entre peticiones (MYPLANU_CACHE_PERMISOS_MAX)."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_CACHE_PERMISOS_MAX", "10000")))
+    except Exception:
+        return 10000
+
+
+# (Tipo, Id) -> {UsuarioId: Rol o None}
+_Roles: CacheTTL[Dict[int, Optional[str]]] = CacheTTL(ObtenerMaximoCachePermisos(), ObtenerTTLCachePermisos())
+
+
+def _MemoSesion(SesionBD: Session) -> Dict[Tuple[str, int, int], Optional[str]]:
+    return SesionBD.info.setdefault(_CLAVE_SESION, {})
+
+
+def RolCacheado(
+    SesionBD: Session,
+    Clave: ClaveRoles,
+    UsuarioId: int,
+    Calcular: Callable[[], Optional[str]],
+) -> Optional[str]:
+    """Rol de participante memorizado en la sesion y, entre peticiones, en una LRU con TTL.
+
+    La tabla del evento/meta se registra en la cache antes de consultar la
+    base: si un cambio la invalida mientras tanto, el resultado se escribe en
+    una tabla ya descartada y nunca se sirve desactualizado.
+    """
+    memo = _MemoSesion(SesionBD)
+    clave_sesion = (Clave[0], Clave[1], UsuarioId)
+    if clave_sesion in memo:
+        return memo[clave_sesion]
+    tabla = _Roles.Obtener(Clave)
+    if tabla is None:
+        tabla = {}
+        _Roles.Poner(Clave, tabla)
+    if UsuarioId in tabla:
+        rol = tabla[UsuarioId]
+    else:
+        rol = Calcular()
+        tabla[UsuarioId] = rol
+    memo[clave_sesion] = rol
+    return rol
+
+
+def InvalidarRolesSesion(SesionBD: Session) -> None:
+    """Descarta la memo de la peticion (la propia sesion ya ve sus cambios)."""
+    SesionBD.info.pop(_CLAVE_SESION, None)
+
+
+def InvalidarRoles(Claves: Iterable[ClaveRoles]) -> None:
+    for clave in Claves:
+        _Roles.Invalidar(clave)
+
+
+def LimpiarCachePermisos() -> None:
+    _Roles.Limpiar()
@@ -0,0 +1,270 @@
+import os
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import PlainTextResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None  # type: ignore
+
+
+Mensaje = Dict[str, Any]
+Enviar = Callable[[Mensaje], Awaitable[None]]
+Recibir = Callable[[], Awaitable[Mensaje]]
+
+# Rutas cuyo cuerpo de peticion puede llegar comprimido (lotes de la cola offline)
+PREFIJOS_CUERPO_COMPRIMIDO = ("/sync/",)
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+# SSE se transmite evento a evento; comprimirlo retrasaria cada mensaje
+TIPOS_EXCLUIDOS = ("text/event-stream",)
+
+
+def CompresionHabilitada() -> bool:
+    return os.getenv("MYPLANU_COMPRESION", "").strip().lower() not in {"0", "no", "ninguna", "false"}
+
+
+def ObtenerMinimoCompresion() -> int:
+    """Bytes a partir de los cuales se comprime una respuesta (MYPLANU_COMPRESION_MINIMO)."""
+    try:
+        return max(0, int(os.getenv("MYPLANU_COMPRESION_MINIMO", "1024")))
+    except Exception:
+        return 1024
+
+
+def ObtenerNivelGzip() -> int:
+    try:
+        return min(9, max(1, int(os.getenv("MYPLANU_COMPRESION_NIVEL_GZIP", "6"))))
+    except Exception:
+        return 6
+
+
+def ObtenerNivelBrotli() -> int:
+    try:
+        return min(11, max(0, int(os.getenv("MYPLANU_COMPRESION_NIVEL_BROTLI", "5"))))
+    except Exception:
+        return 5
+
+
+def ObtenerMaximoCuerpo() -> int:
+    """Tamano maximo de un cuerpo de peticion ya descomprimido (MYPLANU_SYNC_CUERPO_MAX)."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_SYNC_CUERPO_MAX", str(16 * 1024 * 1024))))
+    except Exception:
+        return 16 * 1024 * 1024
+
+
+def ElegirCodificacion(AcceptEncoding: str) -> Optional[str]:
+    """'br' o 'gzip' segun Accept-Encoding (mayor q; a igual q se prefiere br)."""
+    pesos: Dict[str, float] = {}
+    for parte in AcceptEncoding.split(","):
+        token, _, parametros = parte.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        pesos[token] = q
+    comodin = pesos.get("*", 0.0)
+    candidatos: List[Tuple[float, int, str]] = []
+    if brotli is not None:
+        candidatos.append((pesos.get("br", comodin), 1, "br"))
+    candidatos.append((pesos.get("gzip", comodin), 0, "gzip"))
+    q, _, codificacion = max(candidatos)
+    return codificacion if q > 0 else None
+
+
+class _Compresor:
+    def __init__(self, Codificacion: str) -> None:
+        self.Codificacion = Codificacion
+        if Codificacion == "br":
+            self._Brotli = brotli.Compressor(quality=ObtenerNivelBrotli())
+        else:
+            self._Zlib = zlib.compressobj(ObtenerNivelGzip(), zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def Parte(self, Datos: bytes) -> bytes:
+        # Vaciado parcial: cada fragmento de un stream (NDJSON) llega al cliente sin esperar al final
+        if self.Codificacion == "br":
+            return self._Brotli.process(Datos) + self._Brotli.flush()
+        return self._Zlib.compress(Datos) + self._Zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def Final(self, Datos: bytes) -> bytes:
+        if self.Codificacion == "br":
+            return self._Brotli.process(Datos) + self._Brotli.finish()
+        return self._Zlib.compress(Datos) + self._Zlib.flush()
+
+
+_BLOQUE_BROTLI = 64 * 1024
+
+
+def _DescomprimirBrotli(Datos: bytes, Maximo: int) -> bytes:
+    """Descomprime por bloques acotados y corta en cuanto la salida supera Maximo."""
+    descompresor = brotli.Decompressor()
+    salida = bytearray()
+    if hasattr(descompresor, "can_accept_more_data"):
+        # brotli >= 1.1: la salida de cada llamada se limita con output_buffer_limit
+        salida += descompresor.process(Datos, output_buffer_limit=min(Maximo + 1, _BLOQUE_BROTLI))
+        while len(salida) <= Maximo and not descompresor.is_finished():
+            parte = descompresor.process(b"", output_buffer_limit=min(Maximo + 1 - len(salida), _BLOQUE_BROTLI))
+            if not parte:
+                break
+            salida += parte
+    else:
+        # Versiones antiguas: se alimenta la entrada en trozos pequenos
+        for inicio in range(0, len(Datos), 1024):
+            salida += descompresor.process(Datos[inicio : inicio + 1024])
+            if len(salida) > Maximo:
+                break
+    if len(salida) > Maximo:
+        raise OverflowError()
+    if not descompresor.is_finished():
+        raise ValueError("Cuerpo comprimido incompleto")
+    return bytes(salida)
+
+
+def _Descomprimir(Datos: bytes, Codificacion: str, Maximo: int) -> bytes:
+    """Descomprime sin superar Maximo bytes; ValueError si los datos son invalidos o exceden."""
+    if Codificacion == "br":
+        if brotli is None:
+            raise LookupError(Codificacion)
+        try:
+            return _DescomprimirBrotli(Datos, Maximo)
+        except brotli.error as exc:
+            raise ValueError("Cuerpo comprimido invalido") from exc
+    if Codificacion in ("gzip", "x-gzip"):
+        descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif Codificacion == "deflate":
+        descompresor = zlib.decompressobj()
+    else:
+        raise LookupError(Codificacion)
+    try:
+        salida = descompresor.decompress(Datos, Maximo + 1)
+    except zlib.error as exc:
+        raise ValueError("Cuerpo comprimido invalido") from exc
+    if len(salida) > Maximo or descompresor.unconsumed_tail:
+        raise OverflowError()
+    return salida
+
+
+class MiddlewareCompresion:
+    """Comprime respuestas (br/gzip) por encima de un umbral y acepta cuerpos comprimidos en /sync/*."""
+
+    def __init__(self, app: Any, Minimo: Optional[int] = None) -> None:
+        self.app = app
+        self.Minimo = ObtenerMinimoCompresion() if Minimo is None else Minimo
+
+    async def __call__(self, scope: Dict[str, Any], receive: Recibir, send: Enviar) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cabeceras = Headers(scope=scope)
+        codificacion_cuerpo = cabeceras.get("content-encoding", "").strip().lower()
+        if codificacion_cuerpo and codificacion_cuerpo != "identity" and scope["path"].startswith(PREFIJOS_CUERPO_COMPRIMIDO):
+            error, scope, receive = await self._DescomprimirCuerpo(scope, receive, codificacion_cuerpo)
+            if error is not None:
+                await error(scope, receive, send)
+                return
+        codificacion = ElegirCodificacion(cabeceras.get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+        await _RespondedorComprimido(self.app, codificacion, self.Minimo)(scope, receive, send)
+
+    async def _DescomprimirCuerpo(
+        self, scope: Dict[str, Any], receive: Recibir, Codificacion: str
+    ) -> Tuple[Optional[PlainTextResponse], Dict[str, Any], Recibir]:
+        maximo = ObtenerMaximoCuerpo()
+        partes: List[bytes] = []
+        leidos = 0
+        while True:
+            mensaje = await receive()
+            if mensaje["type"] != "http.request":
+                # Desconexion antes de terminar el cuerpo: la aplicacion la vera al leer
+                return None, scope, receive
+            parte = mensaje.get("body", b"")
+            leidos += len(parte)
+            if leidos > maximo:
+                return PlainTextResponse("Cuerpo demasiado grande", status_code=413), scope, receive
+            partes.append(parte)
+            if not mensaje.get("more_body", False):
+                break
+        try:
+            cuerpo = _Descomprimir(b"".join(partes), Codificacion, maximo)
+        except LookupError:
+            return PlainTextResponse("Content-Encoding no soportado", status_code=415), scope, receive
+        except OverflowError:
+            return PlainTextResponse("Cuerpo demasiado grande", status_code=413), scope, receive
+        except ValueError:
+            return PlainTextResponse("Cuerpo comprimido invalido", status_code=400), scope, receive
+        crudas = [
+            (clave, valor)
+            for clave, valor in scope["headers"]
+            if clave.lower() not in (b"content-encoding", b"content-length")
+        ]
+        crudas.append((b"content-length", str(len(cuerpo)).encode("latin-1")))
+        entregado = False
+
+        async def RecibirDescomprimido() -> Mensaje:
+            nonlocal entregado
+            if not entregado:
+                entregado = True
+                return {"type": "http.request", "body": cuerpo, "more_body": False}
+            return await receive()
+
+        return None, {**scope, "headers": crudas}, RecibirDescomprimido
+
+
+class _RespondedorComprimido:
+    def __init__(self, app: Any, Codificacion: str, Minimo: int) -> None:
+        self.app = app
+        self.Codificacion = Codificacion
+        self.Minimo = Minimo
+        self._Enviar: Optional[Enviar] = None
+        self._Inicio: Optional[Mensaje] = None
+        self._Compresor: Optional[_Compresor] = None
+        self._Decidido = False
+
+    async def __call__(self, scope: Dict[str, Any], receive: Recibir, send: Enviar) -> None:
+        self._Enviar = send
+        await self.app(scope, receive, self._Interceptar)
+
+    def _EsComprimible(self, Cabeceras: MutableHeaders) -> bool:
+        if self._Inicio is None or self._Inicio["status"] in (204, 304) or "content-encoding" in Cabeceras:
+            return False
+        tipo = Cabeceras.get("content-type", "").lower()
+        return tipo.startswith(TIPOS_COMPRIMIBLES) and not tipo.startswith(TIPOS_EXCLUIDOS)
+
+    async def _Interceptar(self, Mensaje_: Mensaje) -> None:
+        assert self._Enviar is not None
+        if Mensaje_["type"] == "http.response.start":
+            # Se retiene hasta ver el primer fragmento del cuerpo (tamano y si hay mas)
+            self._Inicio = Mensaje_
+            return
+        if Mensaje_["type"] != "http.response.body":
+            await self._Enviar(Mensaje_)
+            return
+        cuerpo = Mensaje_.get("body", b"")
+        mas = Mensaje_.get("more_body", False)
+        if not self._Decidido:
+            self._Decidido = True
+            assert self._Inicio is not None
+            cabeceras = MutableHeaders(raw=self._Inicio["headers"])
+            if self._EsComprimible(cabeceras):
+                cabeceras.add_vary_header("Accept-Encoding")
+                if mas or len(cuerpo) >= self.Minimo:
+                    self._Compresor = _Compresor(self.Codificacion)
+                    cabeceras["Content-Encoding"] = self.Codificacion
+                    del cabeceras["Content-Length"]
+            await self._Enviar(self._Inicio)
+        if self._Compresor is None:
+            await self._Enviar(Mensaje_)
+            return
+        datos = self._Compresor.Parte(cuerpo) if mas else self._Compresor.Final(cuerpo)
+        await self._Enviar({"type": "http.response.body", "body": datos, "more_body": mas})
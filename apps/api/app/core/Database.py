@@ -1,85 +1,203 @@
-from typing import Generator
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generator, Iterator, List
 
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy import event, select, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, create_engine
 
 
-URLBaseDatos = "sqlite:///./datos.db"
-Motor = create_engine(URLBaseDatos, echo=False, connect_args={"check_same_thread": False})
+def _EnteroEntorno(Nombre: str, PorDefecto: int) -> int:
+    try:
+        return int(os.getenv(Nombre, str(PorDefecto)))
+    except Exception:
+        return PorDefecto
+
+
+def ObtenerURLBaseDatos() -> str:
+    return os.getenv("MYPLANU_DB_URL", "sqlite:///./datos.db")
+
+
+def _EsSQLiteEnMemoria(URL: str) -> bool:
+    return URL.startswith("sqlite") and (URL in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in URL)
+
+
+def _ArgumentosMotor(URL: str) -> Dict[str, Any]:
+    """Opciones de create_engine segun el entorno (MYPLANU_DB_POOL_*)."""
+    argumentos: Dict[str, Any] = {"echo": False, "pool_pre_ping": not URL.startswith("sqlite")}
+    if URL.startswith("sqlite"):
+        argumentos["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": _EnteroEntorno("MYPLANU_SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000.0,
+        }
+        if _EsSQLiteEnMemoria(URL):
+            # SQLite en memoria usa StaticPool/SingletonThreadPool; no acepta opciones de pool
+            return argumentos
+    argumentos["pool_size"] = max(1, _EnteroEntorno("MYPLANU_DB_POOL_SIZE", 10))
+    argumentos["max_overflow"] = max(0, _EnteroEntorno("MYPLANU_DB_POOL_MAX_OVERFLOW", 20))
+    argumentos["pool_timeout"] = max(1, _EnteroEntorno("MYPLANU_DB_POOL_TIMEOUT", 30))
+    return argumentos
+
+
+def _PragmasSQLite() -> Dict[str, Any]:
+    """Perfil para SQLite con lectores concurrentes (MYPLANU_SQLITE_PERFIL=ninguno lo desactiva)."""
+    if os.getenv("MYPLANU_SQLITE_PERFIL", "wal").strip().lower() in {"ninguno", "none", "0"}:
+        return {}
+    return {
+        "journal_mode": "WAL",  # lectores no se bloquean detras del escritor
+        "synchronous": "NORMAL",  # con WAL solo arriesga la ultima transaccion ante corte de energia
+        "cache_size": -_EnteroEntorno("MYPLANU_SQLITE_CACHE_KB", 20000),  # negativo = KiB
+        "mmap_size": _EnteroEntorno("MYPLANU_SQLITE_MMAP_BYTES", 268435456),
+        "busy_timeout": _EnteroEntorno("MYPLANU_SQLITE_BUSY_TIMEOUT_MS", 5000),
+    }
+
+
+def CrearMotor(URL: str) -> Engine:
+    motor = create_engine(URL, **_ArgumentosMotor(URL))
+    if URL.startswith("sqlite"):
+        pragmas = _PragmasSQLite()
+        if _EsSQLiteEnMemoria(URL):
+            pragmas.pop("journal_mode", None)
+            pragmas.pop("mmap_size", None)
+
+        @event.listens_for(motor, "connect")
+        def _AplicarPragmas(ConexionDBAPI, _Registro):  # noqa: ANN001
+            # pysqlite abre transacciones por su cuenta y rompe SAVEPOINT; las maneja SQLAlchemy (evento begin)
+            ConexionDBAPI.isolation_level = None
+            cursor = ConexionDBAPI.cursor()
+            try:
+                for nombre, valor in pragmas.items():
+                    cursor.execute(f"PRAGMA {nombre}={valor}")
+            finally:
+                cursor.close()
+
+        @event.listens_for(motor, "begin")
+        def _Iniciar(Conexion):  # noqa: ANN001
+            Conexion.exec_driver_sql("BEGIN")
+
+    return motor
+
+
+URLBaseDatos = ObtenerURLBaseDatos()
+Motor = CrearMotor(URLBaseDatos)
 
 
 def ObtenerEngine():
     return Motor
 
 
+_TablasIniciadas = False
+
+
 def IniciarTablas() -> None:
+    """Aplica las migraciones pendientes una vez por proceso (ver app.core.Migraciones)."""
+    global _TablasIniciadas
+    if _TablasIniciadas:
+        return
     # Importar modelos para registrar metadata antes de crear tablas
     from app.models import Goal  # noqa: F401  # Usuario, Meta
     from app.models.Evento import Evento, Recordatorio, ParticipanteEvento  # noqa: F401
     from app.models.Bitacora import BitacoraRecuperacion  # noqa: F401
-    from app.models.Notificacion import NotificacionSistema  # noqa: F401
-    SQLModel.metadata.create_all(Motor)
-    # Migracion simple para agregar columna 'Mensaje' en 'recordatorio' si no existe (SQLite)
+    from app.models.Notificacion import NotificacionSistema, ConteoNotificaciones  # noqa: F401
+    from app.models.Ocurrencia import Ocurrencia, HorizonteOcurrencias  # noqa: F401
+    from app.models.CambioSync import CambioSync  # noqa: F401
+    from app.models.Salida import MensajeSalida  # noqa: F401
+    from app.core.Migraciones import AplicarMigraciones
+
+    AplicarMigraciones(Motor)
+    _TablasIniciadas = True
+
+
+_CLAVE_UNIDAD = "UnidadDeTrabajo"
+
+
+def EnUnidadDeTrabajo(SesionBD: Session) -> bool:
+    return bool(SesionBD.info.get(_CLAVE_UNIDAD))
+
+
+def Confirmar(SesionBD: Session, *Entidades: Any) -> None:
+    """Confirma la escritura de un servicio.
+
+    Fuera de una unidad de trabajo hace commit y refresca las entidades.
+    Dentro solo hace flush (asigna Ids y valida restricciones); el commit
+    unico lo hace quien abrio la unidad.
+    """
+    if EnUnidadDeTrabajo(SesionBD):
+        SesionBD.flush()
+        return
+    SesionBD.commit()
+    for entidad in Entidades:
+        SesionBD.refresh(entidad)
+
+
+@contextmanager
+def UnidadDeTrabajo(SesionBD: Session) -> Iterator[Session]:
+    """Agrupa varias escrituras de servicios en una sola transaccion con un commit al final."""
+    if EnUnidadDeTrabajo(SesionBD):
+        # Anidada: la unidad externa decide el commit
+        yield SesionBD
+        return
+    SesionBD.info[_CLAVE_UNIDAD] = True
     try:
-        with Motor.connect() as conn:  # type: ignore[attr-defined]
-            # Usuario.ZonaHoraria
-            res_u = conn.exec_driver_sql("PRAGMA table_info('usuario')").fetchall()
-            cols_u = {row[1] for row in res_u} if res_u else set()
-            if 'ZonaHoraria' not in cols_u:
-                conn.exec_driver_sql("ALTER TABLE usuario ADD COLUMN ZonaHoraria VARCHAR NULL")
-            # Usuario.ContrasenaHash
-            if 'ContrasenaHash' not in cols_u:
-                conn.exec_driver_sql("ALTER TABLE usuario ADD COLUMN ContrasenaHash VARCHAR NULL DEFAULT ''")
-            res = conn.exec_driver_sql("PRAGMA table_info('recordatorio')").fetchall()
-            columnas = {row[1] for row in res} if res else set()
-            if 'Mensaje' not in columnas:
-                conn.exec_driver_sql("ALTER TABLE recordatorio ADD COLUMN Mensaje VARCHAR NULL")
-            # Repeticion en recordatorio
-            if 'FrecuenciaRepeticion' not in columnas:
-                conn.exec_driver_sql("ALTER TABLE recordatorio ADD COLUMN FrecuenciaRepeticion VARCHAR NULL")
-            if 'IntervaloRepeticion' not in columnas:
-                conn.exec_driver_sql("ALTER TABLE recordatorio ADD COLUMN IntervaloRepeticion INTEGER NULL")
-            if 'DiasSemana' not in columnas:
-                conn.exec_driver_sql("ALTER TABLE recordatorio ADD COLUMN DiasSemana VARCHAR NULL")
-            # Repeticion en evento
-            res_e = conn.exec_driver_sql("PRAGMA table_info('evento')").fetchall()
-            cols_e = {row[1] for row in res_e} if res_e else set()
-            if 'FrecuenciaRepeticion' not in cols_e:
-                conn.exec_driver_sql("ALTER TABLE evento ADD COLUMN FrecuenciaRepeticion VARCHAR NULL")
-            if 'IntervaloRepeticion' not in cols_e:
-                conn.exec_driver_sql("ALTER TABLE evento ADD COLUMN IntervaloRepeticion INTEGER NULL")
-            if 'DiasSemana' not in cols_e:
-                conn.exec_driver_sql("ALTER TABLE evento ADD COLUMN DiasSemana VARCHAR NULL")
-            # BitacoraRecuperacion table columns (no-op if table exists)
-            conn.exec_driver_sql(
-                "CREATE TABLE IF NOT EXISTS bitacorarecuperacion ("
-                "Id INTEGER PRIMARY KEY AUTOINCREMENT,"
-                "TipoEntidad VARCHAR NOT NULL,"
-                "EntidadId INTEGER NOT NULL,"
-                "UsuarioId INTEGER NULL,"
-                "Detalle VARCHAR NULL,"
-                "RegistradoEn DATETIME NOT NULL,"
-                "FOREIGN KEY(UsuarioId) REFERENCES usuario(Id)"
-                ")"
-            )
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_bitacora_tipo ON bitacorarecuperacion(TipoEntidad)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_bitacora_usuario ON bitacorarecuperacion(UsuarioId)")
-            conn.exec_driver_sql(
-                "CREATE TABLE IF NOT EXISTS notificacionsistema ("
-                "Id INTEGER PRIMARY KEY AUTOINCREMENT,"
-                "UsuarioId INTEGER NOT NULL,"
-                "Tipo VARCHAR NOT NULL,"
-                "ReferenciaId INTEGER NOT NULL,"
-                "Mensaje VARCHAR NOT NULL,"
-                "CreadoEn DATETIME NOT NULL,"
-                "LeidaEn DATETIME NULL,"
-                "FOREIGN KEY(UsuarioId) REFERENCES usuario(Id)"
-                ")"
+        yield SesionBD
+        SesionBD.commit()
+    except BaseException:
+        SesionBD.rollback()
+        raise
+    finally:
+        SesionBD.info.pop(_CLAVE_UNIDAD, None)
+
+
+def ActualizarDevolviendoIds(SesionBD: Session, Modelo: Any, Condicion: Any, **Valores: Any) -> List[int]:
+    """UPDATE masivo (una sentencia) que devuelve los Id de las filas tocadas.
+
+    Usa UPDATE ... RETURNING cuando el motor lo soporta (SQLite >= 3.35,
+    PostgreSQL); si no, lee los Id primero y actualiza por Id.
+    """
+    if SesionBD.get_bind().dialect.update_returning:
+        resultado = SesionBD.execute(
+            update(Modelo).where(Condicion).values(**Valores).returning(Modelo.Id),
+            execution_options={"synchronize_session": False},
+        )
+        ids = list(resultado.scalars())
+    else:
+        ids = list(SesionBD.execute(select(Modelo.Id).where(Condicion)).scalars())
+        if ids:
+            SesionBD.execute(
+                update(Modelo).where(Modelo.Id.in_(ids)).values(**Valores),
+                execution_options={"synchronize_session": False},
             )
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_notifs_usuario ON notificacionsistema(UsuarioId)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS idx_notifs_tipo ON notificacionsistema(Tipo)")
-    except Exception:
-        # Fallback silencioso; en entornos limpios la tabla se crea con la columna
-        pass
+    # Las entidades ya cargadas en la sesion deben releerse
+    for entidad in list(SesionBD.identity_map.values()):
+        if isinstance(entidad, Modelo) and getattr(entidad, "Id", None) in ids:
+            SesionBD.expire(entidad)
+    return ids
+
+
+_CLAVE_AL_CONFIRMAR = "AlConfirmar"
+
+
+def AlConfirmar(SesionBD: Session, Funcion: Callable[[], None]) -> None:
+    """Ejecuta Funcion despues del COMMIT de la transaccion actual; se descarta si hay rollback."""
+    SesionBD.info.setdefault(_CLAVE_AL_CONFIRMAR, []).append(Funcion)
+
+
+@event.listens_for(Session, "after_commit")
+def _EjecutarAlConfirmar(SesionBD: Session) -> None:
+    pendientes = SesionBD.info.pop(_CLAVE_AL_CONFIRMAR, None) or []
+    for funcion in pendientes:
+        try:
+            funcion()
+        except Exception:
+            logging.getLogger(__name__).exception("Fallo un callback AlConfirmar")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _DescartarAlConfirmar(SesionBD: Session, _Transaccion: Any) -> None:
+    # El rollback de un SAVEPOINT deja viva la transaccion externa y sus callbacks
+    if not SesionBD.in_transaction():
+        SesionBD.info.pop(_CLAVE_AL_CONFIRMAR, None)
 
 
 def ObtenerSesion() -> Generator[Session, None, None]:
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import time
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+
+def ObtenerVentanaETag() -> int:
+    """Segundos durante los que un listado relativo a 'ahora' conserva su ETag."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_ETAG_VENTANA_SEGUNDOS", "60")))
+    except Exception:
+        return 60
+
+
+def VentanaActual() -> int:
+    return int(time.time() // ObtenerVentanaETag())
+
+
+def CalcularETag(Solicitud: Request, Version: Any, *Partes: Any) -> str:
+    """ETag debil de la ruta + query + version de datos + partes propias del endpoint.
+
+    Version suele ser el ultimo cursor del log de cambios: cualquier escritura
+    sobre metas, eventos, recordatorios o participantes lo avanza.
+    """
+    clave = repr((Solicitud.url.path, sorted(Solicitud.query_params.multi_items()), Version, Partes))
+    return 'W/"%s"' % hashlib.sha1(clave.encode("utf-8")).hexdigest()[:24]
+
+
+def _Coincide(Cabecera: str, ETag: str) -> bool:
+    if Cabecera.strip() == "*":
+        return True
+    # Comparacion debil (RFC 9110): se ignora el prefijo W/
+    propio = ETag[2:] if ETag.startswith("W/") else ETag
+    for candidato in Cabecera.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == propio:
+            return True
+    return False
+
+
+def _Cabeceras(ETag: str) -> dict:
+    # El cliente puede guardar la respuesta pero debe revalidarla siempre
+    return {"ETag": ETag, "Cache-Control": "private, no-cache"}
+
+
+def RespuestaNoModificada(Solicitud: Request, ETag: str) -> Optional[Response]:
+    """304 si If-None-Match coincide con la ETag actual; None si hay que construir la respuesta."""
+    cabecera = Solicitud.headers.get("if-none-match")
+    if cabecera and _Coincide(cabecera, ETag):
+        return Response(status_code=304, headers=_Cabeceras(ETag))
+    return None
+
+
+def ConETag(Respuesta: Response, ETag: str) -> Response:
+    Respuesta.headers.update(_Cabeceras(ETag))
+    return Respuesta
@@ -0,0 +1,42 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None  # type: ignore
+
+
+def _ValorJSON(Valor: Any) -> Any:
+    if isinstance(Valor, (datetime, date)):
+        return Valor.isoformat()
+    if isinstance(Valor, Enum):
+        return Valor.value
+    return str(Valor)
+
+
+def DumpsJSON(Valor: Any) -> bytes:
+    """JSON en bytes con orjson si esta instalado; si no, con json de la stdlib.
+
+    Ambos caminos producen la misma salida para los dicts que arman las vistas
+    (str, int, bool, None, listas y datetimes naive en ISO 8601).
+    """
+    if orjson is not None:
+        return orjson.dumps(Valor, default=_ValorJSON)
+    return json.dumps(Valor, default=_ValorJSON, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespuestaJSONRapida(JSONResponse):
+    """Serializa el contenido tal cual, sin pasar por jsonable_encoder.
+
+    Pensada para listados cuyas filas ya son dicts planos; devolverla desde el
+    endpoint evita el recorrido generico de FastAPI sobre cada valor.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return DumpsJSON(content)
+
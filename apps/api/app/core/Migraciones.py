@@ -0,0 +1,175 @@
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, Table, bindparam, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+
+# Una sola fila con la ultima migracion aplicada
+TablaVersion = Table("schema_version", SQLModel.metadata, Column("version", Integer, nullable=False))
+
+
+def _Columnas(conn: Connection, Tabla: str) -> set:
+    return {col["name"] for col in inspect(conn).get_columns(Tabla)}
+
+
+def _AgregarColumnas(conn: Connection, Tabla: str, Columnas: List[Tuple[str, str]]) -> None:
+    existentes = _Columnas(conn, Tabla)
+    for nombre, definicion in Columnas:
+        if nombre not in existentes:
+            conn.exec_driver_sql(f"ALTER TABLE {Tabla} ADD COLUMN {nombre} {definicion}")
+
+
+def _CrearIndices(conn: Connection, Modelo: type, Nombres: List[str]) -> None:
+    for indice in Modelo.__table__.indexes:  # type: ignore[attr-defined]
+        if indice.name in Nombres:
+            indice.create(conn, checkfirst=True)
+
+
+def _CrearTablas(conn: Connection, *Modelos: type) -> None:
+    for modelo in Modelos:
+        modelo.__table__.create(conn, checkfirst=True)  # type: ignore[attr-defined]
+
+
+# ---- Pasos (nunca editar uno ya publicado; agregar uno nuevo al final) ----
+
+def _M001_ColumnasLegado(conn: Connection) -> None:
+    # Columnas agregadas antes de existir el versionado (ZonaHoraria, ContrasenaHash, Mensaje, repeticion)
+    _AgregarColumnas(conn, "usuario", [
+        ("ZonaHoraria", "VARCHAR NULL"),
+        ("ContrasenaHash", "VARCHAR NULL DEFAULT ''"),
+    ])
+    _AgregarColumnas(conn, "recordatorio", [
+        ("Mensaje", "VARCHAR NULL"),
+        ("FrecuenciaRepeticion", "VARCHAR NULL"),
+        ("IntervaloRepeticion", "INTEGER NULL"),
+        ("DiasSemana", "VARCHAR NULL"),
+    ])
+    _AgregarColumnas(conn, "evento", [
+        ("FrecuenciaRepeticion", "VARCHAR NULL"),
+        ("IntervaloRepeticion", "INTEGER NULL"),
+        ("DiasSemana", "VARCHAR NULL"),
+    ])
+
+
+def _M002_IndicesAgenda(conn: Connection) -> None:
+    from app.models.Evento import Evento, ParticipanteEvento
+
+    _CrearIndices(conn, Evento, ["idx_evento_eliminado_inicio_fin", "idx_evento_propietario"])
+    _CrearIndices(conn, ParticipanteEvento, ["idx_participante_usuario_evento"])
+
+
+def _M003_Ocurrencias(conn: Connection) -> None:
+    from app.models.Ocurrencia import Ocurrencia, HorizonteOcurrencias
+
+    _CrearTablas(conn, Ocurrencia, HorizonteOcurrencias)
+
+
+def _M004_CambiosSync(conn: Connection) -> None:
+    from app.models.CambioSync import CambioSync
+
+    _CrearTablas(conn, CambioSync)
+
+
+def _M005_ConteoNotificaciones(conn: Connection) -> None:
+    from app.models.Notificacion import ConteoNotificaciones
+
+    _CrearTablas(conn, ConteoNotificaciones)
+    # Backfill desde las notificaciones existentes
+    conn.exec_driver_sql("DELETE FROM conteonotificaciones")
+    conn.exec_driver_sql(
+        "INSERT INTO conteonotificaciones (UsuarioId, NoLeidas) "
+        "SELECT UsuarioId, COUNT(*) FROM notificacionsistema WHERE LeidaEn IS NULL GROUP BY UsuarioId"
+    )
+
+
+def _M006_IndiceRecordatoriosPendientes(conn: Connection) -> None:
+    from app.models.Evento import Recordatorio
+
+    _CrearIndices(conn, Recordatorio, ["idx_recordatorio_enviado_eliminado_fecha"])
+
+
+def _M007_BandejaSalida(conn: Connection) -> None:
+    from app.models.Salida import MensajeSalida
+
+    _CrearTablas(conn, MensajeSalida)
+
+
+def _M008_ProximaEjecucionRecordatorios(conn: Connection) -> None:
+    from datetime import datetime
+
+    from app.core.Recurrencia import ProximaEjecucion
+    from app.models.Evento import Recordatorio
+
+    _AgregarColumnas(conn, "recordatorio", [("ProximaEjecucion", "DATETIME NULL")])
+    _CrearIndices(conn, Recordatorio, ["idx_recordatorio_eliminado_proxima"])
+    # Backfill: siguiente disparo de los pendientes (los enviados quedan en NULL)
+    tabla = Recordatorio.__table__  # type: ignore[attr-defined]
+    ahora = datetime.utcnow()
+    filas = conn.execute(
+        select(
+            tabla.c.Id, tabla.c.FechaHora, tabla.c.FrecuenciaRepeticion, tabla.c.IntervaloRepeticion, tabla.c.DiasSemana
+        ).where(tabla.c.Enviado.is_(False))
+    ).all()
+    valores = [
+        {"b_id": rid, "b_proxima": ProximaEjecucion(fecha, frecuencia, intervalo, dias, ahora)}
+        for rid, fecha, frecuencia, intervalo, dias in filas
+    ]
+    if valores:
+        conn.execute(
+            update(tabla).where(tabla.c.Id == bindparam("b_id")).values(ProximaEjecucion=bindparam("b_proxima")),
+            valores,
+        )
+
+
+def _M009_ReclamoBandejaSalida(conn: Connection) -> None:
+    _AgregarColumnas(conn, "mensajesalida", [
+        ("Reclamado", "VARCHAR NULL"),
+        ("ReclamadoEn", "DATETIME NULL"),
+    ])
+
+
+def _M010_CambiosPorUsuario(conn: Connection) -> None:
+    _AgregarColumnas(conn, "cambiosync", [("UsuarioId", "INTEGER NULL")])
+
+
+MIGRACIONES: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Columnas de zona horaria, contrasena y repeticion", _M001_ColumnasLegado),
+    (2, "Indices de ventana y agenda de eventos", _M002_IndicesAgenda),
+    (3, "Tablas de ocurrencias materializadas", _M003_Ocurrencias),
+    (4, "Log de cambios para sincronizacion incremental", _M004_CambiosSync),
+    (5, "Contador de notificaciones no leidas", _M005_ConteoNotificaciones),
+    (6, "Indice de recordatorios pendientes para el despachador", _M006_IndiceRecordatoriosPendientes),
+    (7, "Bandeja de salida de notificaciones push", _M007_BandejaSalida),
+    (8, "Proxima ejecucion precalculada de recordatorios", _M008_ProximaEjecucionRecordatorios),
+    (9, "Reclamo de lotes en la bandeja de salida", _M009_ReclamoBandejaSalida),
+    (10, "Cambios de sincronizacion dirigidos a un usuario", _M010_CambiosPorUsuario),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+def LeerVersion(Motor: Engine) -> Optional[int]:
+    """Version aplicada o None si la base aun no tiene schema_version."""
+    try:
+        with Motor.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    except Exception:
+        return None
+
+
+def AplicarMigraciones(Motor: Engine) -> int:
+    """Lleva la base a VERSION_ACTUAL. Si ya esta al dia cuesta una sola consulta."""
+    version = LeerVersion(Motor)
+    if version is not None and version >= VERSION_ACTUAL:
+        return version
+    with Motor.begin() as conn:
+        # Base nueva: create_all deja el esquema completo; los pasos son idempotentes
+        SQLModel.metadata.create_all(conn)
+        actual = version or 0
+        for numero, _descripcion, paso in MIGRACIONES:
+            if numero > actual:
+                paso(conn)
+        conn.execute(TablaVersion.delete())
+        conn.execute(TablaVersion.insert().values(version=VERSION_ACTUAL))
+    return VERSION_ACTUAL
@@ -0,0 +1,112 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from app.core.Database import ObtenerEngine
+from app.core.JSONRapido import DumpsJSON, RespuestaJSONRapida
+
+
+T = TypeVar("T")
+
+CABECERA_CURSOR = "X-Siguiente-Cursor"
+TIPO_NDJSON = "application/x-ndjson"
+TAMANO_LOTE = 500
+
+
+def ObtenerLimiteMaximo() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_LIMITE_MAXIMO", "1000")))
+    except Exception:
+        return 1000
+
+
+def NormalizarLimite(Limite: Optional[int]) -> Optional[int]:
+    """None = sin paginar; en otro caso se acota a [1, MYPLANU_LIMITE_MAXIMO]."""
+    if Limite is None:
+        return None
+    return min(max(1, Limite), ObtenerLimiteMaximo())
+
+
+def _ValorJSON(Valor: Any) -> Any:
+    if isinstance(Valor, datetime):
+        return Valor.isoformat()
+    return str(Valor)
+
+
+def CodificarCursor(*Valores: Any) -> str:
+    """Cursor opaco (base64 urlsafe) con los valores de la clave keyset de la ultima fila."""
+    crudo = json.dumps(list(Valores), default=_ValorJSON, separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def DecodificarCursor(Cursor: Optional[str]) -> Optional[List[Any]]:
+    """Devuelve los valores del cursor o None; lanza ValueError si el cursor esta mal formado."""
+    if not Cursor:
+        return None
+    try:
+        relleno = "=" * (-len(Cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(Cursor + relleno).decode("utf-8"))
+    except Exception as exc:
+        raise ValueError("Cursor invalido") from exc
+    if not isinstance(valores, list) or not valores:
+        raise ValueError("Cursor invalido")
+    return valores
+
+
+def DecodificarCursorId(Cursor: Optional[str]) -> Optional[int]:
+    valores = DecodificarCursor(Cursor)
+    if valores is None:
+        return None
+    try:
+        return int(valores[0])
+    except Exception as exc:
+        raise ValueError("Cursor invalido") from exc
+
+
+def AplicarKeysetId(Consulta: Any, Columna: Any, DespuesDeId: Optional[int], Limite: Optional[int]) -> Any:
+    """Ordena por la columna Id y aplica 'Id > cursor' + LIMIT; con yield_per para iterar por lotes."""
+    if DespuesDeId is not None:
+        Consulta = Consulta.where(Columna > DespuesDeId)
+    Consulta = Consulta.order_by(Columna)
+    if Limite is not None:
+        Consulta = Consulta.limit(Limite)
+    return Consulta.execution_options(yield_per=TAMANO_LOTE)
+
+
+def CortarPagina(Filas: Sequence[T], Limite: Optional[int], Clave: Callable[[T], Tuple[Any, ...]]) -> Tuple[List[T], Optional[str]]:
+    """Recibe hasta Limite+1 filas; devuelve la pagina y el cursor siguiente si hay mas."""
+    if Limite is None or len(Filas) <= Limite:
+        return list(Filas), None
+    pagina = list(Filas[:Limite])
+    return pagina, CodificarCursor(*Clave(pagina[-1]))
+
+
+def EsFormatoNDJSON(Formato: Optional[str]) -> bool:
+    return (Formato or "").strip().lower() in {"ndjson", TIPO_NDJSON}
+
+
+def LineaNDJSON(Fila: Any) -> bytes:
+    return DumpsJSON(Fila) + b"\n"
+
+
+def IterarConSesionPropia(Consultar: Callable[[Session], Iterable[T]]) -> Iterator[T]:
+    """Itera una consulta con una sesion propia (la de la dependencia se cierra antes de transmitir)."""
+    with Session(ObtenerEngine()) as SesionBD:
+        yield from Consultar(SesionBD)
+
+
+def RespuestaNDJSON(Filas: Iterable[Any], SiguienteCursor: Optional[str] = None) -> StreamingResponse:
+    """Serializa cada fila al vuelo como una linea JSON."""
+    cabeceras = {CABECERA_CURSOR: SiguienteCursor} if SiguienteCursor else None
+    return StreamingResponse((LineaNDJSON(f) for f in Filas), media_type=TIPO_NDJSON, headers=cabeceras)
+
+
+def RespuestaJSON(Filas: List[Any], SiguienteCursor: Optional[str] = None) -> RespuestaJSONRapida:
+    """Listado ya preparado como dicts: se serializa directo, sin jsonable_encoder."""
+    cabeceras = {CABECERA_CURSOR: SiguienteCursor} if SiguienteCursor else None
+    return RespuestaJSONRapida(Filas, headers=cabeceras)
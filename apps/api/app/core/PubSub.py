@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from typing import Dict, Hashable, Iterable, Set
+
+
+class Suscripcion:
+    """Despertador de un suscriptor; vive en el event loop que lo creo."""
+
+    def __init__(self, Clave: Hashable) -> None:
+        self.Clave = Clave
+        self._Loop = asyncio.get_running_loop()
+        self._Evento = asyncio.Event()
+
+    def Avisar(self) -> None:
+        # Puede llamarse desde cualquier hilo (los endpoints sync corren en el threadpool)
+        self._Loop.call_soon_threadsafe(self._Evento.set)
+
+    def Limpiar(self) -> None:
+        self._Evento.clear()
+
+    async def Esperar(self, Timeout: float) -> bool:
+        """True si hubo aviso; False si vencio el timeout."""
+        try:
+            await asyncio.wait_for(self._Evento.wait(), timeout=Timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class BusSuscripciones:
+    """Pub/sub en proceso por clave (ej. UsuarioId).
+
+    Solo transporta avisos: el suscriptor vuelve a leer la BD, asi un aviso
+    perdido o duplicado nunca pierde ni repite datos.
+    """
+
+    def __init__(self) -> None:
+        self._Suscriptores: Dict[Hashable, Set[Suscripcion]] = {}
+        self._Candado = threading.Lock()
+
+    def Suscribir(self, Clave: Hashable) -> Suscripcion:
+        suscripcion = Suscripcion(Clave)
+        with self._Candado:
+            self._Suscriptores.setdefault(Clave, set()).add(suscripcion)
+        return suscripcion
+
+    def Cancelar(self, SuscripcionActual: Suscripcion) -> None:
+        with self._Candado:
+            grupo = self._Suscriptores.get(SuscripcionActual.Clave)
+            if grupo is None:
+                return
+            grupo.discard(SuscripcionActual)
+            if not grupo:
+                del self._Suscriptores[SuscripcionActual.Clave]
+
+    def Publicar(self, Claves: Iterable[Hashable]) -> None:
+        with self._Candado:
+            destinos = [s for clave in set(Claves) for s in self._Suscriptores.get(clave, ())]
+        for suscripcion in destinos:
+            try:
+                suscripcion.Avisar()
+            except RuntimeError:
+                # Loop cerrado: la conexion ya termino
+                self.Cancelar(suscripcion)
+
+    def Suscriptores(self, Clave: Hashable) -> int:
+        with self._Candado:
+            return len(self._Suscriptores.get(Clave, ()))
+
+
+BusNotificaciones = BusSuscripciones()
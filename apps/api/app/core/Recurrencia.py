@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from calendar import monthrange
+from typing import Iterator, List, Optional
+
+
+_DIAS_SEMANA = {
+    'Lun': 0,
+    'Mar': 1,
+    'Mie': 2,
+    'Jue': 3,
+    'Vie': 4,
+    'Sab': 5,
+    'Dom': 6,
+}
+
+_UNA_SEMANA = timedelta(days=7)
+
+
+def ParseDiasSemana(DiasCSV: Optional[str]) -> List[int]:
+    """Convierte 'Lun,Mie' en [0, 2] (lunes=0), ignorando valores desconocidos."""
+    if not DiasCSV:
+        return []
+    return [_DIAS_SEMANA[d.strip()] for d in DiasCSV.split(',') if d.strip() in _DIAS_SEMANA]
+
+
+def _SumarMeses(Base: datetime, Meses: int) -> datetime:
+    # Meses calendario reales; el dia se ajusta al ultimo del mes si no existe (31 -> 28/29/30)
+    indice = Base.year * 12 + (Base.month - 1) + Meses
+    anio, mes = divmod(indice, 12)
+    dia = min(Base.day, monthrange(anio, mes + 1)[1])
+    return Base.replace(year=anio, month=mes + 1, day=dia)
+
+
+def ExpandirOcurrencias(
+    Base: datetime,
+    Frecuencia: Optional[str],
+    Intervalo: Optional[int],
+    DiasSemana: Optional[str],
+    Desde: datetime,
+    Hasta: datetime,
+    Duracion: timedelta = timedelta(0),
+) -> Iterator[datetime]:
+    """Genera, en orden, los inicios de ocurrencia que tocan la ventana [Desde, Hasta].
+
+    Una ocurrencia con inicio ``s`` se incluye si ``s + Duracion >= Desde`` y
+    ``s <= Hasta``. La primera ocurrencia candidata se calcula de forma
+    aritmetica, asi que el costo no depende de la antiguedad de la serie.
+    Ninguna ocurrencia es anterior a ``Base``.
+    """
+    if Hasta < Desde:
+        return
+    limite = Desde - Duracion
+    if not Frecuencia:
+        if Base >= limite and Base <= Hasta:
+            yield Base
+        return
+    intervalo = Intervalo or 1
+    if intervalo < 1:
+        return
+
+    if Frecuencia == 'Diaria':
+        paso = timedelta(days=intervalo)
+        k = 0
+        if Base < limite:
+            k = (limite - Base) // paso
+            if Base + k * paso < limite:
+                k += 1
+        actual = Base + k * paso
+        while actual <= Hasta:
+            yield actual
+            actual += paso
+
+    elif Frecuencia == 'Semanal':
+        dias = sorted(set(ParseDiasSemana(DiasSemana))) or [Base.weekday()]
+        medianoche = Base.replace(hour=0, minute=0, second=0, microsecond=0)
+        hora = Base - medianoche
+        semana0 = medianoche - timedelta(days=Base.weekday())
+        paso = _UNA_SEMANA * intervalo
+        # Primera semana de la serie cuyo final puede alcanzar el limite inferior
+        n = 0
+        if semana0 + _UNA_SEMANA < limite:
+            n = (limite - semana0 - _UNA_SEMANA) // paso
+        semana = semana0 + n * paso
+        while semana <= Hasta:
+            for d in dias:
+                actual = semana + timedelta(days=d) + hora
+                if actual > Hasta:
+                    return
+                if actual >= Base and actual >= limite:
+                    yield actual
+            semana += paso
+
+    elif Frecuencia == 'Mensual':
+        k = 0
+        meses_hasta_limite = (limite.year * 12 + limite.month) - (Base.year * 12 + Base.month)
+        if meses_hasta_limite > 0:
+            # Una ocurrencia en un mes anterior al del limite siempre queda fuera
+            k = -(-meses_hasta_limite // intervalo)
+        actual = _SumarMeses(Base, k * intervalo)
+        while actual <= Hasta:
+            if actual >= limite:
+                yield actual
+            k += 1
+            actual = _SumarMeses(Base, k * intervalo)
+
+
+def SiguienteOcurrencia(
+    Base: datetime,
+    Frecuencia: Optional[str],
+    Intervalo: Optional[int],
+    DiasSemana: Optional[str],
+    Despues: datetime,
+) -> Optional[datetime]:
+    """Primera ocurrencia estrictamente posterior a Despues, o None si la serie no tiene mas."""
+    # Ninguna regla deja huecos mayores a un anio por unidad de intervalo
+    hasta = max(Despues, Base) + timedelta(days=366 * max(1, Intervalo or 1))
+    return next(
+        ExpandirOcurrencias(Base, Frecuencia, Intervalo, DiasSemana, Despues + timedelta(microseconds=1), hasta),
+        None,
+    )
+
+
+def ProximaEjecucion(
+    Base: datetime,
+    Frecuencia: Optional[str],
+    Intervalo: Optional[int],
+    DiasSemana: Optional[str],
+    Desde: datetime,
+) -> Optional[datetime]:
+    """Proximo disparo pendiente a partir de Desde (inclusive).
+
+    Sin repeticion es siempre Base, aunque ya haya pasado: un aviso de una
+    sola vez vencido sigue pendiente hasta que se despacha.
+    """
+    if not Frecuencia:
+        return Base
+    return SiguienteOcurrencia(Base, Frecuencia, Intervalo, DiasSemana, Desde - timedelta(microseconds=1))
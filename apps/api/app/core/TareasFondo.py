@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+def TareasFondoHabilitadas() -> bool:
+    # MYPLANU_TAREAS_FONDO=0 desactiva los hilos de fondo (util en pruebas o workers de solo lectura)
+    return os.getenv("MYPLANU_TAREAS_FONDO", "1").strip().lower() not in {"0", "false", "no"}
+
+
+class TareaPeriodica:
+    """Ejecuta una funcion en un hilo daemon cada IntervaloSegundos (la primera vez al iniciar)."""
+
+    def __init__(self, Nombre: str, IntervaloSegundos: float, Funcion: Callable[[], None]) -> None:
+        self.Nombre = Nombre
+        self.IntervaloSegundos = IntervaloSegundos
+        self.Funcion = Funcion
+        self._Parar = threading.Event()
+        self._Hilo: Optional[threading.Thread] = None
+
+    def Iniciar(self) -> None:
+        if self._Hilo is not None and self._Hilo.is_alive():
+            return
+        self._Parar.clear()
+        self._Hilo = threading.Thread(target=self._Ciclo, name=self.Nombre, daemon=True)
+        self._Hilo.start()
+
+    def Detener(self, Espera: float = 5.0) -> None:
+        self._Parar.set()
+        if self._Hilo is not None:
+            self._Hilo.join(timeout=Espera)
+            self._Hilo = None
+
+    def _Ciclo(self) -> None:
+        while True:
+            try:
+                self.Funcion()
+            except Exception:
+                logger.exception("Fallo la tarea de fondo %s", self.Nombre)
+            if self._Parar.wait(self.IntervaloSegundos):
+                return
+
+
+class TareaProgramada:
+    """Hilo daemon cuya funcion devuelve cuantos segundos esperar antes de volver a ejecutarse.
+
+    Despertar() adelanta la siguiente ejecucion (p. ej. cuando se programa algo mas cercano).
+    """
+
+    def __init__(self, Nombre: str, Funcion: Callable[[], float], EsperaTrasError: float = 5.0) -> None:
+        self.Nombre = Nombre
+        self.Funcion = Funcion
+        self.EsperaTrasError = EsperaTrasError
+        self._Parar = threading.Event()
+        self._Aviso = threading.Event()
+        self._Hilo: Optional[threading.Thread] = None
+
+    def Iniciar(self) -> None:
+        if self._Hilo is not None and self._Hilo.is_alive():
+            return
+        self._Parar.clear()
+        self._Hilo = threading.Thread(target=self._Ciclo, name=self.Nombre, daemon=True)
+        self._Hilo.start()
+
+    def Despertar(self) -> None:
+        self._Aviso.set()
+
+    def Detener(self, Espera: float = 5.0) -> None:
+        self._Parar.set()
+        self._Aviso.set()
+        if self._Hilo is not None:
+            self._Hilo.join(timeout=Espera)
+            self._Hilo = None
+
+    def _Ciclo(self) -> None:
+        while not self._Parar.is_set():
+            # Se limpia antes de ejecutar: un aviso recibido durante la ejecucion no se pierde
+            self._Aviso.clear()
+            try:
+                espera = self.Funcion()
+            except Exception:
+                logger.exception("Fallo la tarea de fondo %s", self.Nombre)
+                espera = self.EsperaTrasError
+            self._Aviso.wait(max(0.0, espera))
@@ -0,0 +1,153 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session
+
+from app.core.CacheAuth import ObtenerUsuarioSesion
+
+try:
+    # Python 3.9+
+    from zoneinfo import ZoneInfo
+except Exception:  # pragma: no cover
+    ZoneInfo = None  # type: ignore
+
+
+# Todas las fechas se guardan en UTC naive; las respuestas se expresan en la zona del usuario.
+_UN_DIA = timedelta(days=1)
+
+
+def ObtenerMaximoZonas() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_ZONAS_CACHE_MAX", "256")))
+    except Exception:
+        return 256
+
+
+def ObtenerMaximoTramosZona() -> int:
+    """Dias UTC cuyo offset se recuerda por zona (MYPLANU_ZONAS_TRAMOS_MAX)."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_ZONAS_TRAMOS_MAX", "3660")))
+    except Exception:
+        return 3660
+
+
+@lru_cache(maxsize=ObtenerMaximoZonas())
+def ResolverZona(Zona: Optional[str]) -> tzinfo:
+    """ZoneInfo de la zona IANA o UTC si no se indico o no existe."""
+    try:
+        if Zona and ZoneInfo:
+            return ZoneInfo(Zona)
+    except Exception:
+        pass
+    return timezone.utc
+
+
+class ConvertidorZona:
+    """Serializa datetimes UTC naive como ISO 8601 en una zona fija.
+
+    El offset se resuelve una vez por dia UTC y se reutiliza: convertir una
+    fecha queda en una suma y un isoformat, sin construir datetimes aware.
+    Los dias que contienen una transicion de offset se convierten valor a valor.
+    """
+
+    def __init__(self, Zona: tzinfo, MaximoTramos: int) -> None:
+        self.Zona = Zona
+        # Nombre IANA; identifica la zona en claves de cache y ETags
+        self.Clave: str = getattr(Zona, "key", "UTC")
+        self.MaximoTramos = MaximoTramos
+        # (anio, mes, dia) UTC -> (offset, sufijo ISO) o None si el dia contiene una transicion
+        self._Tramos: Dict[Tuple[int, int, int], Optional[Tuple[timedelta, str]]] = {}
+        self._Candado = threading.Lock()
+
+    def _Calcular(self, Dia: Tuple[int, int, int]) -> Optional[Tuple[timedelta, str]]:
+        desde = datetime(*Dia, tzinfo=timezone.utc)
+        try:
+            inicio = desde.astimezone(self.Zona)
+            fin = (desde + _UN_DIA - timedelta(microseconds=1)).astimezone(self.Zona)
+        except OverflowError:
+            # Extremos del rango de datetime: se convierten valor a valor
+            return None
+        offset = inicio.utcoffset()
+        if offset is None or offset != fin.utcoffset():
+            return None
+        local = inicio.isoformat()
+        return offset, local[len(inicio.replace(tzinfo=None).isoformat()):]
+
+    def _Tramo(self, Dia: Tuple[int, int, int]) -> Optional[Tuple[timedelta, str]]:
+        tramo = self._Calcular(Dia)
+        with self._Candado:
+            if len(self._Tramos) >= self.MaximoTramos:
+                self._Tramos.clear()
+            self._Tramos[Dia] = tramo
+        return tramo
+
+    def Iso(self, Fecha: Optional[datetime]) -> Optional[str]:
+        if Fecha is None:
+            return None
+        dia = (Fecha.year, Fecha.month, Fecha.day)
+        try:
+            tramo = self._Tramos[dia]
+        except KeyError:
+            tramo = self._Tramo(dia)
+        if tramo is None:
+            return Fecha.replace(tzinfo=timezone.utc).astimezone(self.Zona).isoformat()
+        offset, sufijo = tramo
+        return (Fecha + offset).isoformat() + sufijo
+
+    def ConvertirCampos(self, Fila: Dict[str, Any], Campos: Iterable[str]) -> Dict[str, Any]:
+        """Reemplaza en sitio los campos de fecha de un dict ya serializado."""
+        for campo in Campos:
+            valor = Fila.get(campo)
+            if isinstance(valor, datetime):
+                Fila[campo] = self.Iso(valor)
+        return Fila
+
+    def ConvertirFilas(self, Filas: Iterable[Dict[str, Any]], Campos: Iterable[str]) -> List[Dict[str, Any]]:
+        campos = tuple(Campos)
+        return [self.ConvertirCampos(fila, campos) for fila in Filas]
+
+
+@lru_cache(maxsize=ObtenerMaximoZonas())
+def _ConvertidorPorZona(Zona: Optional[str]) -> ConvertidorZona:
+    return ConvertidorZona(ResolverZona(Zona), ObtenerMaximoTramosZona())
+
+
+def ObtenerConvertidor(Zona: Optional[str]) -> ConvertidorZona:
+    """Convertidor compartido por zona (los invalidos comparten el de UTC)."""
+    zona = ResolverZona(Zona)
+    return _ConvertidorPorZona(Zona if zona is not timezone.utc else None)
+
+
+def ConvertidorUsuario(SesionBD: Session, UsuarioId: Optional[int], ZonaHoraria: Optional[str]) -> ConvertidorZona:
+    """Prioridad: ZonaHoraria explicita, luego la del Usuario, si no UTC."""
+    zona = ZonaHoraria
+    if zona is None and UsuarioId is not None:
+        usuario = ObtenerUsuarioSesion(SesionBD, UsuarioId)
+        if usuario is not None and usuario.ZonaHoraria:
+            zona = usuario.ZonaHoraria
+    return ObtenerConvertidor(zona)
+
+
+def AUtcNaive(
+    Fecha: Any,
+    ZonaEntrada: Optional[str] = None,
+    ZonaFallback: Optional[str] = None,
+) -> Optional[datetime]:
+    """Normaliza una fecha de entrada (datetime o texto ISO) a UTC naive.
+
+    Los valores naive se interpretan en ZonaEntrada o ZonaFallback; sin zona
+    valida se asume que ya estan en UTC.
+    """
+    if Fecha is None:
+        return None
+    if isinstance(Fecha, str):
+        Fecha = datetime.fromisoformat(Fecha.replace('Z', '+00:00'))
+    if Fecha.tzinfo is not None:
+        return Fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    zona = ResolverZona(ZonaEntrada or ZonaFallback)
+    if zona is timezone.utc:
+        return Fecha
+    return Fecha.replace(tzinfo=zona).astimezone(timezone.utc).replace(tzinfo=None)
@@ -9,14 +9,20 @@ from app.views.PapeleraView import Router as PapeleraRouter
 from app.views.MonitorView import Router as MonitorRouter
 from app.views.SyncView import Router as SyncRouter
 from app.views.AuthView import RouterAuth, get_current_user
+from app.core.Compresion import CompresionHabilitada, MiddlewareCompresion
 from app.core.Database import IniciarTablas
+from app.core.TareasFondo import TareasFondoHabilitadas
+from app.services.OcurrenciasService import CrearTareaHorizonte
+from app.services.BitacoraService import CrearTareaBitacora, Escritor as EscritorBitacora
+from app.services.DespachoService import CrearTareaDespacho
+from app.services.SalidaService import CrearTareaRelay
 
 
 def CrearAplicacion() -> FastAPI:
     # Version alineada con el changelog (v0.18.x). Mantener sincronizada al liberar.
     Aplicacion = FastAPI(title="MyPlanU API", version="0.18.0")
 
-    # Asegurar creacion de tablas al construir la app (idempotente)
+    # Migraciones pendientes al construir la app (una consulta si el esquema esta al dia)
     IniciarTablas()
 
     # CORS parametrizable: MYPLANU_CORS_ORIGINS="https://app.example.com,https://admin.example.com"
@@ -32,10 +38,34 @@ def CrearAplicacion() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # br/gzip en respuestas grandes y cuerpos comprimidos en /sync/* (MYPLANU_COMPRESION=ninguna lo desactiva)
+    if CompresionHabilitada():
+        Aplicacion.add_middleware(MiddlewareCompresion)
+
+    # Extiende periodicamente el horizonte de ocurrencias materializadas
+    TareaHorizonte = CrearTareaHorizonte()
+    # Vacia por lotes la cola de la bitacora de recuperaciones
+    TareaBitacora = CrearTareaBitacora()
+    # Entrega los recordatorios Push al vencer
+    TareaDespacho = CrearTareaDespacho()
+    # Envia a la pasarela push los mensajes de la bandeja de salida
+    TareaRelay = CrearTareaRelay()
 
     @Aplicacion.on_event("startup")
     def AlIniciarAplicacion():
-        IniciarTablas()
+        if TareasFondoHabilitadas():
+            TareaHorizonte.Iniciar()
+            TareaBitacora.Iniciar()
+            TareaDespacho.Iniciar()
+            TareaRelay.Iniciar()
+
+    @Aplicacion.on_event("shutdown")
+    def AlDetenerAplicacion():
+        TareaHorizonte.Detener()
+        TareaBitacora.Detener()
+        TareaDespacho.Detener()
+        TareaRelay.Detener()
+        EscritorBitacora.Vaciar()
 
     # Rutas
     Aplicacion.include_router(SaludRouter, prefix="/salud", tags=["salud"])
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class CambioSync(SQLModel, table=True):
+    # Registro de cambios para sincronizacion incremental; Id es el cursor monotono
+    __table_args__ = (Index("idx_cambiosync_entidad", "TipoEntidad", "EntidadId"),)
+
+    Id: Optional[int] = Field(default=None, primary_key=True)
+    TipoEntidad: str = Field(regex="^(Meta|Evento|Recordatorio)$")
+    EntidadId: int
+    Operacion: str = Field(regex="^(crear|actualizar|eliminar|recuperar|revocar)$")
+    RegistradoEn: datetime = Field(default_factory=datetime.utcnow)
+    # Solo para este usuario (p. ej. 'revocar' al perder acceso); None = para todos
+    UsuarioId: Optional[int] = None
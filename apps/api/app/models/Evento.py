@@ -1,10 +1,17 @@
 from typing import Optional
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 
 
 class Evento(SQLModel, table=True):
+    # Indice compuesto para podar por ventana en /eventos/proximos
+    __table_args__ = (
+        Index("idx_evento_eliminado_inicio_fin", "EliminadoEn", "Inicio", "Fin"),
+        Index("idx_evento_propietario", "PropietarioId"),
+    )
+
     Id: Optional[int] = Field(default=None, primary_key=True)
     MetaId: int = Field(foreign_key="meta.Id")
     PropietarioId: int = Field(foreign_key="usuario.Id")
@@ -25,6 +32,12 @@ class Evento(SQLModel, table=True):
 
 
 class Recordatorio(SQLModel, table=True):
+    __table_args__ = (
+        Index("idx_recordatorio_enviado_eliminado_fecha", "Enviado", "EliminadoEn", "FechaHora"),
+        # Cola del despachador y proximos N dias: rango sobre el siguiente disparo
+        Index("idx_recordatorio_eliminado_proxima", "EliminadoEn", "ProximaEjecucion"),
+    )
+
     Id: Optional[int] = Field(default=None, primary_key=True)
     EventoId: int = Field(foreign_key="evento.Id")
     FechaHora: datetime
@@ -35,6 +48,8 @@ class Recordatorio(SQLModel, table=True):
     IntervaloRepeticion: Optional[int] = None
     DiasSemana: Optional[str] = None
     Enviado: bool = False
+    # Siguiente disparo pendiente (FechaHora o la ocurrencia vigente si repite); None si ya no queda ninguno
+    ProximaEjecucion: Optional[datetime] = None
     CreadoEn: datetime = Field(default_factory=datetime.utcnow)
     EliminadoEn: Optional[datetime] = None
 
@@ -42,6 +57,9 @@ class Recordatorio(SQLModel, table=True):
 
 
 class ParticipanteEvento(SQLModel, table=True):
+    # Agenda por usuario: eventos en los que participa
+    __table_args__ = (Index("idx_participante_usuario_evento", "UsuarioId", "EventoId"),)
+
     Id: Optional[int] = Field(default=None, primary_key=True)
     EventoId: int = Field(foreign_key="evento.Id")
     UsuarioId: int = Field(foreign_key="usuario.Id")
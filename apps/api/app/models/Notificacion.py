@@ -12,3 +12,9 @@ class NotificacionSistema(SQLModel, table=True):
     Mensaje: str
     CreadoEn: datetime = Field(default_factory=datetime.utcnow)
     LeidaEn: Optional[datetime] = None
+
+
+class ConteoNotificaciones(SQLModel, table=True):
+    # Contador desnormalizado de no leidas por usuario (lo mantiene NotificacionesService)
+    UsuarioId: int = Field(foreign_key="usuario.Id", primary_key=True)
+    NoLeidas: int = 0
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class Ocurrencia(SQLModel, table=True):
+    # Instancias expandidas de Evento dentro del horizonte materializado
+    __table_args__ = (Index("idx_ocurrencia_inicio_evento", "Inicio", "EventoId"),)
+
+    Id: Optional[int] = Field(default=None, primary_key=True)
+    EventoId: int = Field(foreign_key="evento.Id", index=True)
+    Inicio: datetime
+    Fin: datetime
+
+
+class HorizonteOcurrencias(SQLModel, table=True):
+    # Fila unica (Id=1) con la ventana que cubre la tabla ocurrencia
+    Id: Optional[int] = Field(default=None, primary_key=True)
+    Desde: datetime
+    Hasta: datetime
+    ActualizadoEn: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class MensajeSalida(SQLModel, table=True):
+    # Outbox de push: se escribe en la transaccion del cambio y la drena el relay
+    __table_args__ = (Index("idx_mensajesalida_pendiente", "EnviadoEn", "FallidoEn", "ProximoIntento"),)
+
+    Id: Optional[int] = Field(default=None, primary_key=True)
+    UsuarioId: int = Field(foreign_key="usuario.Id")
+    Tipo: str = Field(regex="^(Recordatorio|EventoEliminado)$")
+    ReferenciaId: int
+    Titulo: str
+    Cuerpo: Optional[str] = None
+    CreadoEn: datetime = Field(default_factory=datetime.utcnow)
+    Intentos: int = 0
+    ProximoIntento: datetime = Field(default_factory=datetime.utcnow)
+    EnviadoEn: Optional[datetime] = None
+    # Lote del relay que lo esta enviando; el reclamo caduca tras MYPLANU_SALIDA_RECLAMO segundos
+    Reclamado: Optional[str] = None
+    ReclamadoEn: Optional[datetime] = None
+    # Agoto los reintentos; queda como registro para diagnostico
+    FallidoEn: Optional[datetime] = None
+    UltimoError: Optional[str] = None
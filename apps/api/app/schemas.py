@@ -115,6 +115,7 @@ class RecordatorioRespuesta(BaseModel):
     IntervaloRepeticion: Optional[int]
     DiasSemana: Optional[List[str]]
     Enviado: bool
+    ProximaEjecucion: Optional[datetime] = None
     CreadoEn: datetime
     EliminadoEn: Optional[datetime]
 
@@ -146,3 +147,10 @@ class BatchItemResult(BaseModel):
 class BatchResponse(BaseModel):
     results: List[BatchItemResult]
     mappings: Dict[str, int] = {}
+
+
+# ---- Notificaciones ----
+class NotificacionesLeer(BaseModel):
+    # Ids concretos o "todo hasta este instante" (CreadoEn <= Hasta)
+    Ids: Optional[List[int]] = None
+    Hasta: Optional[datetime] = None
@@ -1,12 +1,130 @@
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
+import logging
+import os
+import threading
 
+from sqlalchemy import and_, insert, or_
 from sqlmodel import Session, select
 
+from app.core.Database import AlConfirmar, ObtenerEngine
+from app.core.TareasFondo import TareaPeriodica
 from app.models.Bitacora import BitacoraRecuperacion
 
 
+logger = logging.getLogger(__name__)
+
+
+def ObtenerSegundosVaciadoBitacora() -> float:
+    try:
+        return max(0.1, float(os.getenv("MYPLANU_BITACORA_VACIADO_SEGUNDOS", "2")))
+    except Exception:
+        return 2.0
+
+
+def ObtenerMaximoColaBitacora() -> int:
+    """Entradas en cola a partir de las cuales se vacia en linea, sin esperar a la tarea."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_BITACORA_MAX_COLA", "1000")))
+    except Exception:
+        return 1000
+
+
+def ObtenerMaximoReintentosBitacora() -> int:
+    """Vaciados fallidos seguidos tras los que un lote se descarta al log de errores (MYPLANU_BITACORA_MAX_REINTENTOS)."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_BITACORA_MAX_REINTENTOS", "5")))
+    except Exception:
+        return 5
+
+
+class EscritorBitacora:
+    """Cola en memoria de entradas de bitacora que se insertan por lotes con sesion propia."""
+
+    def __init__(self, MaximoCola: int, MaximoReintentos: int) -> None:
+        self.MaximoCola = MaximoCola
+        self.MaximoReintentos = MaximoReintentos
+        self._Pendientes: List[Dict[str, Any]] = []
+        # Lote que ya fallo al insertarse y cuantas veces seguidas
+        self._Fallido: List[Dict[str, Any]] = []
+        self._Intentos = 0
+        self._Candado = threading.Lock()
+        # Serializa los vaciados para no insertar dos veces el mismo lote
+        self._CandadoVaciado = threading.Lock()
+
+    def Encolar(self, Filas: List[Dict[str, Any]]) -> None:
+        with self._Candado:
+            self._Pendientes.extend(Filas)
+            lleno = len(self._Pendientes) >= self.MaximoCola
+        if lleno:
+            self.Vaciar()
+
+    def Pendientes(self) -> int:
+        with self._Candado:
+            return len(self._Pendientes) + len(self._Fallido)
+
+    def Vaciar(self) -> int:
+        """Inserta lo pendiente en INSERT multi-fila; devuelve cuantas filas escribio.
+
+        Un lote que falla se reintenta solo, sin mezclarle lo encolado despues;
+        tras MaximoReintentos fallos seguidos se descarta y sus filas quedan en
+        el log de errores, para que una base caida no haga crecer la cola sin
+        fin. Las entradas posteriores conservan sus propios intentos.
+        """
+        escritas = 0
+        with self._CandadoVaciado:
+            while True:
+                with self._Candado:
+                    reintento = bool(self._Fallido)
+                    if reintento:
+                        lote = self._Fallido
+                    else:
+                        lote, self._Pendientes = self._Pendientes, []
+                if not lote:
+                    return escritas
+                try:
+                    with Session(ObtenerEngine()) as SesionBD:
+                        SesionBD.execute(insert(BitacoraRecuperacion), lote)
+                        SesionBD.commit()
+                except Exception:
+                    self._Intentos += 1
+                    if self._Intentos >= self.MaximoReintentos:
+                        logger.exception(
+                            "Bitacora descartada tras %d intentos (%d entradas): %r", self._Intentos, len(lote), lote
+                        )
+                        lote = []
+                        self._Intentos = 0
+                    else:
+                        logger.exception("No se pudo vaciar la bitacora; se reintentara")
+                    with self._Candado:
+                        self._Fallido = lote
+                    return escritas
+                self._Intentos = 0
+                escritas += len(lote)
+                with self._Candado:
+                    self._Fallido = []
+                if not reintento:
+                    return escritas
+
+
+Escritor = EscritorBitacora(ObtenerMaximoColaBitacora(), ObtenerMaximoReintentosBitacora())
+
+
+def CrearTareaBitacora() -> TareaPeriodica:
+    return TareaPeriodica("vaciado-bitacora", ObtenerSegundosVaciadoBitacora(), Escritor.Vaciar)
+
+
 class BitacoraService:
+    def _Escribir(self, SesionBD: Session, Filas: List[Dict[str, Any]], Durable: bool) -> None:
+        if not Filas:
+            return
+        if Durable:
+            # Dentro de la transaccion del llamador: se confirma (o revierte) junto con la recuperacion
+            SesionBD.execute(insert(BitacoraRecuperacion), Filas)
+            return
+        # Se encola solo si la recuperacion llega a confirmarse
+        AlConfirmar(SesionBD, lambda: Escritor.Encolar(Filas))
+
     def RegistrarRecuperacion(
         self,
         SesionBD: Session,
@@ -15,27 +133,72 @@ class BitacoraService:
         UsuarioId: Optional[int],
         Detalle: Optional[str] = None,
         Momento: Optional[datetime] = None,
-    ) -> BitacoraRecuperacion:
-        Entrada = BitacoraRecuperacion(
-            TipoEntidad=TipoEntidad,
-            EntidadId=EntidadId,
-            UsuarioId=UsuarioId,
-            Detalle=Detalle,
-            RegistradoEn=Momento or datetime.utcnow(),
+        Durable: bool = False,
+    ) -> None:
+        self.RegistrarRecuperaciones(
+            SesionBD, TipoEntidad, [EntidadId], UsuarioId, Detalle=Detalle, Momento=Momento, Durable=Durable
         )
-        SesionBD.add(Entrada)
-        return Entrada
+
+    def RegistrarRecuperaciones(
+        self,
+        SesionBD: Session,
+        TipoEntidad: str,
+        EntidadIds: Iterable[int],
+        UsuarioId: Optional[int],
+        Detalle: Optional[str] = None,
+        Momento: Optional[datetime] = None,
+        Durable: bool = False,
+    ) -> int:
+        """Una entrada por entidad recuperada; devuelve cuantas se registraron.
+
+        Por defecto las entradas se escriben despues del commit, en lote, por el
+        EscritorBitacora. Durable=True las inserta en la transaccion actual (las
+        recuperaciones en cascada, que no deben perder su rastro).
+        """
+        instante = Momento or datetime.utcnow()
+        filas = [
+            {
+                "TipoEntidad": TipoEntidad,
+                "EntidadId": entidad_id,
+                "UsuarioId": UsuarioId,
+                "Detalle": Detalle,
+                "RegistradoEn": instante,
+            }
+            for entidad_id in EntidadIds
+        ]
+        self._Escribir(SesionBD, filas, Durable)
+        return len(filas)
 
     def ListarRecuperaciones(
         self,
         SesionBD: Session,
         TipoEntidad: Optional[str] = None,
         UsuarioId: Optional[int] = None,
+        Limite: Optional[int] = None,
+        Despues: Optional[Tuple[datetime, int]] = None,
+        VaciarPendientes: bool = False,
     ) -> List[BitacoraRecuperacion]:
+        """Mas recientes primero, paginado por keyset sobre (RegistradoEn, Id).
+
+        Lo encolado aparece tras el siguiente vaciado; VaciarPendientes lo
+        escribe antes de consultar (a costa de un INSERT en la lectura).
+        """
+        if VaciarPendientes:
+            Escritor.Vaciar()
         Consulta = select(BitacoraRecuperacion)
         if TipoEntidad:
             Consulta = Consulta.where(BitacoraRecuperacion.TipoEntidad == TipoEntidad)
         if UsuarioId is not None:
             Consulta = Consulta.where(BitacoraRecuperacion.UsuarioId == UsuarioId)
-        Consulta = Consulta.order_by(BitacoraRecuperacion.RegistradoEn.desc())
+        if Despues is not None:
+            registrado, ultimo_id = Despues
+            Consulta = Consulta.where(
+                or_(
+                    BitacoraRecuperacion.RegistradoEn < registrado,
+                    and_(BitacoraRecuperacion.RegistradoEn == registrado, BitacoraRecuperacion.Id < ultimo_id),
+                )
+            )
+        Consulta = Consulta.order_by(BitacoraRecuperacion.RegistradoEn.desc(), BitacoraRecuperacion.Id.desc())
+        if Limite is not None:
+            Consulta = Consulta.limit(Limite)
         return list(SesionBD.exec(Consulta))
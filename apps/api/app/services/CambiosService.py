@@ -0,0 +1,190 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, or_
+from sqlmodel import Session, select
+
+from app.models.CambioSync import CambioSync
+from app.models.Evento import Evento, Recordatorio
+from app.models.Goal import Meta
+from app.services.ParticipantesService import ParticipantesService
+
+
+_MODELOS = {"Meta": Meta, "Evento": Evento, "Recordatorio": Recordatorio}
+
+
+def ObtenerMargenHuecosSync() -> float:
+    """Segundos que un hueco en el log se considera una transaccion aun abierta (MYPLANU_SYNC_MARGEN_HUECOS)."""
+    try:
+        return max(0.0, float(os.getenv("MYPLANU_SYNC_MARGEN_HUECOS", "60")))
+    except Exception:
+        return 60.0
+
+
+class CambiosService:
+    """Log de cambios (append-only) que alimenta /sync/cambios."""
+
+    def __init__(self) -> None:
+        self.Participantes = ParticipantesService()
+
+    def Registrar(
+        self,
+        SesionBD: Session,
+        TipoEntidad: str,
+        EntidadIds: Iterable[Optional[int]],
+        Operacion: str,
+        Momento: Optional[datetime] = None,
+        UsuarioId: Optional[int] = None,
+    ) -> None:
+        """Agrega una fila por entidad en la transaccion actual (un solo INSERT multi-fila).
+
+        Con UsuarioId la fila solo la lee ese usuario (las revocaciones).
+        """
+        instante = Momento or datetime.utcnow()
+        filas = [
+            {
+                "TipoEntidad": TipoEntidad,
+                "EntidadId": entidad_id,
+                "Operacion": Operacion,
+                "RegistradoEn": instante,
+                "UsuarioId": UsuarioId,
+            }
+            for entidad_id in dict.fromkeys(EntidadIds)
+            if entidad_id is not None
+        ]
+        if filas:
+            SesionBD.execute(insert(CambioSync), filas)
+
+    def UltimoCursor(self, SesionBD: Session) -> int:
+        return SesionBD.exec(select(func.max(CambioSync.Id))).one() or 0
+
+    def ContarDesde(self, SesionBD: Session, Desde: int) -> int:
+        return SesionBD.exec(select(func.count()).select_from(CambioSync).where(CambioSync.Id > Desde)).one()
+
+    def RegistrarRevocacion(self, SesionBD: Session, UsuarioId: int, EventoId: int) -> None:
+        """Publica 'revocar' para el usuario sobre lo que dejo de ver al salir del evento.
+
+        El filtro de visibilidad oculta los cambios posteriores de esas
+        entidades, asi que sin esta fila el cliente las conservaria para
+        siempre. Se llama con la participacion ya quitada de la sesion.
+        """
+        SesionBD.flush()
+        if SesionBD.exec(
+            select(Evento.Id).where(Evento.Id == EventoId, self._CondicionVisible("Evento", UsuarioId))
+        ).first() is not None:
+            return
+        self.Registrar(SesionBD, "Evento", [EventoId], "revocar", UsuarioId=UsuarioId)
+        recordatorios = SesionBD.exec(select(Recordatorio.Id).where(Recordatorio.EventoId == EventoId))
+        self.Registrar(SesionBD, "Recordatorio", list(recordatorios), "revocar", UsuarioId=UsuarioId)
+        meta_id = SesionBD.exec(select(Evento.MetaId).where(Evento.Id == EventoId)).first()
+        if meta_id is not None and SesionBD.exec(
+            select(Meta.Id).where(Meta.Id == meta_id, self._CondicionVisible("Meta", UsuarioId))
+        ).first() is None:
+            self.Registrar(SesionBD, "Meta", [meta_id], "revocar", UsuarioId=UsuarioId)
+
+    def _CondicionVisible(self, TipoEntidad: str, UsuarioId: int) -> Any:
+        eventos_agenda = select(Evento.Id).where(self.Participantes.CondicionAgenda(UsuarioId))
+        if TipoEntidad == "Meta":
+            return or_(
+                Meta.PropietarioId == UsuarioId,
+                Meta.Id.in_(select(Evento.MetaId).where(self.Participantes.CondicionAgenda(UsuarioId))),
+            )
+        if TipoEntidad == "Evento":
+            return Evento.Id.in_(eventos_agenda)
+        return Recordatorio.EventoId.in_(eventos_agenda)
+
+    def _HastaPrimerHueco(
+        self, SesionBD: Session, Desde: int, Leidos: List[CambioSync]
+    ) -> Tuple[List[CambioSync], bool]:
+        """Recorta la pagina antes de un hueco reciente del log; devuelve (pagina, recortada).
+
+        Los huecos se buscan sobre todos los Id (no solo los del usuario): las
+        filas dirigidas a otros usuarios no son huecos.
+        """
+        if not Leidos:
+            return Leidos, False
+        limite = datetime.utcnow() - timedelta(seconds=ObtenerMargenHuecosSync())
+        Consulta = (
+            select(CambioSync.Id, CambioSync.RegistradoEn)
+            .where(CambioSync.Id > Desde, CambioSync.Id <= Leidos[-1].Id)
+            .order_by(CambioSync.Id)
+        )
+        esperado = Desde + 1
+        for cambio_id, registrado in SesionBD.exec(Consulta):
+            if cambio_id != esperado and registrado > limite:
+                return [c for c in Leidos if (c.Id or 0) < esperado], True
+            esperado = cambio_id + 1
+        return Leidos, False
+
+    def Listar(
+        self,
+        SesionBD: Session,
+        Desde: int,
+        Limite: int,
+        UsuarioId: int,
+    ) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """Cambios con Id > Desde visibles para el usuario, con el estado actual de cada entidad.
+
+        Devuelve (cambios, cursor siguiente, hay_mas). Dentro de la pagina cada
+        entidad aparece una sola vez (su ultimo cambio). El cursor avanza sobre
+        todo lo leido, aunque se filtre por visibilidad. Una entidad que el
+        usuario ya no puede ver y que tiene un 'revocar' suyo en la pagina sale
+        como 'revocar' sin Entidad, para que el cliente la descarte.
+
+        El Id se asigna al insertar, no al confirmar: con escritores
+        concurrentes (PostgreSQL) una transaccion larga puede confirmar el Id N
+        cuando ya es visible el N+1. La pagina se corta antes del primer hueco
+        cuyo cambio siguiente es mas reciente que MYPLANU_SYNC_MARGEN_HUECOS;
+        pasado ese margen el hueco se da por una transaccion deshecha. En
+        SQLite las escrituras son serializadas y los Id no dejan huecos.
+        """
+        Consulta = (
+            select(CambioSync)
+            .where(CambioSync.Id > Desde, or_(CambioSync.UsuarioId.is_(None), CambioSync.UsuarioId == UsuarioId))
+            .order_by(CambioSync.Id)
+            .limit(Limite + 1)
+        )
+        leidos = list(SesionBD.exec(Consulta))
+        hay_mas = len(leidos) > Limite
+        leidos, cortado = self._HastaPrimerHueco(SesionBD, Desde, leidos[:Limite])
+        hay_mas = hay_mas or cortado
+        if not leidos:
+            return [], Desde, hay_mas
+        siguiente = leidos[-1].Id or Desde
+        ultimos: Dict[Tuple[str, int], CambioSync] = {}
+        revocados: Set[Tuple[str, int]] = set()
+        for cambio in leidos:
+            clave = (cambio.TipoEntidad, cambio.EntidadId)
+            ultimos[clave] = cambio
+            if cambio.Operacion == "revocar":
+                revocados.add(clave)
+        # Un SELECT por tipo con el estado actual de las entidades visibles
+        entidades: Dict[Tuple[str, int], Any] = {}
+        for tipo, modelo in _MODELOS.items():
+            ids = [entidad_id for (t, entidad_id) in ultimos if t == tipo]
+            if not ids:
+                continue
+            ConsultaEntidades = select(modelo).where(modelo.Id.in_(ids), self._CondicionVisible(tipo, UsuarioId))
+            for entidad in SesionBD.exec(ConsultaEntidades):
+                entidades[(tipo, entidad.Id)] = entidad
+        cambios = []
+        for clave, cambio in sorted(ultimos.items(), key=lambda item: item[1].Id or 0):
+            entidad = entidades.get(clave)
+            if entidad is None:
+                if clave not in revocados:
+                    continue
+                operacion, estado = "revocar", None
+            else:
+                # Revocado y vuelto a compartir dentro de la misma pagina: vale el estado actual
+                operacion = "actualizar" if cambio.Operacion == "revocar" else cambio.Operacion
+                estado = entidad.model_dump()
+            cambios.append({
+                "Cursor": cambio.Id,
+                "TipoEntidad": cambio.TipoEntidad,
+                "EntidadId": cambio.EntidadId,
+                "Operacion": operacion,
+                "RegistradoEn": cambio.RegistradoEn,
+                "Entidad": estado,
+            })
+        return cambios, siguiente, hay_mas
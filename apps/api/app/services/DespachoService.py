@@ -0,0 +1,260 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, or_, union
+from sqlmodel import Session, select
+
+from app.core.Database import ActualizarDevolviendoIds, ObtenerEngine
+from app.core.Recurrencia import SiguienteOcurrencia
+from app.core.TareasFondo import TareaProgramada
+from app.models.Evento import Evento, ParticipanteEvento, Recordatorio
+from app.services.CambiosService import CambiosService
+from app.services.SalidaService import SalidaService
+
+
+logger = logging.getLogger(__name__)
+
+CANAL_SERVIDOR = "Push"
+
+
+def ObtenerTamanoLoteDespacho() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_DESPACHO_LOTE", "500")))
+    except Exception:
+        return 500
+
+
+def ObtenerTamanoCargaDespacho() -> int:
+    """Pendientes que se mantienen en memoria (MYPLANU_DESPACHO_CARGA)."""
+    try:
+        return max(1, int(os.getenv("MYPLANU_DESPACHO_CARGA", "5000")))
+    except Exception:
+        return 5000
+
+
+def ObtenerEsperaMaximaDespacho() -> float:
+    """Segundos maximos entre recargas desde la base (cubre escrituras de otros procesos)."""
+    try:
+        return max(1.0, float(os.getenv("MYPLANU_DESPACHO_ESPERA_MAX", "30")))
+    except Exception:
+        return 30.0
+
+
+class DespachadorRecordatorios:
+    """Dispara recordatorios vencidos desde un min-heap (ProximaEjecucion, Id) en memoria.
+
+    El heap se llena con los proximos disparos (rango sobre el indice
+    EliminadoEn/ProximaEjecucion) y se recarga cada EsperaMaxima o cuando se
+    agota una carga truncada. Las escrituras del propio proceso entran por
+    Programar(). Cada lote avanza ProximaEjecucion (la siguiente ocurrencia o
+    None) y, para los Push, encola sus mensajes en la bandeja de salida en la
+    misma transaccion; la entrega la hace el relay de SalidaService. Los Local
+    solo avanzan, para que los proximos N dias sigan siendo un rango de indice.
+    """
+
+    def __init__(self, TamanoLote: int, TamanoCarga: int, EsperaMaxima: float) -> None:
+        self.TamanoLote = TamanoLote
+        self.TamanoCarga = TamanoCarga
+        self.EsperaMaxima = EsperaMaxima
+        self.Cambios = CambiosService()
+        self.Salida = SalidaService()
+        self._Monticulo: List[Tuple[datetime, int]] = []
+        self._Candado = threading.Lock()
+        self._RecargarEn: Optional[float] = None
+        # Ultima ProximaEjecucion cargada si la carga se trunco (hay pendientes posteriores fuera del heap)
+        self._CorteCarga: Optional[datetime] = None
+        self._Tarea: Optional[TareaProgramada] = None
+
+    def Programar(self, RecordatorioId: int, ProximaEjecucion: datetime) -> None:
+        with self._Candado:
+            heapq.heappush(self._Monticulo, (ProximaEjecucion, RecordatorioId))
+        if self._Tarea is not None:
+            self._Tarea.Despertar()
+
+    def Pendientes(self) -> int:
+        with self._Candado:
+            return len(self._Monticulo)
+
+    def _Recargar(self, SesionBD: Session) -> None:
+        Consulta = (
+            select(Recordatorio.ProximaEjecucion, Recordatorio.Id)
+            .where(Recordatorio.EliminadoEn.is_(None), Recordatorio.ProximaEjecucion.is_not(None))
+            .order_by(Recordatorio.ProximaEjecucion, Recordatorio.Id)
+            .limit(self.TamanoCarga)
+        )
+        filas = [(fecha, rid) for fecha, rid in SesionBD.exec(Consulta)]
+        with self._Candado:
+            # Ya ordenado: es un heap valido
+            self._Monticulo = filas
+            self._CorteCarga = filas[-1][0] if len(filas) >= self.TamanoCarga else None
+        self._RecargarEn = time.monotonic() + self.EsperaMaxima
+
+    def _ExtraerVencidos(self, Ahora: datetime) -> List[int]:
+        ids: Dict[int, None] = {}
+        with self._Candado:
+            while self._Monticulo and self._Monticulo[0][0] <= Ahora and len(ids) < self.TamanoLote:
+                ids[heapq.heappop(self._Monticulo)[1]] = None
+        return list(ids)
+
+    def _NecesitaRecarga(self) -> bool:
+        if self._RecargarEn is None or time.monotonic() >= self._RecargarEn:
+            return True
+        with self._Candado:
+            if self._CorteCarga is None:
+                return False
+            # Se consumio lo cargado: lo siguiente esta solo en la base
+            return not self._Monticulo or self._Monticulo[0][0] > self._CorteCarga
+
+    def _Destinatarios(self, SesionBD: Session, EventoIds: Iterable[int]) -> Dict[int, Set[int]]:
+        ids = list(set(EventoIds))
+        propietarios = select(Evento.Id, Evento.PropietarioId.label("UsuarioId")).where(Evento.Id.in_(ids))
+        participantes = select(ParticipanteEvento.EventoId, ParticipanteEvento.UsuarioId).where(
+            ParticipanteEvento.EventoId.in_(ids)
+        )
+        por_evento: Dict[int, Set[int]] = {}
+        for evento_id, usuario_id in SesionBD.execute(union(propietarios, participantes)):
+            por_evento.setdefault(evento_id, set()).add(usuario_id)
+        return por_evento
+
+    def _Despachar(self, SesionBD: Session, Ids: List[int], Ahora: datetime) -> int:
+        """Marca el lote y encola sus mensajes en una transaccion; devuelve cuantos se despacharon."""
+        # Columnas sueltas: el UPDATE posterior no obliga a recargar entidades
+        Consulta = (
+            select(
+                Recordatorio.Id,
+                Recordatorio.EventoId,
+                Recordatorio.FechaHora,
+                Recordatorio.ProximaEjecucion,
+                Recordatorio.Canal,
+                Recordatorio.Mensaje,
+                Recordatorio.FrecuenciaRepeticion,
+                Recordatorio.IntervaloRepeticion,
+                Recordatorio.DiasSemana,
+                Evento.Titulo,
+            )
+            .join(Evento, Evento.Id == Recordatorio.EventoId)
+            .where(
+                Recordatorio.Id.in_(Ids),
+                Recordatorio.Enviado.is_(False),
+                Recordatorio.EliminadoEn.is_(None),
+                Recordatorio.ProximaEjecucion <= Ahora,
+                Evento.EliminadoEn.is_(None),
+            )
+        )
+        filas = list(SesionBD.exec(Consulta))
+        if not filas:
+            return 0
+        marcar: List[int] = []
+        reprogramar: List[Dict[str, Any]] = []
+        for rid, _evento, fecha, proxima, _canal, _mensaje, frecuencia, intervalo, dias, _titulo in filas:
+            siguiente = SiguienteOcurrencia(fecha, frecuencia, intervalo, dias, Ahora) if frecuencia else None
+            if siguiente is None:
+                marcar.append(rid)
+            else:
+                reprogramar.append({"Id": rid, "Anterior": proxima, "Siguiente": siguiente})
+        # Una sola UPDATE para los de una vez; RETURNING deja fuera los que otro proceso ya tomo
+        tomados: Set[int] = set()
+        if marcar:
+            tomados.update(
+                ActualizarDevolviendoIds(
+                    SesionBD,
+                    Recordatorio,
+                    and_(Recordatorio.Id.in_(marcar), Recordatorio.ProximaEjecucion.is_not(None)),
+                    ProximaEjecucion=None,
+                    # Solo los Push quedan enviados; los Local los muestra el dispositivo
+                    Enviado=case((Recordatorio.Canal == CANAL_SERVIDOR, True), else_=Recordatorio.Enviado),
+                )
+            )
+        if reprogramar:
+            # Recurrentes: avanzan a la siguiente ocurrencia sin tocar FechaHora. La condicion
+            # sobre la ProximaEjecucion leida deja fuera las filas que otro proceso ya avanzo.
+            avanzados = set(
+                ActualizarDevolviendoIds(
+                    SesionBD,
+                    Recordatorio,
+                    or_(
+                        *(
+                            and_(Recordatorio.Id == fila["Id"], Recordatorio.ProximaEjecucion == fila["Anterior"])
+                            for fila in reprogramar
+                        )
+                    ),
+                    ProximaEjecucion=case(
+                        {fila["Id"]: fila["Siguiente"] for fila in reprogramar}, value=Recordatorio.Id
+                    ),
+                )
+            )
+            reprogramar = [fila for fila in reprogramar if fila["Id"] in avanzados]
+            tomados.update(avanzados)
+        self.Cambios.Registrar(SesionBD, "Recordatorio", sorted(tomados), "actualizar", Momento=Ahora)
+        destinatarios = self._Destinatarios(
+            SesionBD, (fila[1] for fila in filas if fila[0] in tomados and fila[4] == CANAL_SERVIDOR)
+        )
+        self.Salida.Encolar(
+            SesionBD,
+            (
+                {
+                    "UsuarioId": usuario_id,
+                    "Tipo": "Recordatorio",
+                    "ReferenciaId": rid,
+                    "Titulo": titulo,
+                    "Cuerpo": mensaje,
+                }
+                for rid, evento_id, _fecha, _proxima, canal, mensaje, _f, _i, _d, titulo in filas
+                if rid in tomados and canal == CANAL_SERVIDOR
+                for usuario_id in sorted(destinatarios.get(evento_id, ()))
+            ),
+        )
+        SesionBD.commit()
+        with self._Candado:
+            for fila in reprogramar:
+                heapq.heappush(self._Monticulo, (fila["Siguiente"], fila["Id"]))
+        return len(tomados)
+
+    def Ejecutar(self, SesionBD: Session, Ahora: Optional[datetime] = None) -> float:
+        """Despacha todo lo vencido y devuelve los segundos hasta el siguiente vencimiento."""
+        ahora = Ahora or datetime.utcnow()
+        if self._NecesitaRecarga():
+            self._Recargar(SesionBD)
+        while True:
+            ids = self._ExtraerVencidos(ahora)
+            if not ids:
+                if self._CorteCarga is not None and self._NecesitaRecarga():
+                    self._Recargar(SesionBD)
+                    ids = self._ExtraerVencidos(ahora)
+                if not ids:
+                    break
+            despachados = self._Despachar(SesionBD, ids, ahora)
+            if despachados:
+                logger.debug("Despachados %d recordatorios", despachados)
+        with self._Candado:
+            proximo = self._Monticulo[0][0] if self._Monticulo else None
+        espera = self.EsperaMaxima
+        if self._RecargarEn is not None:
+            espera = min(espera, max(0.0, self._RecargarEn - time.monotonic()))
+        if proximo is not None:
+            espera = min(espera, max(0.0, (proximo - datetime.utcnow()).total_seconds()))
+        return espera
+
+    def _EjecutarProgramado(self) -> float:
+        with Session(ObtenerEngine()) as SesionBD:
+            return self.Ejecutar(SesionBD)
+
+    def CrearTarea(self) -> TareaProgramada:
+        self._Tarea = TareaProgramada("despacho-recordatorios", self._EjecutarProgramado)
+        return self._Tarea
+
+
+Despachador = DespachadorRecordatorios(
+    ObtenerTamanoLoteDespacho(),
+    ObtenerTamanoCargaDespacho(),
+    ObtenerEsperaMaximaDespacho(),
+)
+
+
+def CrearTareaDespacho() -> TareaProgramada:
+    return Despachador.CrearTarea()
@@ -1,6 +1,7 @@
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from datetime import datetime, timedelta
 
+from sqlalchemy import or_
 from sqlmodel import Session, select
 
 from app.models.Evento import Evento, Recordatorio
@@ -9,7 +10,13 @@ from app.services.UsuariosService import UsuariosService
 from app.services.ParticipantesService import ParticipantesService
 from app.services.BitacoraService import BitacoraService
 from app.services.NotificacionesService import NotificacionesService
+from app.services.OcurrenciasService import OcurrenciasService
+from app.services.CambiosService import CambiosService
+from app.services.DespachoService import Despachador
+from app.core.Database import AlConfirmar, Confirmar
+from app.core.Paginacion import AplicarKeysetId
 from app.core.Permisos import RolParticipante, TienePermiso
+from app.core.Recurrencia import ExpandirOcurrencias, ParseDiasSemana, ProximaEjecucion
 from app.services.exceptions import PermisoDenegadoError
 
 
@@ -19,6 +26,8 @@ class EventosService:
         self.Participantes = ParticipantesService()
         self.Bitacora = BitacoraService()
         self.Notificaciones = NotificacionesService()
+        self.Ocurrencias = OcurrenciasService()
+        self.Cambios = CambiosService()
 
     def _ListaADiasCSV(self, dias: Optional[List[str]]) -> Optional[str]:
         if not dias:
@@ -78,24 +87,47 @@ class EventosService:
             DiasSemana=self._ListaADiasCSV(DiasSemana),
         )
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        SesionBD.flush()
+        self.Ocurrencias.MaterializarEvento(SesionBD, Entidad)
+        self.Cambios.Registrar(SesionBD, "Evento", [Entidad.Id], "crear")
         if SolicitanteId is not None:
             self.Participantes.AsegurarDuenoEvento(SesionBD, Entidad.Id, SolicitanteId)
+        # Refrescar al final: un commit posterior dejaria la entidad expirada para la respuesta
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
-    def ListarEventos(self, SesionBD: Session) -> List[Evento]:
+    def IterarEventos(
+        self,
+        SesionBD: Session,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+        UsuarioId: Optional[int] = None,
+    ) -> Iterator[Evento]:
         Consulta = select(Evento).where(Evento.EliminadoEn.is_(None))
-        return list(SesionBD.exec(Consulta))
+        if UsuarioId is not None:
+            # Solo eventos que el usuario puede leer; el LIMIT se aplica ya filtrado
+            Consulta = Consulta.where(self.Participantes.CondicionAgenda(UsuarioId))
+        yield from SesionBD.exec(AplicarKeysetId(Consulta, Evento.Id, DespuesDeId, Limite))
 
-    def ListarEventosEliminados(
+    def ListarEventos(
+        self,
+        SesionBD: Session,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+        UsuarioId: Optional[int] = None,
+    ) -> List[Evento]:
+        return list(self.IterarEventos(SesionBD, Limite=Limite, DespuesDeId=DespuesDeId, UsuarioId=UsuarioId))
+
+    def IterarEventosEliminados(
         self,
         SesionBD: Session,
         PropietarioId: Optional[int] = None,
         MetaId: Optional[int] = None,
         Desde: Optional[datetime] = None,
         Hasta: Optional[datetime] = None,
-    ) -> List[Evento]:
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> Iterator[Evento]:
         Consulta = select(Evento).where(Evento.EliminadoEn.is_not(None))
         if PropietarioId is not None:
             Consulta = Consulta.where(Evento.PropietarioId == PropietarioId)
@@ -105,108 +137,88 @@ class EventosService:
             Consulta = Consulta.where(Evento.EliminadoEn >= Desde)
         if Hasta is not None:
             Consulta = Consulta.where(Evento.EliminadoEn <= Hasta)
+        yield from SesionBD.exec(AplicarKeysetId(Consulta, Evento.Id, DespuesDeId, Limite))
+
+    def ListarEventosEliminados(
+        self,
+        SesionBD: Session,
+        PropietarioId: Optional[int] = None,
+        MetaId: Optional[int] = None,
+        Desde: Optional[datetime] = None,
+        Hasta: Optional[datetime] = None,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> List[Evento]:
+        return list(
+            self.IterarEventosEliminados(
+                SesionBD,
+                PropietarioId=PropietarioId,
+                MetaId=MetaId,
+                Desde=Desde,
+                Hasta=Hasta,
+                Limite=Limite,
+                DespuesDeId=DespuesDeId,
+            )
+        )
+
+    def ListarCandidatosVentana(
+        self,
+        SesionBD: Session,
+        Desde: datetime,
+        Hasta: datetime,
+        UsuarioId: Optional[int] = None,
+    ) -> List[Evento]:
+        """Eventos no eliminados que pueden tener ocurrencias en [Desde, Hasta].
+
+        Los eventos simples deben cruzar la ventana; las series repetidas solo
+        necesitan haber comenzado antes de Hasta (se expanden despues). Con
+        UsuarioId se limita a su agenda (propios o como participante).
+        """
+        Consulta = select(Evento).where(
+            Evento.EliminadoEn.is_(None),
+            Evento.Inicio <= Hasta,
+            or_(Evento.FrecuenciaRepeticion.is_not(None), Evento.Fin >= Desde),
+        )
+        if UsuarioId is not None:
+            Consulta = Consulta.where(self.Participantes.CondicionAgenda(UsuarioId))
         return list(SesionBD.exec(Consulta))
 
     def _ParseDiasSemana(self, dias_csv: Optional[str]) -> List[int]:
-        mapa = {
-            'Lun': 0,
-            'Mar': 1,
-            'Mie': 2,
-            'Jue': 3,
-            'Vie': 4,
-            'Sab': 5,
-            'Dom': 6,
-        }
-        if not dias_csv:
-            return []
-        return [mapa[d.strip()] for d in dias_csv.split(',') if d.strip() in mapa]
+        return ParseDiasSemana(dias_csv)
 
     def ProyectarOcurrencias(
         self,
         SesionBD: Session,
         Desde: datetime,
         Hasta: datetime,
+        UsuarioId: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         if Hasta <= Desde:
             return []
         ahora = datetime.utcnow()
-        # Consideramos eventos no eliminados
-        eventos = self.ListarEventos(SesionBD)
+        # Las ocurrencias ya terminadas no se devuelven
+        inferior = max(Desde, ahora)
+        condicion = self.Participantes.CondicionAgenda(UsuarioId) if UsuarioId is not None else None
+        materializadas = self.Ocurrencias.ListarEnRango(SesionBD, inferior, Hasta, Condicion=condicion)
+        if materializadas is not None:
+            return materializadas
+        # Fuera del horizonte materializado: expandir solo candidatos de la ventana
+        eventos = self.ListarCandidatosVentana(SesionBD, inferior, Hasta, UsuarioId=UsuarioId)
         ocurrencias: List[Dict[str, Any]] = []
         for ev in eventos:
-            # Ocurrencia base (no repetido)
-            base_ini = ev.Inicio
-            base_fin = ev.Fin
-            # Validacion de ventana
-            if base_ini >= base_fin:
-                continue
-            freq = ev.FrecuenciaRepeticion
-            intervalo = ev.IntervaloRepeticion or 1
-            if not freq:
-                # Evento simple: incluir si cruza el rango
-                if base_fin >= Desde and base_ini <= Hasta and base_fin >= ahora:
-                    ocurrencias.append({
-                        'Titulo': ev.Titulo,
-                        'Inicio': base_ini,
-                        'Fin': base_fin,
-                        'EventoId': ev.Id,
-                    })
+            if ev.Inicio >= ev.Fin:
                 continue
-            # Expandir segun frecuencia
-            cur_ini = base_ini
-            cur_fin = base_fin
-            # Empujar cur_ini a >= Desde si posible por saltos de intervalo
-            # Iterar con limite de seguridad
-            max_iters = 1000
-            if freq == 'Diaria':
-                delta = timedelta(days=intervalo)
-                # avanzar hasta el rango
-                while cur_fin < Desde and max_iters > 0:
-                    cur_ini += delta
-                    cur_fin += delta
-                    max_iters -= 1
-                while cur_ini <= Hasta and max_iters > 0:
-                    if cur_fin >= Desde and cur_fin >= ahora:
-                        ocurrencias.append({'Titulo': ev.Titulo, 'Inicio': cur_ini, 'Fin': cur_fin, 'EventoId': ev.Id})
-                    cur_ini += delta
-                    cur_fin += delta
-                    max_iters -= 1
-            elif freq == 'Semanal':
-                dias = self._ParseDiasSemana(ev.DiasSemana)
-                if not dias:
-                    dias = [base_ini.weekday()]  # si no hay lista, usa el del inicio
-                # Encontrar la primera semana que cae en rango
-                semana_delta = timedelta(weeks=intervalo)
-                # anclar a inicio de semana del base_ini (lunes=0) a medianoche
-                base_week_start = (base_ini - timedelta(days=base_ini.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-                cur_week_start = base_week_start
-                while cur_week_start + timedelta(days=6) < Desde and max_iters > 0:
-                    cur_week_start += semana_delta
-                    max_iters -= 1
-                while cur_week_start <= Hasta and max_iters > 0:
-                    for d in dias:
-                        occ_ini = cur_week_start + timedelta(days=d) + (base_fin - base_ini) * 0
-                        # sumar la hora/min/seg del base_ini
-                        occ_ini = occ_ini.replace(hour=base_ini.hour, minute=base_ini.minute, second=base_ini.second, microsecond=base_ini.microsecond)
-                        dur = base_fin - base_ini
-                        occ_fin = occ_ini + dur
-                        if occ_fin >= Desde and occ_ini <= Hasta and occ_fin >= ahora:
-                            ocurrencias.append({'Titulo': ev.Titulo, 'Inicio': occ_ini, 'Fin': occ_fin, 'EventoId': ev.Id})
-                    cur_week_start += semana_delta
-                    max_iters -= 1
-            elif freq == 'Mensual':
-                # aproximacion simple por meses de 30 dias
-                delta = timedelta(days=30 * intervalo)
-                while cur_fin < Desde and max_iters > 0:
-                    cur_ini += delta
-                    cur_fin += delta
-                    max_iters -= 1
-                while cur_ini <= Hasta and max_iters > 0:
-                    if cur_fin >= Desde and cur_fin >= ahora:
-                        ocurrencias.append({'Titulo': ev.Titulo, 'Inicio': cur_ini, 'Fin': cur_fin, 'EventoId': ev.Id})
-                    cur_ini += delta
-                    cur_fin += delta
-                    max_iters -= 1
+            duracion = ev.Fin - ev.Inicio
+            for inicio in ExpandirOcurrencias(
+                ev.Inicio,
+                ev.FrecuenciaRepeticion,
+                ev.IntervaloRepeticion,
+                ev.DiasSemana,
+                inferior,
+                Hasta,
+                duracion,
+            ):
+                ocurrencias.append({'Titulo': ev.Titulo, 'Inicio': inicio, 'Fin': inicio + duracion, 'EventoId': ev.Id})
         # ordenar por inicio
         ocurrencias.sort(key=lambda x: x['Inicio'])
         return ocurrencias
@@ -261,8 +273,9 @@ class EventosService:
             Entidad.DiasSemana = self._ListaADiasCSV(DiasSemana)
         Entidad.ActualizadoEn = datetime.utcnow()
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self.Ocurrencias.MaterializarEvento(SesionBD, Entidad)
+        self.Cambios.Registrar(SesionBD, "Evento", [Entidad.Id], "actualizar", Momento=Entidad.ActualizadoEn)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
     def EliminarEvento(self, SesionBD: Session, Id: int, SolicitanteId: Optional[int] = None) -> bool:
@@ -279,21 +292,16 @@ class EventosService:
         SesionBD.add(Entidad)
         # Cascada logica: marcar recordatorios relacionados
         Consulta = select(Recordatorio).where(Recordatorio.EventoId == Id, Recordatorio.EliminadoEn.is_(None))
+        recordatorios_eliminados: List[int] = []
         for Rec in SesionBD.exec(Consulta):
             Rec.EliminadoEn = ahora
             SesionBD.add(Rec)
-        participantes = self.Participantes.ListarPorEvento(SesionBD, Id)
-        destinos = {Entidad.PropietarioId}
-        for participante in participantes:
-            destinos.add(participante.UsuarioId)
-        self.Notificaciones.RegistrarEventoEliminado(
-            SesionBD,
-            Id,
-            destinos,
-            f"El evento '{Entidad.Titulo}' fue eliminado",
-            Momento=ahora,
-        )
-        SesionBD.commit()
+            recordatorios_eliminados.append(Rec.Id)
+        self.Ocurrencias.QuitarEventos(SesionBD, [Id])
+        self.Cambios.Registrar(SesionBD, "Evento", [Id], "eliminar", Momento=ahora)
+        self.Cambios.Registrar(SesionBD, "Recordatorio", recordatorios_eliminados, "eliminar", Momento=ahora)
+        self.Notificaciones.NotificarEventosEliminados(SesionBD, [Id], Momento=ahora)
+        Confirmar(SesionBD)
         return True
 
     def RecuperarEvento(self, SesionBD: Session, Id: int, SolicitanteId: Optional[int] = None) -> Optional[Evento]:
@@ -327,8 +335,9 @@ class EventosService:
             Momento=momento,
         )
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self.Ocurrencias.MaterializarEvento(SesionBD, Entidad)
+        self.Cambios.Registrar(SesionBD, "Evento", [Entidad.Id], "recuperar", Momento=momento)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
 
@@ -336,12 +345,40 @@ class RecordatoriosService:
     def __init__(self) -> None:
         self.Participantes = ParticipantesService()
         self.Bitacora = BitacoraService()
+        self.Cambios = CambiosService()
 
     def _ListaADiasCSV(self, dias: Optional[List[str]]) -> Optional[str]:
         if not dias:
             return None
         return ",".join([d.strip() for d in dias if d and d.strip()]) or None
 
+    def _RecalcularProximaEjecucion(self, Entidad: Recordatorio, Desde: Optional[datetime] = None) -> None:
+        if Entidad.Enviado:
+            Entidad.ProximaEjecucion = None
+            return
+        Entidad.ProximaEjecucion = ProximaEjecucion(
+            Entidad.FechaHora,
+            Entidad.FrecuenciaRepeticion,
+            Entidad.IntervaloRepeticion,
+            Entidad.DiasSemana,
+            Desde or datetime.utcnow(),
+        )
+
+    def _ProgramarDespacho(self, SesionBD: Session, Entidad: Recordatorio) -> None:
+        # El despachador avanza ProximaEjecucion (y entrega los Push): se le avisa cuando el cambio ya es visible
+        if Entidad.ProximaEjecucion is not None and Entidad.Id is not None:
+            rid, proxima = Entidad.Id, Entidad.ProximaEjecucion
+            AlConfirmar(SesionBD, lambda: Despachador.Programar(rid, proxima))
+
+    def ReprogramarRecuperados(self, SesionBD: Session, Ids: List[int], Desde: datetime) -> None:
+        """Recalcula ProximaEjecucion de recordatorios recuperados en bloque y los avisa al despachador."""
+        if not Ids:
+            return
+        for Entidad in SesionBD.exec(select(Recordatorio).where(Recordatorio.Id.in_(Ids))):
+            self._RecalcularProximaEjecucion(Entidad, Desde)
+            SesionBD.add(Entidad)
+            self._ProgramarDespacho(SesionBD, Entidad)
+
     def _DiasCSV_ALista(self, csv: Optional[str]) -> Optional[List[str]]:
         if not csv:
             return None
@@ -381,22 +418,31 @@ class RecordatoriosService:
             IntervaloRepeticion=IntervaloRepeticion,
             DiasSemana=self._ListaADiasCSV(DiasSemana),
         )
+        self._RecalcularProximaEjecucion(Entidad)
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        SesionBD.flush()
+        self.Cambios.Registrar(SesionBD, "Recordatorio", [Entidad.Id], "crear")
+        self._ProgramarDespacho(SesionBD, Entidad)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
-    def ListarRecordatorios(self, SesionBD: Session) -> List[Recordatorio]:
+    def ListarRecordatorios(self, SesionBD: Session, UsuarioId: Optional[int] = None) -> List[Recordatorio]:
         Consulta = select(Recordatorio).where(Recordatorio.EliminadoEn.is_(None))
+        if UsuarioId is not None:
+            Consulta = Consulta.where(
+                Recordatorio.EventoId.in_(select(Evento.Id).where(self.Participantes.CondicionAgenda(UsuarioId)))
+            )
         return list(SesionBD.exec(Consulta))
 
-    def ListarRecordatoriosEliminados(
+    def IterarRecordatoriosEliminados(
         self,
         SesionBD: Session,
         EventoId: Optional[int] = None,
         Desde: Optional[datetime] = None,
         Hasta: Optional[datetime] = None,
-    ) -> List[Recordatorio]:
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> Iterator[Recordatorio]:
         Consulta = select(Recordatorio).where(Recordatorio.EliminadoEn.is_not(None))
         if EventoId is not None:
             Consulta = Consulta.where(Recordatorio.EventoId == EventoId)
@@ -404,7 +450,27 @@ class RecordatoriosService:
             Consulta = Consulta.where(Recordatorio.EliminadoEn >= Desde)
         if Hasta is not None:
             Consulta = Consulta.where(Recordatorio.EliminadoEn <= Hasta)
-        return list(SesionBD.exec(Consulta))
+        yield from SesionBD.exec(AplicarKeysetId(Consulta, Recordatorio.Id, DespuesDeId, Limite))
+
+    def ListarRecordatoriosEliminados(
+        self,
+        SesionBD: Session,
+        EventoId: Optional[int] = None,
+        Desde: Optional[datetime] = None,
+        Hasta: Optional[datetime] = None,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> List[Recordatorio]:
+        return list(
+            self.IterarRecordatoriosEliminados(
+                SesionBD,
+                EventoId=EventoId,
+                Desde=Desde,
+                Hasta=Hasta,
+                Limite=Limite,
+                DespuesDeId=DespuesDeId,
+            )
+        )
 
     def Obtener(self, SesionBD: Session, Id: int) -> Optional[Recordatorio]:
         return SesionBD.get(Recordatorio, Id)
@@ -447,10 +513,12 @@ class RecordatoriosService:
             Entidad.DiasSemana = self._ListaADiasCSV(DiasSemana)
         if Entidad.FrecuenciaRepeticion and Entidad.IntervaloRepeticion is not None and Entidad.IntervaloRepeticion <= 0:
             return None
+        self._RecalcularProximaEjecucion(Entidad)
         # No hay actualizadoEn en recordatorio por requerimiento
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self.Cambios.Registrar(SesionBD, "Recordatorio", [Entidad.Id], "actualizar")
+        self._ProgramarDespacho(SesionBD, Entidad)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
     def CalcularProximasFechas(
@@ -462,65 +530,59 @@ class RecordatoriosService:
         if Hasta <= Desde:
             return []
         ahora = datetime.utcnow()
-        fechas: List[datetime] = []
-        freq = Entidad.FrecuenciaRepeticion
-        if not freq:
-            if Entidad.FechaHora >= Desde and Entidad.FechaHora <= Hasta and Entidad.FechaHora >= ahora:
-                return [Entidad.FechaHora]
-            return []
-        intervalo = Entidad.IntervaloRepeticion or 1
-        base = Entidad.FechaHora
-        max_iters = 1000
-        if freq == 'Diaria':
-            delta = timedelta(days=intervalo)
-            cur = base
-            while cur < Desde and max_iters > 0:
-                cur += delta
-                max_iters -= 1
-            while cur <= Hasta and max_iters > 0:
-                if cur >= Desde and cur >= ahora:
-                    fechas.append(cur)
-                cur += delta
-                max_iters -= 1
-        elif freq == 'Semanal':
-            dias = EventosService()._ParseDiasSemana(Entidad.DiasSemana)
-            if not dias:
-                dias = [base.weekday()]
-            semana_delta = timedelta(weeks=intervalo)
-            base_week_start = base - timedelta(days=base.weekday())
-            cur_week_start = base_week_start
-            while cur_week_start + timedelta(days=6) < Desde and max_iters > 0:
-                cur_week_start += semana_delta
-                max_iters -= 1
-            while cur_week_start <= Hasta and max_iters > 0:
-                for d in dias:
-                    occ = cur_week_start + timedelta(days=d, hours=base.hour, minutes=base.minute, seconds=base.second)
-                    if occ >= Desde and occ <= Hasta and occ >= ahora:
-                        fechas.append(occ)
-                cur_week_start += semana_delta
-                max_iters -= 1
-        elif freq == 'Mensual':
-            delta = timedelta(days=30 * intervalo)
-            cur = base
-            while cur < Desde and max_iters > 0:
-                cur += delta
-                max_iters -= 1
-            while cur <= Hasta and max_iters > 0:
-                if cur >= Desde and cur >= ahora:
-                    fechas.append(cur)
-                cur += delta
-                max_iters -= 1
-        return fechas
-
-    def ListarProximos(self, SesionBD: Session, dias: int = 7) -> List[Recordatorio]:
+        return list(
+            ExpandirOcurrencias(
+                Entidad.FechaHora,
+                Entidad.FrecuenciaRepeticion,
+                Entidad.IntervaloRepeticion,
+                Entidad.DiasSemana,
+                max(Desde, ahora),
+                Hasta,
+            )
+        )
+
+    def ListarProximos(self, SesionBD: Session, dias: int = 7, UsuarioId: Optional[int] = None) -> List[Recordatorio]:
+        """Recordatorios cuyo siguiente disparo cae en los proximos dias (incluye recurrentes).
+
+        Rango sobre el indice EliminadoEn/ProximaEjecucion, ordenado por disparo.
+        Los recurrentes cuya ProximaEjecucion ya paso (el despachador no corre
+        en este proceso o va atrasado) se avanzan al leer, sin escribirlos.
+        """
         ahora = datetime.utcnow().replace(microsecond=0)
         futuro = ahora + timedelta(days=dias)
         Consulta = select(Recordatorio).where(
             Recordatorio.EliminadoEn.is_(None),
-            Recordatorio.FechaHora >= ahora,
-            Recordatorio.FechaHora <= futuro,
+            Recordatorio.ProximaEjecucion >= ahora,
+            Recordatorio.ProximaEjecucion <= futuro,
         )
-        return list(SesionBD.exec(Consulta))
+        ConsultaAtrasados = select(Recordatorio).where(
+            Recordatorio.EliminadoEn.is_(None),
+            Recordatorio.ProximaEjecucion < ahora,
+            Recordatorio.FrecuenciaRepeticion.is_not(None),
+        )
+        if UsuarioId is not None:
+            # Agenda: solo recordatorios de eventos propios o con participacion
+            legibles = Recordatorio.EventoId.in_(select(Evento.Id).where(self.Participantes.CondicionAgenda(UsuarioId)))
+            Consulta = Consulta.where(legibles)
+            ConsultaAtrasados = ConsultaAtrasados.where(legibles)
+        Consulta = Consulta.order_by(Recordatorio.ProximaEjecucion, Recordatorio.Id)
+        resultado = list(SesionBD.exec(Consulta))
+        atrasados = []
+        for Entidad in SesionBD.exec(ConsultaAtrasados):
+            siguiente = ProximaEjecucion(
+                Entidad.FechaHora, Entidad.FrecuenciaRepeticion, Entidad.IntervaloRepeticion, Entidad.DiasSemana, ahora
+            )
+            if siguiente is not None and siguiente <= futuro:
+                atrasados.append((Entidad, siguiente))
+        if not atrasados:
+            return resultado
+        for Entidad, siguiente in atrasados:
+            # Copia de solo lectura: el avance real lo persiste el despachador
+            SesionBD.expunge(Entidad)
+            Entidad.ProximaEjecucion = siguiente
+            resultado.append(Entidad)
+        resultado.sort(key=lambda r: (r.ProximaEjecucion, r.Id))
+        return resultado
 
     def EliminarRecordatorio(self, SesionBD: Session, Id: int, SolicitanteId: Optional[int] = None) -> bool:
         Entidad = SesionBD.get(Recordatorio, Id)
@@ -532,7 +594,8 @@ class RecordatoriosService:
                 raise PermisoDenegadoError("RecordatorioInvalido: solo el Dueno puede eliminar el recordatorio")
         Entidad.EliminadoEn = datetime.utcnow()
         SesionBD.add(Entidad)
-        SesionBD.commit()
+        self.Cambios.Registrar(SesionBD, "Recordatorio", [Entidad.Id], "eliminar", Momento=Entidad.EliminadoEn)
+        Confirmar(SesionBD)
         return True
 
     def RecuperarRecordatorio(self, SesionBD: Session, Id: int, SolicitanteId: Optional[int] = None) -> Optional[Recordatorio]:
@@ -551,6 +614,7 @@ class RecordatoriosService:
                 raise PermisoDenegadoError("RecordatorioInvalido: no tienes permisos para recuperar el recordatorio")
         momento = datetime.utcnow()
         Entidad.EliminadoEn = None
+        self._RecalcularProximaEjecucion(Entidad, momento)
         SesionBD.add(Entidad)
         detalle = (
             f"Recuperado por usuario {SolicitanteId}"
@@ -565,6 +629,7 @@ class RecordatoriosService:
             Detalle=detalle,
             Momento=momento,
         )
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self.Cambios.Registrar(SesionBD, "Recordatorio", [Entidad.Id], "recuperar", Momento=momento)
+        self._ProgramarDespacho(SesionBD, Entidad)
+        Confirmar(SesionBD, Entidad)
         return Entidad
@@ -1,6 +1,7 @@
-from typing import List, Optional, Set
+from typing import Any, Iterator, List, Optional, Set
 from datetime import datetime
 
+from sqlalchemy import and_, or_
 from sqlmodel import Session, select
 
 from app.models.Goal import Meta
@@ -8,6 +9,12 @@ from app.models.Evento import Evento, Recordatorio
 from app.services.UsuariosService import UsuariosService
 from app.services.ParticipantesService import ParticipantesService
 from app.services.BitacoraService import BitacoraService
+from app.services.NotificacionesService import NotificacionesService
+from app.services.OcurrenciasService import OcurrenciasService
+from app.services.CambiosService import CambiosService
+from app.services.EventosService import RecordatoriosService
+from app.core.Database import ActualizarDevolviendoIds, Confirmar
+from app.core.Paginacion import AplicarKeysetId
 from app.core.Permisos import RolParticipante, TienePermiso
 from app.services.exceptions import PermisoDenegadoError, ReglaNegocioError
 
@@ -17,45 +24,54 @@ class MetasService:
         self.Usuarios = UsuariosService()
         self.Participantes = ParticipantesService()
         self.Bitacora = BitacoraService()
+        self.Ocurrencias = OcurrenciasService()
+        self.Cambios = CambiosService()
+        self.Notificaciones = NotificacionesService()
+        self.Recordatorios = RecordatoriosService()
 
     def _ObtenerRolMeta(self, SesionBD: Session, MetaEntidad: Meta, UsuarioId: int) -> Optional[RolParticipante]:
         return self.Participantes.RolEnMeta(SesionBD, MetaEntidad, UsuarioId)
 
+    def _CascadaEventos(self, SesionBD: Session, CondicionEventos: Any, Fecha: datetime) -> List[int]:
+        """Elimina logicamente, en sentencias masivas, los eventos de la condicion y sus recordatorios.
+
+        Devuelve los Id de los eventos que quedaron eliminados en esta cascada.
+        """
+        eventos = ActualizarDevolviendoIds(
+            SesionBD, Evento, and_(CondicionEventos, Evento.EliminadoEn.is_(None)), EliminadoEn=Fecha
+        )
+        recordatorios = ActualizarDevolviendoIds(
+            SesionBD,
+            Recordatorio,
+            and_(
+                Recordatorio.EventoId.in_(select(Evento.Id).where(CondicionEventos)),
+                Recordatorio.EliminadoEn.is_(None),
+            ),
+            EliminadoEn=Fecha,
+        )
+        self.Ocurrencias.QuitarEventos(SesionBD, eventos)
+        self.Notificaciones.NotificarEventosEliminados(SesionBD, eventos, Momento=Fecha)
+        self.Cambios.Registrar(SesionBD, "Evento", eventos, "eliminar", Momento=Fecha)
+        self.Cambios.Registrar(SesionBD, "Recordatorio", recordatorios, "eliminar", Momento=Fecha)
+        return eventos
+
     def _AplicarCascadaMeta(self, SesionBD: Session, MetaEntidad: Meta, Fecha: datetime) -> Set[int]:
-        eventos_afectados: Set[int] = set()
-        ConsultaEventos = select(Evento).where(Evento.MetaId == MetaEntidad.Id)
-        for evento in SesionBD.exec(ConsultaEventos):
-            eventos_afectados.add(evento.Id)
-            if evento.EliminadoEn is None:
-                evento.EliminadoEn = Fecha
-                SesionBD.add(evento)
-            ConsultaRecordatorios = select(Recordatorio).where(Recordatorio.EventoId == evento.Id)
-            for recordatorio in SesionBD.exec(ConsultaRecordatorios):
-                if recordatorio.EliminadoEn is None:
-                    recordatorio.EliminadoEn = Fecha
-                    SesionBD.add(recordatorio)
-        return eventos_afectados
+        return set(self._CascadaEventos(SesionBD, Evento.MetaId == MetaEntidad.Id, Fecha))
 
     def CascadaPorUsuario(self, SesionBD: Session, UsuarioId: int, Fecha: datetime) -> None:
-        ConsultaMetas = select(Meta).where(Meta.PropietarioId == UsuarioId)
-        eventos_cascada = set()
-        for meta in SesionBD.exec(ConsultaMetas):
-            if meta.EliminadoEn is None:
-                meta.EliminadoEn = Fecha
-                SesionBD.add(meta)
-            eventos_cascada.update(self._AplicarCascadaMeta(SesionBD, meta, Fecha))
-        ConsultaEventos = select(Evento).where(Evento.PropietarioId == UsuarioId)
-        for evento in SesionBD.exec(ConsultaEventos):
-            if evento.Id in eventos_cascada:
-                continue
-            if evento.EliminadoEn is None:
-                evento.EliminadoEn = Fecha
-                SesionBD.add(evento)
-            ConsultaRecordatorios = select(Recordatorio).where(Recordatorio.EventoId == evento.Id)
-            for recordatorio in SesionBD.exec(ConsultaRecordatorios):
-                if recordatorio.EliminadoEn is None:
-                    recordatorio.EliminadoEn = Fecha
-                    SesionBD.add(recordatorio)
+        metas = ActualizarDevolviendoIds(
+            SesionBD, Meta, and_(Meta.PropietarioId == UsuarioId, Meta.EliminadoEn.is_(None)), EliminadoEn=Fecha
+        )
+        self.Cambios.Registrar(SesionBD, "Meta", metas, "eliminar", Momento=Fecha)
+        # Eventos de sus metas (incluidas las ya eliminadas) y eventos propios en metas ajenas
+        self._CascadaEventos(
+            SesionBD,
+            or_(
+                Evento.MetaId.in_(select(Meta.Id).where(Meta.PropietarioId == UsuarioId)),
+                Evento.PropietarioId == UsuarioId,
+            ),
+            Fecha,
+        )
 
     def CrearMeta(
         self,
@@ -72,21 +88,42 @@ class MetasService:
             return None
         Entidad = Meta(PropietarioId=PropietarioId, Titulo=Titulo, Descripcion=Descripcion, TipoMeta=TipoMeta)
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        SesionBD.flush()
+        self.Cambios.Registrar(SesionBD, "Meta", [Entidad.Id], "crear")
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
-    def ListarMetas(self, SesionBD: Session) -> List[Meta]:
+    def IterarMetas(
+        self,
+        SesionBD: Session,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+        UsuarioId: Optional[int] = None,
+    ) -> Iterator[Meta]:
         Consulta = select(Meta).where(Meta.EliminadoEn.is_(None))
-        return list(SesionBD.exec(Consulta))
+        if UsuarioId is not None:
+            # Solo metas que el usuario puede leer; el LIMIT se aplica ya filtrado
+            Consulta = Consulta.where(self.Participantes.CondicionLecturaMeta(UsuarioId))
+        yield from SesionBD.exec(AplicarKeysetId(Consulta, Meta.Id, DespuesDeId, Limite))
 
-    def ListarMetasEliminadas(
+    def ListarMetas(
+        self,
+        SesionBD: Session,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+        UsuarioId: Optional[int] = None,
+    ) -> List[Meta]:
+        return list(self.IterarMetas(SesionBD, Limite=Limite, DespuesDeId=DespuesDeId, UsuarioId=UsuarioId))
+
+    def IterarMetasEliminadas(
         self,
         SesionBD: Session,
         PropietarioId: Optional[int] = None,
         Desde: Optional[datetime] = None,
         Hasta: Optional[datetime] = None,
-    ) -> List[Meta]:
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> Iterator[Meta]:
         Consulta = select(Meta).where(Meta.EliminadoEn.is_not(None))
         if PropietarioId is not None:
             Consulta = Consulta.where(Meta.PropietarioId == PropietarioId)
@@ -94,7 +131,27 @@ class MetasService:
             Consulta = Consulta.where(Meta.EliminadoEn >= Desde)
         if Hasta is not None:
             Consulta = Consulta.where(Meta.EliminadoEn <= Hasta)
-        return list(SesionBD.exec(Consulta))
+        yield from SesionBD.exec(AplicarKeysetId(Consulta, Meta.Id, DespuesDeId, Limite))
+
+    def ListarMetasEliminadas(
+        self,
+        SesionBD: Session,
+        PropietarioId: Optional[int] = None,
+        Desde: Optional[datetime] = None,
+        Hasta: Optional[datetime] = None,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> List[Meta]:
+        return list(
+            self.IterarMetasEliminadas(
+                SesionBD,
+                PropietarioId=PropietarioId,
+                Desde=Desde,
+                Hasta=Hasta,
+                Limite=Limite,
+                DespuesDeId=DespuesDeId,
+            )
+        )
 
     def Obtener(self, SesionBD: Session, Id: int) -> Optional[Meta]:
         return SesionBD.get(Meta, Id)
@@ -123,8 +180,8 @@ class MetasService:
             Entidad.TipoMeta = TipoMeta
         Entidad.ActualizadoEn = datetime.utcnow()
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self.Cambios.Registrar(SesionBD, "Meta", [Entidad.Id], "actualizar", Momento=Entidad.ActualizadoEn)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
     def EliminarMeta(self, SesionBD: Session, Id: int, SolicitanteId: Optional[int] = None) -> bool:
@@ -143,10 +200,57 @@ class MetasService:
         Entidad.EliminadoEn = ahora
         SesionBD.add(Entidad)
         self._AplicarCascadaMeta(SesionBD, Entidad, ahora)
-        SesionBD.commit()
+        self.Cambios.Registrar(SesionBD, "Meta", [Entidad.Id], "eliminar", Momento=ahora)
+        Confirmar(SesionBD)
         return True
 
-    def RecuperarMeta(self, SesionBD: Session, Id: int, SolicitanteId: Optional[int] = None) -> Optional[Meta]:
+    def _RecuperarCascada(
+        self,
+        SesionBD: Session,
+        MetaId: int,
+        EliminadaEn: datetime,
+        Momento: datetime,
+        SolicitanteId: Optional[int],
+    ) -> None:
+        """Restaura eventos y recordatorios de la meta eliminados en la misma cascada (mismo EliminadoEn)."""
+        eventos = ActualizarDevolviendoIds(
+            SesionBD,
+            Evento,
+            and_(Evento.MetaId == MetaId, Evento.EliminadoEn == EliminadaEn),
+            EliminadoEn=None,
+            ActualizadoEn=Momento,
+        )
+        recordatorios = ActualizarDevolviendoIds(
+            SesionBD,
+            Recordatorio,
+            and_(
+                Recordatorio.EventoId.in_(select(Evento.Id).where(Evento.MetaId == MetaId)),
+                Recordatorio.EliminadoEn == EliminadaEn,
+            ),
+            EliminadoEn=None,
+        )
+        # Mientras estuvieron eliminados el despachador los ignoro: su proximo disparo se recalcula
+        self.Recordatorios.ReprogramarRecuperados(SesionBD, recordatorios, Momento)
+        detalle = f"Recuperado en cascada con la meta {MetaId}"
+        # Rastro durable: se inserta en la misma transaccion que la recuperacion masiva
+        self.Bitacora.RegistrarRecuperaciones(
+            SesionBD, "Evento", eventos, SolicitanteId, Detalle=detalle, Momento=Momento, Durable=True
+        )
+        self.Bitacora.RegistrarRecuperaciones(
+            SesionBD, "Recordatorio", recordatorios, SolicitanteId, Detalle=detalle, Momento=Momento, Durable=True
+        )
+        self.Ocurrencias.MaterializarEventos(SesionBD, eventos)
+        self.Cambios.Registrar(SesionBD, "Evento", eventos, "recuperar", Momento=Momento)
+        self.Cambios.Registrar(SesionBD, "Recordatorio", recordatorios, "recuperar", Momento=Momento)
+
+    def RecuperarMeta(
+        self,
+        SesionBD: Session,
+        Id: int,
+        SolicitanteId: Optional[int] = None,
+        Cascada: bool = False,
+    ) -> Optional[Meta]:
+        """Recupera la meta; con Cascada tambien lo que se elimino junto con ella."""
         Entidad = SesionBD.get(Meta, Id)
         if not Entidad:
             return None
@@ -157,6 +261,7 @@ class MetasService:
         if Entidad.EliminadoEn is None:
             return Entidad
         momento = datetime.utcnow()
+        eliminada_en = Entidad.EliminadoEn
         Entidad.EliminadoEn = None
         Entidad.ActualizadoEn = momento
         detalle = (
@@ -173,6 +278,8 @@ class MetasService:
             Momento=momento,
         )
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self.Cambios.Registrar(SesionBD, "Meta", [Entidad.Id], "recuperar", Momento=momento)
+        if Cascada:
+            self._RecuperarCascada(SesionBD, Entidad.Id, eliminada_en, momento, SolicitanteId)
+        Confirmar(SesionBD, Entidad)
         return Entidad
@@ -1,34 +1,125 @@
+from collections import Counter
 from datetime import datetime
-from typing import Iterable, List, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional
 
+from sqlalchemy import case, func, insert, union, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlmodel import Session, select
 
-from app.models.Notificacion import NotificacionSistema
+from app.core.Database import AlConfirmar
+from app.core.PubSub import BusNotificaciones
+from app.models.Evento import Evento, ParticipanteEvento
+from app.models.Notificacion import ConteoNotificaciones, NotificacionSistema
+from app.services.SalidaService import SalidaService
+
+
+_TAMANO_BLOQUE_IDS = 500
 
 
 class NotificacionesService:
-    def RegistrarEventoEliminado(
+    def __init__(self) -> None:
+        self.Salida = SalidaService()
+
+    def _Insertar(self, SesionBD: Session, Filas: List[Dict[str, Any]]) -> int:
+        if Filas:
+            SesionBD.execute(insert(NotificacionSistema), Filas)
+            self._SumarNoLeidas(SesionBD, Counter(fila["UsuarioId"] for fila in Filas))
+            destinatarios = {fila["UsuarioId"] for fila in Filas}
+            # Despertar los streams SSE solo cuando las filas ya son visibles
+            AlConfirmar(SesionBD, lambda: BusNotificaciones.Publicar(destinatarios))
+        return len(Filas)
+
+    def _EncolarPush(self, SesionBD: Session, Filas: List[Dict[str, Any]]) -> None:
+        """Copia las notificaciones a la bandeja de salida push en la misma transaccion."""
+        self.Salida.Encolar(
+            SesionBD,
+            (
+                {"UsuarioId": fila["UsuarioId"], "Tipo": fila["Tipo"], "ReferenciaId": fila["ReferenciaId"], "Titulo": fila["Mensaje"]}
+                for fila in Filas
+            ),
+        )
+
+    def _SumarNoLeidas(self, SesionBD: Session, PorUsuario: Dict[int, int]) -> None:
+        """Incrementa los contadores con un solo upsert multi-fila."""
+        if not PorUsuario:
+            return
+        filas = [{"UsuarioId": uid, "NoLeidas": n} for uid, n in PorUsuario.items()]
+        dialecto = SesionBD.get_bind().dialect.name
+        if dialecto in ("sqlite", "postgresql"):
+            modulo = sqlite if dialecto == "sqlite" else postgresql
+            sentencia = modulo.insert(ConteoNotificaciones)
+            sentencia = sentencia.on_conflict_do_update(
+                index_elements=[ConteoNotificaciones.UsuarioId],
+                set_={"NoLeidas": ConteoNotificaciones.NoLeidas + sentencia.excluded.NoLeidas},
+            )
+            SesionBD.execute(sentencia, filas)
+            return
+        for fila in filas:
+            resultado = SesionBD.execute(
+                update(ConteoNotificaciones)
+                .where(ConteoNotificaciones.UsuarioId == fila["UsuarioId"])
+                .values(NoLeidas=ConteoNotificaciones.NoLeidas + fila["NoLeidas"])
+            )
+            if resultado.rowcount == 0:
+                SesionBD.execute(insert(ConteoNotificaciones), [fila])
+
+    def _RestarNoLeidas(self, SesionBD: Session, UsuarioId: int, Cantidad: int) -> None:
+        if Cantidad <= 0:
+            return
+        SesionBD.execute(
+            update(ConteoNotificaciones)
+            .where(ConteoNotificaciones.UsuarioId == UsuarioId)
+            .values(
+                NoLeidas=case(
+                    (ConteoNotificaciones.NoLeidas > Cantidad, ConteoNotificaciones.NoLeidas - Cantidad),
+                    else_=0,
+                )
+            )
+        )
+
+    def ContarNoLeidas(self, SesionBD: Session, UsuarioId: int) -> int:
+        Entidad = SesionBD.get(ConteoNotificaciones, UsuarioId)
+        return Entidad.NoLeidas if Entidad is not None else 0
+
+    def NotificarEventosEliminados(
         self,
         SesionBD: Session,
-        EventoId: int,
-        UsuariosDestino: Iterable[int],
-        Mensaje: str,
+        EventoIds: Iterable[int],
         Momento: Optional[datetime] = None,
-    ) -> None:
-        vistos: Set[int] = set()
+    ) -> int:
+        """Notifica a dueno y participantes de cada evento eliminado.
+
+        Los destinatarios salen de una consulta de proyeccion (UNION de
+        propietarios y participantes) y las notificaciones se insertan en un
+        INSERT multi-fila por bloque de eventos, junto con su mensaje push en
+        la bandeja de salida. Devuelve cuantas se crearon.
+        """
+        ids = list(dict.fromkeys(EventoIds))
         instante = Momento or datetime.utcnow()
-        for usuario_id in UsuariosDestino:
-            if usuario_id in vistos:
-                continue
-            vistos.add(usuario_id)
-            entrada = NotificacionSistema(
-                UsuarioId=usuario_id,
-                Tipo="EventoEliminado",
-                ReferenciaId=EventoId,
-                Mensaje=Mensaje,
-                CreadoEn=instante,
+        total = 0
+        for inicio in range(0, len(ids), _TAMANO_BLOQUE_IDS):
+            bloque = ids[inicio:inicio + _TAMANO_BLOQUE_IDS]
+            propietarios = select(Evento.Id, Evento.Titulo, Evento.PropietarioId.label("UsuarioId")).where(
+                Evento.Id.in_(bloque)
             )
-            SesionBD.add(entrada)
+            participantes = (
+                select(Evento.Id, Evento.Titulo, ParticipanteEvento.UsuarioId)
+                .join(Evento, Evento.Id == ParticipanteEvento.EventoId)
+                .where(ParticipanteEvento.EventoId.in_(bloque))
+            )
+            filas = [
+                {
+                    "UsuarioId": usuario_id,
+                    "Tipo": "EventoEliminado",
+                    "ReferenciaId": evento_id,
+                    "Mensaje": f"El evento '{titulo}' fue eliminado",
+                    "CreadoEn": instante,
+                }
+                for evento_id, titulo, usuario_id in SesionBD.execute(union(propietarios, participantes))
+            ]
+            total += self._Insertar(SesionBD, filas)
+            self._EncolarPush(SesionBD, filas)
+        return total
 
     def ListarPendientes(
         self,
@@ -42,6 +133,26 @@ class NotificacionesService:
         Consulta = Consulta.order_by(NotificacionSistema.CreadoEn.desc())
         return list(SesionBD.exec(Consulta))
 
+    def ListarDesde(
+        self,
+        SesionBD: Session,
+        UsuarioId: int,
+        DespuesDeId: int,
+        Limite: int = 500,
+    ) -> List[NotificacionSistema]:
+        """Notificaciones del usuario con Id > DespuesDeId en orden de creacion (para el stream)."""
+        Consulta = (
+            select(NotificacionSistema)
+            .where(NotificacionSistema.UsuarioId == UsuarioId, NotificacionSistema.Id > DespuesDeId)
+            .order_by(NotificacionSistema.Id)
+            .limit(Limite)
+        )
+        return list(SesionBD.exec(Consulta))
+
+    def UltimoId(self, SesionBD: Session, UsuarioId: int) -> int:
+        Consulta = select(func.max(NotificacionSistema.Id)).where(NotificacionSistema.UsuarioId == UsuarioId)
+        return SesionBD.exec(Consulta).one() or 0
+
     def MarcarLeida(self, SesionBD: Session, Id: int) -> bool:
         Entidad = SesionBD.get(NotificacionSistema, Id)
         if Entidad is None:
@@ -49,4 +160,26 @@ class NotificacionesService:
         if Entidad.LeidaEn is None:
             Entidad.LeidaEn = datetime.utcnow()
             SesionBD.add(Entidad)
+            self._RestarNoLeidas(SesionBD, Entidad.UsuarioId, 1)
         return True
+
+    def MarcarLeidas(
+        self,
+        SesionBD: Session,
+        UsuarioId: int,
+        Ids: Optional[Iterable[int]] = None,
+        Hasta: Optional[datetime] = None,
+    ) -> int:
+        """Marca como leidas, en un UPDATE, las no leidas del usuario por Ids o con CreadoEn <= Hasta."""
+        condiciones = [NotificacionSistema.UsuarioId == UsuarioId, NotificacionSistema.LeidaEn.is_(None)]
+        if Ids is not None:
+            condiciones.append(NotificacionSistema.Id.in_(list(Ids)))
+        if Hasta is not None:
+            condiciones.append(NotificacionSistema.CreadoEn <= Hasta)
+        resultado = SesionBD.execute(
+            update(NotificacionSistema).where(*condiciones).values(LeidaEn=datetime.utcnow()),
+            execution_options={"synchronize_session": False},
+        )
+        marcadas = resultado.rowcount or 0
+        self._RestarNoLeidas(SesionBD, UsuarioId, marcadas)
+        return marcadas
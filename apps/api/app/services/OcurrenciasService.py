@@ -0,0 +1,199 @@
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime, timedelta
+import os
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import Session, select
+
+from app.models.Evento import Evento
+from app.models.Ocurrencia import Ocurrencia, HorizonteOcurrencias
+from app.core.Database import ObtenerEngine
+from app.core.Recurrencia import ExpandirOcurrencias
+from app.core.TareasFondo import TareaPeriodica
+
+
+def ObtenerDiasHorizonte() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_HORIZONTE_OCURRENCIAS_DIAS", "90")))
+    except Exception:
+        return 90
+
+
+def ObtenerSegundosRefrescoHorizonte() -> float:
+    try:
+        return max(60.0, float(os.getenv("MYPLANU_HORIZONTE_REFRESCO_SEGUNDOS", "3600")))
+    except Exception:
+        return 3600.0
+
+
+class OcurrenciasService:
+    """Mantiene la tabla ocurrencia (eventos expandidos) dentro de un horizonte movil."""
+
+    def ObtenerHorizonte(self, SesionBD: Session) -> Optional[HorizonteOcurrencias]:
+        return SesionBD.get(HorizonteOcurrencias, 1)
+
+    def _Expandir(self, EventoEntidad: Evento, Desde: datetime, Hasta: datetime) -> List[Dict[str, Any]]:
+        if EventoEntidad.Inicio >= EventoEntidad.Fin:
+            return []
+        duracion = EventoEntidad.Fin - EventoEntidad.Inicio
+        return [
+            {"EventoId": EventoEntidad.Id, "Inicio": inicio, "Fin": inicio + duracion}
+            for inicio in ExpandirOcurrencias(
+                EventoEntidad.Inicio,
+                EventoEntidad.FrecuenciaRepeticion,
+                EventoEntidad.IntervaloRepeticion,
+                EventoEntidad.DiasSemana,
+                Desde,
+                Hasta,
+                duracion,
+            )
+        ]
+
+    def _Insertar(self, SesionBD: Session, Filas: List[Dict[str, Any]]) -> None:
+        if Filas:
+            SesionBD.execute(insert(Ocurrencia), Filas)
+
+    def QuitarEventos(self, SesionBD: Session, EventoIds: Iterable[int]) -> None:
+        ids = list(EventoIds)
+        if ids:
+            SesionBD.execute(delete(Ocurrencia).where(Ocurrencia.EventoId.in_(ids)))
+
+    def _BloquearHorizonte(self, SesionBD: Session) -> Optional[HorizonteOcurrencias]:
+        """Relee el horizonte y toma el mismo bloqueo de fila que ExtenderHorizonte.
+
+        El UPDATE sin cambios, condicionado al Hasta leido, retiene la fila
+        hasta el commit: una extension concurrente espera y despues ve el
+        evento; si la extension gano, el Hasta ya cambio y se vuelve a leer.
+        """
+        while True:
+            Consulta = (
+                select(HorizonteOcurrencias)
+                .where(HorizonteOcurrencias.Id == 1)
+                .execution_options(populate_existing=True)
+            )
+            horizonte = SesionBD.exec(Consulta).first()
+            if horizonte is None:
+                return None
+            resultado = SesionBD.execute(
+                update(HorizonteOcurrencias)
+                .where(HorizonteOcurrencias.Id == 1, HorizonteOcurrencias.Hasta == horizonte.Hasta)
+                .values(Hasta=horizonte.Hasta)
+            )
+            if resultado.rowcount == 1:
+                return horizonte
+
+    def MaterializarEvento(self, SesionBD: Session, EventoEntidad: Evento) -> None:
+        """Reemplaza las ocurrencias del evento; no hace nada si aun no hay horizonte."""
+        if EventoEntidad.Id is None:
+            return
+        horizonte = self._BloquearHorizonte(SesionBD)
+        if horizonte is None:
+            return
+        self.QuitarEventos(SesionBD, [EventoEntidad.Id])
+        if EventoEntidad.EliminadoEn is not None:
+            return
+        self._Insertar(SesionBD, self._Expandir(EventoEntidad, horizonte.Desde, horizonte.Hasta))
+
+    def MaterializarEventos(self, SesionBD: Session, EventoIds: Iterable[int]) -> None:
+        ids = list(EventoIds)
+        if not ids:
+            return
+        horizonte = self._BloquearHorizonte(SesionBD)
+        if horizonte is None:
+            return
+        self.QuitarEventos(SesionBD, ids)
+        Consulta = select(Evento).where(Evento.Id.in_(ids), Evento.EliminadoEn.is_(None))
+        filas: List[Dict[str, Any]] = []
+        for ev in SesionBD.exec(Consulta):
+            filas.extend(self._Expandir(ev, horizonte.Desde, horizonte.Hasta))
+        self._Insertar(SesionBD, filas)
+
+    def ExtenderHorizonte(self, SesionBD: Session, Dias: Optional[int] = None) -> HorizonteOcurrencias:
+        """Avanza la ventana materializada hasta ahora + Dias y confirma la transaccion.
+
+        Solo se expanden las ocurrencias nuevas (inicio posterior al Hasta
+        anterior) y se purgan las que ya terminaron.
+        """
+        ahora = datetime.utcnow()
+        nuevo_hasta = ahora + timedelta(days=Dias or ObtenerDiasHorizonte())
+        horizonte = self.ObtenerHorizonte(SesionBD)
+        if horizonte is None:
+            horizonte = HorizonteOcurrencias(Id=1, Desde=ahora, Hasta=nuevo_hasta, ActualizadoEn=ahora)
+            SesionBD.add(horizonte)
+            SesionBD.flush()
+            Consulta = select(Evento).where(
+                Evento.EliminadoEn.is_(None),
+                Evento.Inicio <= nuevo_hasta,
+                or_(Evento.FrecuenciaRepeticion.is_not(None), Evento.Fin >= ahora),
+            )
+            filas: List[Dict[str, Any]] = []
+            for ev in SesionBD.exec(Consulta):
+                filas.extend(self._Expandir(ev, ahora, nuevo_hasta))
+            self._Insertar(SesionBD, filas)
+            SesionBD.commit()
+            SesionBD.refresh(horizonte)
+            return horizonte
+        if nuevo_hasta <= horizonte.Hasta:
+            return horizonte
+        hasta_anterior = horizonte.Hasta
+        # Bloqueo optimista: si otro proceso ya avanzo el horizonte no se duplica el trabajo
+        resultado = SesionBD.execute(
+            update(HorizonteOcurrencias)
+            .where(HorizonteOcurrencias.Id == 1, HorizonteOcurrencias.Hasta == hasta_anterior)
+            .values(Desde=ahora, Hasta=nuevo_hasta, ActualizadoEn=ahora)
+        )
+        if resultado.rowcount != 1:
+            SesionBD.rollback()
+            return self.ObtenerHorizonte(SesionBD) or horizonte
+        SesionBD.execute(delete(Ocurrencia).where(Ocurrencia.Fin < ahora))
+        Consulta = select(Evento).where(
+            Evento.EliminadoEn.is_(None),
+            Evento.Inicio <= nuevo_hasta,
+            or_(Evento.FrecuenciaRepeticion.is_not(None), Evento.Inicio > hasta_anterior),
+        )
+        filas = []
+        for ev in SesionBD.exec(Consulta):
+            filas.extend(
+                fila for fila in self._Expandir(ev, hasta_anterior, nuevo_hasta) if fila["Inicio"] > hasta_anterior
+            )
+        self._Insertar(SesionBD, filas)
+        SesionBD.commit()
+        SesionBD.expire(horizonte)
+        return self.ObtenerHorizonte(SesionBD) or horizonte
+
+    def ListarEnRango(
+        self,
+        SesionBD: Session,
+        Desde: datetime,
+        Hasta: datetime,
+        Condicion: Optional[ColumnElement[bool]] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Ocurrencias materializadas en [Desde, Hasta]; None si el horizonte no cubre el rango.
+
+        Condicion es un filtro opcional adicional sobre Evento (ej. la agenda de un usuario).
+        """
+        horizonte = self.ObtenerHorizonte(SesionBD)
+        if horizonte is None or Desde < horizonte.Desde or Hasta > horizonte.Hasta:
+            return None
+        Consulta = (
+            select(Ocurrencia.EventoId, Ocurrencia.Inicio, Ocurrencia.Fin, Evento.Titulo)
+            .join(Evento, Evento.Id == Ocurrencia.EventoId)
+            .where(Ocurrencia.Inicio <= Hasta, Ocurrencia.Fin >= Desde, Evento.EliminadoEn.is_(None))
+            .order_by(Ocurrencia.Inicio, Ocurrencia.EventoId)
+        )
+        if Condicion is not None:
+            Consulta = Consulta.where(Condicion)
+        return [
+            {'Titulo': titulo, 'Inicio': inicio, 'Fin': fin, 'EventoId': evento_id}
+            for evento_id, inicio, fin, titulo in SesionBD.exec(Consulta)
+        ]
+
+
+def _ExtenderHorizonteProgramado() -> None:
+    with Session(ObtenerEngine()) as SesionBD:
+        OcurrenciasService().ExtenderHorizonte(SesionBD)
+
+
+def CrearTareaHorizonte() -> TareaPeriodica:
+    return TareaPeriodica("horizonte-ocurrencias", ObtenerSegundosRefrescoHorizonte(), _ExtenderHorizonteProgramado)
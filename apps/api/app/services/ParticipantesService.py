@@ -1,10 +1,14 @@
-from typing import List, Optional, Set
+from typing import Iterable, List, Optional, Set
 from datetime import datetime
 
+from sqlalchemy import exists, or_
+from sqlalchemy.sql.elements import ColumnElement
 from sqlmodel import Session, select
 
 from app.models.Evento import Evento, ParticipanteEvento
 from app.models.Goal import Usuario, Meta
+from app.core.CachePermisos import InvalidarRoles, InvalidarRolesSesion, RolCacheado
+from app.core.Database import AlConfirmar, Confirmar
 from app.core.Permisos import RolParticipante
 
 
@@ -13,6 +17,24 @@ class ParticipantesService:
         Consulta = select(ParticipanteEvento).where(ParticipanteEvento.EventoId == EventoId)
         return list(SesionBD.exec(Consulta))
 
+    def CondicionAgenda(self, UsuarioId: int) -> ColumnElement[bool]:
+        """Filtro SQL sobre Evento: eventos propios o con participacion del usuario."""
+        return or_(
+            Evento.PropietarioId == UsuarioId,
+            Evento.Id.in_(select(ParticipanteEvento.EventoId).where(ParticipanteEvento.UsuarioId == UsuarioId)),
+        )
+
+    def CondicionLecturaMeta(self, UsuarioId: int) -> ColumnElement[bool]:
+        """Filtro SQL sobre Meta: propias o con participacion en alguno de sus eventos (como RolEnMeta)."""
+        return or_(
+            Meta.PropietarioId == UsuarioId,
+            exists(
+                select(ParticipanteEvento.Id)
+                .join(Evento, Evento.Id == ParticipanteEvento.EventoId)
+                .where(Evento.MetaId == Meta.Id, ParticipanteEvento.UsuarioId == UsuarioId)
+            ),
+        )
+
     def _ContarDuenos(self, SesionBD: Session, EventoId: int) -> int:
         Consulta = select(ParticipanteEvento).where(
             ParticipanteEvento.EventoId == EventoId,
@@ -20,6 +42,29 @@ class ParticipantesService:
         )
         return len(list(SesionBD.exec(Consulta)))
 
+    def _RegistrarCambioEvento(self, SesionBD: Session, EventoId: int) -> None:
+        # La participacion cambia la visibilidad del evento: se publica como actualizacion
+        # (import diferido: CambiosService depende de este servicio)
+        from app.services.CambiosService import CambiosService
+
+        CambiosService().Registrar(SesionBD, "Evento", [EventoId], "actualizar")
+        self.InvalidarRoles(SesionBD, [EventoId])
+
+    def InvalidarRoles(self, SesionBD: Session, EventoIds: Iterable[int]) -> None:
+        """Olvida los roles cacheados de los eventos y de sus metas tras cambiar participantes.
+
+        La memo de la sesion se descarta en el acto; la cache compartida, al
+        confirmar (antes otras peticiones aun ven y cachean el estado anterior).
+        """
+        ids = list(dict.fromkeys(EventoIds))
+        if not ids:
+            return
+        InvalidarRolesSesion(SesionBD)
+        claves = [("Evento", evento_id) for evento_id in ids]
+        metas = SesionBD.exec(select(Evento.MetaId).where(Evento.Id.in_(ids)).distinct())
+        claves.extend(("Meta", meta_id) for meta_id in metas)
+        AlConfirmar(SesionBD, lambda: InvalidarRoles(claves))
+
     def AgregarParticipante(
         self,
         SesionBD: Session,
@@ -42,8 +87,8 @@ class ParticipantesService:
             CreadoEn=datetime.utcnow(),
         )
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self._RegistrarCambioEvento(SesionBD, EventoId)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
     def CambiarRol(self, SesionBD: Session, Id: int, NuevoRol: RolParticipante) -> Optional[ParticipanteEvento]:
@@ -54,8 +99,8 @@ class ParticipantesService:
             return None
         Entidad.Rol = NuevoRol.value
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        self._RegistrarCambioEvento(SesionBD, Entidad.EventoId)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
     def QuitarParticipante(self, SesionBD: Session, Id: int) -> bool:
@@ -65,46 +110,60 @@ class ParticipantesService:
         if Entidad.Rol == 'Dueno':
             # No permitir quitar Dueno sin transferencia
             return False
+        evento_id, usuario_id = Entidad.EventoId, Entidad.UsuarioId
         SesionBD.delete(Entidad)
-        SesionBD.commit()
+        self._RegistrarCambioEvento(SesionBD, evento_id)
+        # El usuario quitado ya no ve los cambios del evento: se le avisa que lo descarte
+        from app.services.CambiosService import CambiosService
+
+        CambiosService().RegistrarRevocacion(SesionBD, usuario_id, evento_id)
+        Confirmar(SesionBD)
         return True
 
+    def _ARol(self, Valor: Optional[str]) -> Optional[RolParticipante]:
+        if Valor is None:
+            return None
+        try:
+            return RolParticipante(Valor)
+        except ValueError:
+            return None
+
     def ObtenerRolEnEvento(self, SesionBD: Session, EventoId: int, UsuarioId: int) -> Optional[RolParticipante]:
+        # Borrado y propiedad salen de la entidad (mapa de identidad); solo la participacion se cachea
         EventoEntidad = SesionBD.get(Evento, EventoId)
         if EventoEntidad is None or EventoEntidad.EliminadoEn is not None:
             return None
         if EventoEntidad.PropietarioId == UsuarioId:
             return RolParticipante.Dueno
-        Consulta = select(ParticipanteEvento).where(
-            ParticipanteEvento.EventoId == EventoId,
-            ParticipanteEvento.UsuarioId == UsuarioId,
-        )
-        Participante = SesionBD.exec(Consulta).first()
-        if Participante is None:
-            return None
-        try:
-            return RolParticipante(Participante.Rol)
-        except ValueError:
-            return None
+
+        def Calcular() -> Optional[str]:
+            Consulta = select(ParticipanteEvento.Rol).where(
+                ParticipanteEvento.EventoId == EventoId,
+                ParticipanteEvento.UsuarioId == UsuarioId,
+            )
+            return SesionBD.exec(Consulta).first()
+
+        return self._ARol(RolCacheado(SesionBD, ("Evento", EventoId), UsuarioId, Calcular))
 
     def RolEnMeta(self, SesionBD: Session, MetaEntidad: Meta, UsuarioId: int) -> Optional[RolParticipante]:
         if MetaEntidad.PropietarioId == UsuarioId:
             return RolParticipante.Dueno
-        Consulta = (
-            select(ParticipanteEvento)
-            .join(Evento, Evento.Id == ParticipanteEvento.EventoId)
-            .where(Evento.MetaId == MetaEntidad.Id, ParticipanteEvento.UsuarioId == UsuarioId)
-        )
-        roles_prioridad: Set[str] = set()
-        for registro in SesionBD.exec(Consulta):
-            roles_prioridad.add(registro.Rol)
-            if registro.Rol == RolParticipante.Colaborador.value:
-                return RolParticipante.Colaborador
-        if RolParticipante.Dueno.value in roles_prioridad:
-            return RolParticipante.Dueno
-        if RolParticipante.Lector.value in roles_prioridad:
-            return RolParticipante.Lector
-        return None
+
+        def Calcular() -> Optional[str]:
+            # Roles distintos del usuario en los eventos de la meta (a lo sumo tres filas)
+            Consulta = (
+                select(ParticipanteEvento.Rol)
+                .join(Evento, Evento.Id == ParticipanteEvento.EventoId)
+                .where(Evento.MetaId == MetaEntidad.Id, ParticipanteEvento.UsuarioId == UsuarioId)
+                .distinct()
+            )
+            roles: Set[str] = set(SesionBD.exec(Consulta))
+            for rol in (RolParticipante.Colaborador, RolParticipante.Dueno, RolParticipante.Lector):
+                if rol.value in roles:
+                    return rol.value
+            return None
+
+        return self._ARol(RolCacheado(SesionBD, ("Meta", MetaEntidad.Id), UsuarioId, Calcular))  # type: ignore[arg-type]
 
     def MetaTieneColaborador(self, SesionBD: Session, MetaId: int) -> bool:
         Consulta = (
@@ -124,7 +183,7 @@ class ParticipantesService:
             if existente.Rol != RolParticipante.Dueno.value:
                 existente.Rol = RolParticipante.Dueno.value
                 SesionBD.add(existente)
-                SesionBD.commit()
-                SesionBD.refresh(existente)
+                self.InvalidarRoles(SesionBD, [EventoId])
+                Confirmar(SesionBD, existente)
             return existente
         return self.AgregarParticipante(SesionBD, EventoId, UsuarioId, RolParticipante.Dueno)
@@ -0,0 +1,307 @@
+import importlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Iterable, List, Optional, Protocol, Set, Tuple
+
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlmodel import Session, select
+
+from app.core.Database import ActualizarDevolviendoIds, AlConfirmar, ObtenerEngine
+from app.core.TareasFondo import TareaProgramada
+from app.models.Salida import MensajeSalida
+
+
+logger = logging.getLogger(__name__)
+
+
+def ObtenerTamanoLoteSalida() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_SALIDA_LOTE", "500")))
+    except Exception:
+        return 500
+
+
+def ObtenerMaximoIntentosSalida() -> int:
+    try:
+        return max(1, int(os.getenv("MYPLANU_SALIDA_MAX_INTENTOS", "8")))
+    except Exception:
+        return 8
+
+
+def ObtenerEsperaBaseSalida() -> float:
+    """Segundos del primer reintento; se duplica en cada fallo (MYPLANU_SALIDA_ESPERA_BASE)."""
+    try:
+        return max(0.1, float(os.getenv("MYPLANU_SALIDA_ESPERA_BASE", "5")))
+    except Exception:
+        return 5.0
+
+
+def ObtenerEsperaMaximaSalida() -> float:
+    try:
+        return max(1.0, float(os.getenv("MYPLANU_SALIDA_ESPERA_MAX", "300")))
+    except Exception:
+        return 300.0
+
+
+def ObtenerDuracionReclamoSalida() -> float:
+    """Segundos que un lote queda reclamado por un relay antes de que otro pueda retomarlo (MYPLANU_SALIDA_RECLAMO)."""
+    try:
+        return max(1.0, float(os.getenv("MYPLANU_SALIDA_RECLAMO", "300")))
+    except Exception:
+        return 300.0
+
+
+@dataclass(frozen=True)
+class MensajePush:
+    Id: int
+    Tipo: str
+    ReferenciaId: int
+    Titulo: str
+    Cuerpo: Optional[str]
+
+
+@dataclass(frozen=True)
+class EnvioPush:
+    """Todos los mensajes pendientes de un destinatario, agrupados en un solo envio."""
+
+    UsuarioId: int
+    Mensajes: Tuple[MensajePush, ...]
+
+
+class PasarelaPush(Protocol):
+    def Enviar(self, Envios: List[EnvioPush]) -> Set[int]:
+        """Entrega los envios y devuelve los UsuarioId que fallaron (se reintentan)."""
+        ...
+
+
+class PasarelaBucle:
+    """Pasarela en memoria (pruebas y desarrollo): acepta todo y guarda los ultimos envios."""
+
+    def __init__(self, Maximo: int = 10000) -> None:
+        self.Envios: Deque[EnvioPush] = deque(maxlen=Maximo)
+        self._Candado = threading.Lock()
+
+    def Enviar(self, Envios: List[EnvioPush]) -> Set[int]:
+        with self._Candado:
+            self.Envios.extend(Envios)
+        return set()
+
+    def Vaciar(self) -> List[EnvioPush]:
+        with self._Candado:
+            envios = list(self.Envios)
+            self.Envios.clear()
+        return envios
+
+
+class PasarelaArchivo:
+    """Escribe cada envio como una linea JSON en un archivo (MYPLANU_PUSH_ARCHIVO)."""
+
+    def __init__(self, Ruta: Optional[str] = None) -> None:
+        self.Ruta = Ruta or os.getenv("MYPLANU_PUSH_ARCHIVO", "push_salida.ndjson")
+        self._Candado = threading.Lock()
+
+    def Enviar(self, Envios: List[EnvioPush]) -> Set[int]:
+        lineas = [
+            json.dumps(
+                {
+                    "UsuarioId": envio.UsuarioId,
+                    "Mensajes": [
+                        {"Id": m.Id, "Tipo": m.Tipo, "ReferenciaId": m.ReferenciaId, "Titulo": m.Titulo, "Cuerpo": m.Cuerpo}
+                        for m in envio.Mensajes
+                    ],
+                },
+                ensure_ascii=False,
+            )
+            for envio in Envios
+        ]
+        with self._Candado, open(self.Ruta, "a", encoding="utf-8") as archivo:
+            archivo.write("".join(linea + "\n" for linea in lineas))
+        return set()
+
+
+def CrearPasarelaPush() -> PasarelaPush:
+    """MYPLANU_PUSH_PASARELA: 'bucle' (por defecto), 'archivo' o 'paquete.modulo:Clase'."""
+    nombre = os.getenv("MYPLANU_PUSH_PASARELA", "bucle").strip()
+    if nombre in ("", "bucle"):
+        return PasarelaBucle()
+    if nombre == "archivo":
+        return PasarelaArchivo()
+    modulo, _, clase = nombre.partition(":")
+    return getattr(importlib.import_module(modulo), clase)()
+
+
+class SalidaService:
+    def Encolar(self, SesionBD: Session, Mensajes: Iterable[Dict[str, Any]]) -> int:
+        """Inserta mensajes en la bandeja dentro de la transaccion actual (un INSERT multi-fila).
+
+        Cada mensaje lleva UsuarioId, Tipo, ReferenciaId, Titulo y opcionalmente
+        Cuerpo. El relay se despierta solo si la transaccion se confirma.
+        """
+        instante = datetime.utcnow()
+        filas = [
+            {
+                "UsuarioId": m["UsuarioId"],
+                "Tipo": m["Tipo"],
+                "ReferenciaId": m["ReferenciaId"],
+                "Titulo": m["Titulo"],
+                "Cuerpo": m.get("Cuerpo"),
+                "CreadoEn": instante,
+                "Intentos": 0,
+                "ProximoIntento": instante,
+            }
+            for m in Mensajes
+        ]
+        if filas:
+            SesionBD.execute(insert(MensajeSalida), filas)
+            AlConfirmar(SesionBD, Relay.Despertar)
+        return len(filas)
+
+
+class RelaySalida:
+    """Drena la bandeja por lotes: agrupa por destinatario, envia y reintenta con backoff exponencial."""
+
+    def __init__(self, Pasarela: PasarelaPush, TamanoLote: int, MaximoIntentos: int) -> None:
+        self.Pasarela = Pasarela
+        self.TamanoLote = TamanoLote
+        self.MaximoIntentos = MaximoIntentos
+        self._Tarea: Optional[TareaProgramada] = None
+
+    def Despertar(self) -> None:
+        if self._Tarea is not None:
+            self._Tarea.Despertar()
+
+    def _Espera(self, Intentos: int) -> timedelta:
+        segundos = min(ObtenerEsperaMaximaSalida(), ObtenerEsperaBaseSalida() * (2 ** max(0, Intentos - 1)))
+        return timedelta(seconds=segundos)
+
+    def _Reclamar(self, SesionBD: Session, Ahora: datetime) -> List[MensajeSalida]:
+        """Reclama y confirma un lote antes de enviarlo: otro relay no toma las mismas filas.
+
+        Un reclamo vencido (el relay murio a mitad de envio) vuelve a estar
+        disponible; esas filas pueden entregarse dos veces, nunca ninguna.
+        """
+        disponible = and_(
+            MensajeSalida.EnviadoEn.is_(None),
+            MensajeSalida.FallidoEn.is_(None),
+            MensajeSalida.ProximoIntento <= Ahora,
+            or_(
+                MensajeSalida.ReclamadoEn.is_(None),
+                MensajeSalida.ReclamadoEn < Ahora - timedelta(seconds=ObtenerDuracionReclamoSalida()),
+            ),
+        )
+        lote = (
+            select(MensajeSalida.Id)
+            .where(disponible)
+            .order_by(MensajeSalida.ProximoIntento, MensajeSalida.Id)
+            .limit(self.TamanoLote)
+        )
+        token = uuid.uuid4().hex
+        ids = ActualizarDevolviendoIds(
+            SesionBD, MensajeSalida, and_(MensajeSalida.Id.in_(lote), disponible), Reclamado=token, ReclamadoEn=Ahora
+        )
+        SesionBD.commit()
+        if not ids:
+            return []
+        Consulta = (
+            select(MensajeSalida)
+            .where(MensajeSalida.Reclamado == token)
+            .order_by(MensajeSalida.ProximoIntento, MensajeSalida.Id)
+        )
+        return list(SesionBD.exec(Consulta))
+
+    def Drenar(self, SesionBD: Session, Ahora: Optional[datetime] = None) -> int:
+        """Procesa un lote; devuelve cuantos mensajes se reclamaron."""
+        ahora = Ahora or datetime.utcnow()
+        mensajes = self._Reclamar(SesionBD, ahora)
+        if not mensajes:
+            return 0
+        token = mensajes[0].Reclamado
+        por_usuario: Dict[int, List[MensajeSalida]] = {}
+        for m in mensajes:
+            por_usuario.setdefault(m.UsuarioId, []).append(m)
+        envios = [
+            EnvioPush(
+                UsuarioId=usuario_id,
+                Mensajes=tuple(MensajePush(m.Id, m.Tipo, m.ReferenciaId, m.Titulo, m.Cuerpo) for m in lista),  # type: ignore[arg-type]
+            )
+            for usuario_id, lista in por_usuario.items()
+        ]
+        error: Optional[str] = None
+        try:
+            fallidos = set(self.Pasarela.Enviar(envios))
+        except Exception as exc:
+            logger.exception("Fallo la pasarela push con %d envios", len(envios))
+            fallidos = set(por_usuario)
+            error = str(exc)[:500]
+        enviados = [m.Id for m in mensajes if m.UsuarioId not in fallidos]
+        if enviados:
+            SesionBD.execute(
+                update(MensajeSalida)
+                .where(MensajeSalida.Id.in_(enviados), MensajeSalida.Reclamado == token)
+                .values(EnviadoEn=ahora, Reclamado=None, ReclamadoEn=None),
+                execution_options={"synchronize_session": False},
+            )
+        # Reintentos: una UPDATE por numero de intentos (todas las filas comparten el mismo backoff)
+        por_intentos: Dict[int, List[int]] = {}
+        for m in mensajes:
+            if m.UsuarioId in fallidos:
+                por_intentos.setdefault(m.Intentos + 1, []).append(m.Id)  # type: ignore[arg-type]
+        for intentos, ids in por_intentos.items():
+            valores: Dict[str, Any] = {
+                "Intentos": intentos,
+                "UltimoError": error or "Rechazado por la pasarela",
+                "Reclamado": None,
+                "ReclamadoEn": None,
+            }
+            if intentos >= self.MaximoIntentos:
+                valores["FallidoEn"] = ahora
+            else:
+                valores["ProximoIntento"] = ahora + self._Espera(intentos)
+            SesionBD.execute(
+                update(MensajeSalida)
+                .where(MensajeSalida.Id.in_(ids), MensajeSalida.Reclamado == token)
+                .values(**valores),
+                execution_options={"synchronize_session": False},
+            )
+        SesionBD.commit()
+        return len(mensajes)
+
+    def Ejecutar(self, SesionBD: Session) -> float:
+        """Drena mientras haya lotes llenos y devuelve los segundos hasta el proximo reintento."""
+        while self.Drenar(SesionBD) >= self.TamanoLote:
+            pass
+        # Lo reclamado por otro relay solo cuenta cuando su reclamo vence
+        proximo, reclamado = SesionBD.exec(
+            select(
+                func.min(case((MensajeSalida.ReclamadoEn.is_(None), MensajeSalida.ProximoIntento))),
+                func.min(MensajeSalida.ReclamadoEn),
+            ).where(MensajeSalida.EnviadoEn.is_(None), MensajeSalida.FallidoEn.is_(None))
+        ).one()
+        if reclamado is not None:
+            vence = reclamado + timedelta(seconds=ObtenerDuracionReclamoSalida())
+            proximo = vence if proximo is None else min(proximo, vence)
+        espera = ObtenerEsperaMaximaSalida()
+        if proximo is not None:
+            espera = min(espera, max(0.0, (proximo - datetime.utcnow()).total_seconds()))
+        return espera
+
+    def _EjecutarProgramado(self) -> float:
+        with Session(ObtenerEngine()) as SesionBD:
+            return self.Ejecutar(SesionBD)
+
+    def CrearTarea(self) -> TareaProgramada:
+        self._Tarea = TareaProgramada("relay-salida", self._EjecutarProgramado)
+        return self._Tarea
+
+
+Relay = RelaySalida(CrearPasarelaPush(), ObtenerTamanoLoteSalida(), ObtenerMaximoIntentosSalida())
+
+
+def CrearTareaRelay() -> TareaProgramada:
+    return Relay.CrearTarea()
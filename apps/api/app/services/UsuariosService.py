@@ -1,10 +1,14 @@
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from datetime import datetime
 
 from sqlmodel import Session, select
 
 from app.models.Goal import Usuario
 from app.models.Evento import ParticipanteEvento
+from app.core.Database import AlConfirmar, Confirmar
+from app.core.CacheAuth import InvalidarUsuario
+from app.core.Paginacion import AplicarKeysetId
+from app.services.ParticipantesService import ParticipantesService
 
 
 class UsuariosService:
@@ -17,13 +21,25 @@ class UsuariosService:
             return None
         Entidad = Usuario(Correo=Correo, Nombre=Nombre, ZonaHoraria=ZonaHoraria)
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
-    def Listar(self, SesionBD: Session) -> List[Usuario]:
+    def Iterar(
+        self,
+        SesionBD: Session,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> Iterator[Usuario]:
         Consulta = select(Usuario).where(Usuario.EliminadoEn.is_(None))
-        return list(SesionBD.exec(Consulta))
+        yield from SesionBD.exec(AplicarKeysetId(Consulta, Usuario.Id, DespuesDeId, Limite))
+
+    def Listar(
+        self,
+        SesionBD: Session,
+        Limite: Optional[int] = None,
+        DespuesDeId: Optional[int] = None,
+    ) -> List[Usuario]:
+        return list(self.Iterar(SesionBD, Limite=Limite, DespuesDeId=DespuesDeId))
 
     def Obtener(self, SesionBD: Session, Id: int) -> Optional[Usuario]:
         return SesionBD.get(Usuario, Id)
@@ -46,8 +62,9 @@ class UsuariosService:
         if ZonaHoraria is not None:
             Entidad.ZonaHoraria = ZonaHoraria
         SesionBD.add(Entidad)
-        SesionBD.commit()
-        SesionBD.refresh(Entidad)
+        # Dentro de una unidad de trabajo Confirmar no hace COMMIT: la cache se limpia al confirmar de verdad
+        AlConfirmar(SesionBD, lambda: InvalidarUsuario(Id))
+        Confirmar(SesionBD, Entidad)
         return Entidad
 
     def Eliminar(self, SesionBD: Session, Id: int) -> bool:
@@ -62,9 +79,13 @@ class UsuariosService:
         metas = MetasService()
         metas.CascadaPorUsuario(SesionBD, Id, fecha)
         ConsultaParticipantes = select(ParticipanteEvento).where(ParticipanteEvento.UsuarioId == Id)
+        eventos: List[int] = []
         for participante in SesionBD.exec(ConsultaParticipantes):
+            eventos.append(participante.EventoId)
             SesionBD.delete(participante)
-        SesionBD.commit()
+        ParticipantesService().InvalidarRoles(SesionBD, eventos)
+        AlConfirmar(SesionBD, lambda: InvalidarUsuario(Id))
+        Confirmar(SesionBD)
         return True
 
     def BuscarPorCorreo(self, SesionBD: Session, Correo: str) -> Optional[Usuario]:
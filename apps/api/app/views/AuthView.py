@@ -5,7 +5,8 @@ from fastapi.security import OAuth2PasswordBearer
 
 from app.core.Database import ObtenerSesion
 from app.models.Goal import Usuario
-from app.core.Auth import hash_password, verify_password, create_access_token, decode_access_token
+from app.core.Auth import hash_password, verify_password, create_access_token
+from app.core.CacheAuth import DecodificarTokenCacheado, ObtenerUsuarioSesion, UsuarioSesion
 
 RouterAuth = APIRouter()
 
@@ -45,15 +46,16 @@ def Login(datos: LoginIn, SesionBD: Session = Depends(ObtenerSesion)):
     token = create_access_token(str(u.Id))
     return TokenRespuesta(access_token=token)
 
-def get_current_user(SesionBD: Session = Depends(ObtenerSesion), token: str = Depends(oauth2_scheme)) -> Usuario:
-    payload = decode_access_token(token)
+def get_current_user(SesionBD: Session = Depends(ObtenerSesion), token: str = Depends(oauth2_scheme)) -> UsuarioSesion:
+    # Claims y registro del usuario salen de la cache del proceso; la BD solo se consulta al expirar
+    payload = DecodificarTokenCacheado(token)
     if not payload or 'sub' not in payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalido")
     try:
         uid = int(payload['sub'])
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalido")
-    u = SesionBD.get(Usuario, uid)
+    u = ObtenerUsuarioSesion(SesionBD, uid)
     if not u or u.EliminadoEn is not None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no valido")
     return u
@@ -1,13 +1,25 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session
 
-from app.core.Database import ObtenerSesion, IniciarTablas
+from app.core.Database import ObtenerSesion
+from app.core.Paginacion import (
+    CortarPagina,
+    DecodificarCursorId,
+    EsFormatoNDJSON,
+    IterarConSesionPropia,
+    NormalizarLimite,
+    RespuestaJSON,
+    RespuestaNDJSON,
+)
 from app.services.EventosService import EventosService, RecordatoriosService
 from app.services.ParticipantesService import ParticipantesService
+from app.services.CambiosService import CambiosService
+from app.core.ETag import CalcularETag, ConETag, RespuestaNoModificada, VentanaActual
 from app.core.Permisos import RolParticipante
+from app.core.ZonasHorarias import AUtcNaive, ConvertidorUsuario, ConvertidorZona
 from app.schemas import (
     EventoCrear,
     EventoActualizar,
@@ -16,130 +28,113 @@ from app.schemas import (
     RecordatorioActualizar,
     RecordatorioRespuesta,
 )
-from app.services.UsuariosService import UsuariosService
 from app.services.exceptions import PermisoDenegadoError, ReglaNegocioError
-from app.models.Goal import Usuario
+from app.core.CacheAuth import UsuarioSesion
 from app.views.AuthView import get_current_user
 
-try:
-    # Python 3.9+
-    from zoneinfo import ZoneInfo
-except Exception:  # pragma: no cover
-    ZoneInfo = None  # type: ignore
-
-
 Router = APIRouter()
 Eventos = EventosService()
 Recordatorios = RecordatoriosService()
 Participantes = ParticipantesService()
-Usuarios = UsuariosService()
+Cambios = CambiosService()
 
 
-@Router.on_event("startup")
-def AlIniciar():
-    IniciarTablas()
+CAMPOS_FECHA_EVENTO = ("Inicio", "Fin", "CreadoEn", "ActualizadoEn", "EliminadoEn")
+CAMPOS_FECHA_RECORDATORIO = ("FechaHora", "ProximaEjecucion", "CreadoEn", "EliminadoEn")
 
 
-# Utilidades de zona horaria
-def _obtener_tz(SesionBD: Session, UsuarioId: Optional[int], ZonaHoraria: Optional[str]):
-    """Resuelve la zona horaria: prioridad ZonaHoraria explicita, luego la del Usuario, si no UTC."""
-    zona = ZonaHoraria
-    if zona is None and UsuarioId is not None:
-        u = Usuarios.Obtener(SesionBD, UsuarioId)
-        if u is not None and u.ZonaHoraria:
-            zona = u.ZonaHoraria
-    try:
-        if zona and ZoneInfo:
-            return ZoneInfo(zona)
-    except Exception:
-        pass
-    # Por defecto UTC
-    return timezone.utc
-
-
-def _a_utc_naive(
-    dt: Optional[datetime],
-    ZonaEntrada: Optional[str] = None,
-    ZonaFallback: Optional[str] = None,
-) -> Optional[datetime]:
-    """Convierte un datetime a UTC naive. Usa ZonaEntrada o ZonaFallback para interpretar valores naive."""
-    if dt is None:
-        return None
-    # Si viene con tzinfo, convertir a UTC
-    if dt.tzinfo is not None:
-        return dt.astimezone(timezone.utc).replace(tzinfo=None)
-    # Si es naive y se indico ZonaEntrada, interpretarlo en esa zona
-    zona_origen = ZonaEntrada or ZonaFallback
-    if zona_origen and ZoneInfo:
-        try:
-            loc = dt.replace(tzinfo=ZoneInfo(zona_origen))
-            return loc.astimezone(timezone.utc).replace(tzinfo=None)
-        except Exception:
-            pass
-    # Caso contrario, asumir que ya es UTC naive
-    return dt
-
-
-def _a_zona_iso(dt: Optional[datetime], tz) -> Optional[str]:
-    """Toma un datetime UTC naive y devuelve ISO8601 con offset en tz."""
-    if dt is None:
-        return None
-    # Asumimos almacenado en UTC naive
-    aware = dt.replace(tzinfo=timezone.utc)
-    return aware.astimezone(tz).isoformat()
+def _dias_a_lista(obj: dict) -> dict:
+    # Convertir DiasSemana CSV -> lista
+    if obj.get("DiasSemana"):
+        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
+    return obj
+
+
+def _evento_a_dict(ev, conv: ConvertidorZona) -> dict:
+    return conv.ConvertirCampos(_dias_a_lista(ev.model_dump()), CAMPOS_FECHA_EVENTO)
+
+
+def _recordatorio_a_dict(r, conv: ConvertidorZona, Dias: bool = True) -> dict:
+    obj = r.model_dump()
+    if Dias:
+        _dias_a_lista(obj)
+    return conv.ConvertirCampos(obj, CAMPOS_FECHA_RECORDATORIO)
+
+
+def _etag(Solicitud: Request, SesionBD: Session, UsuarioActual: UsuarioSesion, conv: ConvertidorZona, *Partes) -> str:
+    """ETag del listado: cambia con cualquier escritura registrada en el log de cambios."""
+    return CalcularETag(Solicitud, Cambios.UltimoCursor(SesionBD), UsuarioActual.Id, conv.Clave, *Partes)
 
 
 # Eventos
 @Router.get("/eventos")
 def ListarEventos(
+    Solicitud: Request,
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    res = Eventos.ListarEventos(SesionBD)
+    try:
+        despues_id = DecodificarCursorId(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    lim = NormalizarLimite(limite)
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    etag = _etag(Solicitud, SesionBD, UsuarioActual, conv)
+    no_modificada = RespuestaNoModificada(Solicitud, etag)
+    if no_modificada is not None:
+        return no_modificada
+    solicitante = UsuarioActual.Id
+    if EsFormatoNDJSON(formato) and lim is None:
+        # Streaming sin paginar: se serializa fila a fila mientras se itera el resultado
+        filas = IterarConSesionPropia(lambda s: Eventos.IterarEventos(s, DespuesDeId=despues_id, UsuarioId=solicitante))
+        return ConETag(RespuestaNDJSON(_evento_a_dict(ev, conv) for ev in filas), etag)
+    # Solo eventos legibles (propios o con participacion), filtrados en la consulta keyset
+    res = Eventos.ListarEventos(SesionBD, Limite=lim + 1 if lim else None, DespuesDeId=despues_id, UsuarioId=solicitante)
+    res, siguiente = CortarPagina(res, lim, lambda ev: (ev.Id,))
     # Convertir campos de tiempo a la zona objetivo
-    salida = []
-    for ev in res:
-        obj = ev.dict()
-        # Convertir DiasSemana CSV -> lista
-        if obj.get("DiasSemana"):
-            obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-        obj["Inicio"] = _a_zona_iso(ev.Inicio, tz)
-        obj["Fin"] = _a_zona_iso(ev.Fin, tz)
-        obj["CreadoEn"] = _a_zona_iso(ev.CreadoEn, tz)
-        obj["ActualizadoEn"] = _a_zona_iso(ev.ActualizadoEn, tz) if ev.ActualizadoEn else None
-        obj["EliminadoEn"] = _a_zona_iso(ev.EliminadoEn, tz) if ev.EliminadoEn else None
-        salida.append(obj)
-    return salida
+    salida = [_evento_a_dict(ev, conv) for ev in res]
+    if EsFormatoNDJSON(formato):
+        return ConETag(RespuestaNDJSON(salida, siguiente), etag)
+    return ConETag(RespuestaJSON(salida, siguiente), etag)
 
 
 @Router.get("/eventos/proximos")
 def ListarEventosProximos(
+    Solicitud: Request,
     Desde: datetime,
     Hasta: datetime,
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     ZonaHorariaEntrada: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     # Normalizar rango a UTC naive
-    desde_utc = _a_utc_naive(Desde, ZonaHorariaEntrada)
-    hasta_utc = _a_utc_naive(Hasta, ZonaHorariaEntrada)
+    desde_utc = AUtcNaive(Desde, ZonaHorariaEntrada)
+    hasta_utc = AUtcNaive(Hasta, ZonaHorariaEntrada)
     if hasta_utc <= desde_utc:
         raise HTTPException(status_code=400, detail="Rango invalido")
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    ocurrencias = Eventos.ProyectarOcurrencias(SesionBD, Desde=desde_utc, Hasta=hasta_utc)
-    # Convertir ocurrencias a zona
-    salida = []
-    for o in ocurrencias:
-        salida.append({
-            'Titulo': o['Titulo'],
-            'EventoId': o['EventoId'],
-            'Inicio': _a_zona_iso(o['Inicio'], tz),
-            'Fin': _a_zona_iso(o['Fin'], tz),
-        })
-    return salida
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    # La proyeccion arranca en max(Desde, ahora): mientras el rango no haya terminado
+    # el resultado se mueve con el reloj y la ETag incluye el tramo de tiempo actual
+    partes = (VentanaActual(),) if hasta_utc > datetime.utcnow() else ()
+    etag = _etag(Solicitud, SesionBD, UsuarioActual, conv, *partes)
+    no_modificada = RespuestaNoModificada(Solicitud, etag)
+    if no_modificada is not None:
+        return no_modificada
+    # La proyeccion siempre se limita a eventos legibles (propios o con participacion)
+    ocurrencias = Eventos.ProyectarOcurrencias(SesionBD, Desde=desde_utc, Hasta=hasta_utc, UsuarioId=UsuarioActual.Id)
+    # Convertir ocurrencias a zona en una sola pasada
+    salida = conv.ConvertirFilas(
+        ({'Titulo': o['Titulo'], 'EventoId': o['EventoId'], 'Inicio': o['Inicio'], 'Fin': o['Fin']} for o in ocurrencias),
+        ("Inicio", "Fin"),
+    )
+    return ConETag(RespuestaJSON(salida), etag)
 
 
 @Router.post("/eventos", response_model=EventoRespuesta, status_code=201)
@@ -149,12 +144,12 @@ def CrearEvento(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     if Datos.PropietarioId != UsuarioActual.Id:
         raise HTTPException(status_code=403, detail="EventoInvalido: PropietarioId debe coincidir con el usuario autenticado")
-    ini_utc = _a_utc_naive(Datos.Inicio, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
-    fin_utc = _a_utc_naive(Datos.Fin, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
+    ini_utc = AUtcNaive(Datos.Inicio, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
+    fin_utc = AUtcNaive(Datos.Fin, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
     try:
         Entidad = Eventos.CrearEvento(
             SesionBD,
@@ -177,10 +172,7 @@ def CrearEvento(
     if Entidad is None:
         raise HTTPException(status_code=400, detail="EventoInvalido: Meta/Propietario inexistentes, rol no permitido o rango de tiempo")
     # Normalizar DiasSemana CSV -> lista en la respuesta
-    obj = Entidad.dict()
-    if obj.get("DiasSemana"):
-        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-    return obj
+    return _dias_a_lista(Entidad.model_dump())
 
 
 @Router.get("/eventos/{Id}")
@@ -193,16 +185,8 @@ def ObtenerEvento(
     Entidad = Eventos.Obtener(SesionBD, Id)
     if Entidad is None or Entidad.EliminadoEn is not None:
         raise HTTPException(status_code=404, detail="Evento no encontrado")
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    obj = Entidad.dict()
-    if obj.get("DiasSemana"):
-        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-    obj["Inicio"] = _a_zona_iso(Entidad.Inicio, tz)
-    obj["Fin"] = _a_zona_iso(Entidad.Fin, tz)
-    obj["CreadoEn"] = _a_zona_iso(Entidad.CreadoEn, tz)
-    obj["ActualizadoEn"] = _a_zona_iso(Entidad.ActualizadoEn, tz) if Entidad.ActualizadoEn else None
-    obj["EliminadoEn"] = _a_zona_iso(Entidad.EliminadoEn, tz) if Entidad.EliminadoEn else None
-    return obj
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    return _evento_a_dict(Entidad, conv)
 
 
 @Router.patch("/eventos/{Id}", response_model=EventoRespuesta)
@@ -213,15 +197,15 @@ def ActualizarEvento(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     ini_utc = (
-        _a_utc_naive(Cambios.Inicio, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
+        AUtcNaive(Cambios.Inicio, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
         if Cambios.Inicio is not None
         else None
     )
     fin_utc = (
-        _a_utc_naive(Cambios.Fin, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
+        AUtcNaive(Cambios.Fin, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
         if Cambios.Fin is not None
         else None
     )
@@ -245,14 +229,11 @@ def ActualizarEvento(
         raise HTTPException(status_code=409, detail=exc.detalle)
     if Entidad is None:
         raise HTTPException(status_code=400, detail="EventoInvalido: no encontrado, eliminado o rango de tiempo invalido")
-    obj = Entidad.dict()
-    if obj.get("DiasSemana"):
-        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-    return obj
+    return _dias_a_lista(Entidad.model_dump())
 
 
 @Router.delete("/eventos/{Id}")
-def EliminarEvento(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: Usuario = Depends(get_current_user)):
+def EliminarEvento(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: UsuarioSesion = Depends(get_current_user)):
     try:
         Exito = Eventos.EliminarEvento(SesionBD, Id, SolicitanteId=UsuarioActual.Id)
     except PermisoDenegadoError as exc:
@@ -268,7 +249,7 @@ def RecuperarEvento(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     try:
         Entidad = Eventos.RecuperarEvento(SesionBD, Id, SolicitanteId=UsuarioActual.Id)
@@ -278,14 +259,8 @@ def RecuperarEvento(
         raise HTTPException(status_code=409, detail=exc.detalle)
     if Entidad is None:
         raise HTTPException(status_code=400, detail="No se puede recuperar (evento inexistente o Meta eliminada)")
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    obj = Entidad.dict()
-    obj["Inicio"] = _a_zona_iso(Entidad.Inicio, tz)
-    obj["Fin"] = _a_zona_iso(Entidad.Fin, tz)
-    obj["CreadoEn"] = _a_zona_iso(Entidad.CreadoEn, tz)
-    obj["ActualizadoEn"] = _a_zona_iso(Entidad.ActualizadoEn, tz) if Entidad.ActualizadoEn else None
-    obj["EliminadoEn"] = _a_zona_iso(Entidad.EliminadoEn, tz) if Entidad.EliminadoEn else None
-    return obj
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    return conv.ConvertirCampos(Entidad.model_dump(), CAMPOS_FECHA_EVENTO)
 
 
 # Recordatorios
@@ -294,19 +269,33 @@ def ListarRecordatorios(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    res = Recordatorios.ListarRecordatorios(SesionBD)
-    salida = []
-    for r in res:
-        obj = r.dict()
-        if obj.get("DiasSemana"):
-            obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-        obj["FechaHora"] = _a_zona_iso(r.FechaHora, tz)
-        obj["CreadoEn"] = _a_zona_iso(r.CreadoEn, tz)
-        obj["EliminadoEn"] = _a_zona_iso(r.EliminadoEn, tz) if r.EliminadoEn else None
-        salida.append(obj)
-    return salida
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    res = Recordatorios.ListarRecordatorios(SesionBD, UsuarioId=UsuarioActual.Id)
+    return RespuestaJSON([_recordatorio_a_dict(r, conv) for r in res])
+
+
+# Debe declararse antes de /recordatorios/{Id} para no capturarse como Id
+@Router.get("/recordatorios/proximos")
+def ListarRecordatoriosProximos(
+    Solicitud: Request,
+    dias: int = 7,
+    UsuarioId: Optional[int] = None,
+    ZonaHoraria: Optional[str] = None,
+    SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
+):
+    if dias <= 0:
+        dias = 7
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    # La ventana se mueve con el reloj: la ETag incluye el tramo de tiempo actual
+    etag = _etag(Solicitud, SesionBD, UsuarioActual, conv, VentanaActual())
+    no_modificada = RespuestaNoModificada(Solicitud, etag)
+    if no_modificada is not None:
+        return no_modificada
+    res = Recordatorios.ListarProximos(SesionBD, dias=dias, UsuarioId=UsuarioActual.Id)
+    return ConETag(RespuestaJSON([_recordatorio_a_dict(r, conv) for r in res]), etag)
 
 
 @Router.post("/recordatorios", response_model=RecordatorioRespuesta, status_code=201)
@@ -316,9 +305,9 @@ def CrearRecordatorio(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
-    fh_utc = _a_utc_naive(Datos.FechaHora, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
+    fh_utc = AUtcNaive(Datos.FechaHora, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
     try:
         Entidad = Recordatorios.CrearRecordatorio(
             SesionBD,
@@ -337,10 +326,7 @@ def CrearRecordatorio(
         raise HTTPException(status_code=409, detail=exc.detalle)
     if Entidad is None:
         raise HTTPException(status_code=400, detail="RecordatorioInvalido: evento inexistente/eliminado, rol no permitido o fecha pasada")
-    obj = Entidad.dict()
-    if obj.get("DiasSemana"):
-        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-    return obj
+    return _dias_a_lista(Entidad.model_dump())
 
 
 @Router.get("/recordatorios/{Id}")
@@ -353,14 +339,8 @@ def ObtenerRecordatorio(
     Entidad = Recordatorios.Obtener(SesionBD, Id)
     if Entidad is None or Entidad.EliminadoEn is not None:
         raise HTTPException(status_code=404, detail="Recordatorio no encontrado")
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    obj = Entidad.dict()
-    if obj.get("DiasSemana"):
-        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-    obj["FechaHora"] = _a_zona_iso(Entidad.FechaHora, tz)
-    obj["CreadoEn"] = _a_zona_iso(Entidad.CreadoEn, tz)
-    obj["EliminadoEn"] = _a_zona_iso(Entidad.EliminadoEn, tz) if Entidad.EliminadoEn else None
-    return obj
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    return _recordatorio_a_dict(Entidad, conv)
 
 
 @Router.patch("/recordatorios/{Id}", response_model=RecordatorioRespuesta)
@@ -371,10 +351,10 @@ def ActualizarRecordatorio(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     fh_utc = (
-        _a_utc_naive(Cambios.FechaHora, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
+        AUtcNaive(Cambios.FechaHora, ZonaHorariaEntrada, UsuarioActual.ZonaHoraria)
         if Cambios.FechaHora is not None
         else None
     )
@@ -397,14 +377,11 @@ def ActualizarRecordatorio(
         raise HTTPException(status_code=409, detail=exc.detalle)
     if Entidad is None:
         raise HTTPException(status_code=400, detail="RecordatorioInvalido: no encontrado/eliminado o fecha/rol invalidos")
-    obj = Entidad.dict()
-    if obj.get("DiasSemana"):
-        obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-    return obj
+    return _dias_a_lista(Entidad.model_dump())
 
 
 @Router.delete("/recordatorios/{Id}")
-def EliminarRecordatorio(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: Usuario = Depends(get_current_user)):
+def EliminarRecordatorio(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: UsuarioSesion = Depends(get_current_user)):
     try:
         Exito = Recordatorios.EliminarRecordatorio(SesionBD, Id, SolicitanteId=UsuarioActual.Id)
     except PermisoDenegadoError as exc:
@@ -420,7 +397,7 @@ def RecuperarRecordatorio(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     try:
         Entidad = Recordatorios.RecuperarRecordatorio(SesionBD, Id, SolicitanteId=UsuarioActual.Id)
@@ -430,35 +407,8 @@ def RecuperarRecordatorio(
         raise HTTPException(status_code=409, detail=exc.detalle)
     if Entidad is None:
         raise HTTPException(status_code=400, detail="No se puede recuperar (recordatorio inexistente o Evento eliminado)")
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    obj = Entidad.dict()
-    obj["FechaHora"] = _a_zona_iso(Entidad.FechaHora, tz)
-    obj["CreadoEn"] = _a_zona_iso(Entidad.CreadoEn, tz)
-    obj["EliminadoEn"] = _a_zona_iso(Entidad.EliminadoEn, tz) if Entidad.EliminadoEn else None
-    return obj
-
-
-@Router.get("/recordatorios/proximos")
-def ListarRecordatoriosProximos(
-    dias: int = 7,
-    UsuarioId: Optional[int] = None,
-    ZonaHoraria: Optional[str] = None,
-    SesionBD: Session = Depends(ObtenerSesion),
-):
-    if dias <= 0:
-        dias = 7
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    res = Recordatorios.ListarProximos(SesionBD, dias=dias)
-    salida = []
-    for r in res:
-        obj = r.dict()
-        if obj.get("DiasSemana"):
-            obj["DiasSemana"] = [d for d in obj["DiasSemana"].split(",") if d]
-        obj["FechaHora"] = _a_zona_iso(r.FechaHora, tz)
-        obj["CreadoEn"] = _a_zona_iso(r.CreadoEn, tz)
-        obj["EliminadoEn"] = _a_zona_iso(r.EliminadoEn, tz) if r.EliminadoEn else None
-        salida.append(obj)
-    return salida
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    return _recordatorio_a_dict(Entidad, conv, Dias=False)
 
 
 # Participantes de Evento
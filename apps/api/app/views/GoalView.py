@@ -1,31 +1,54 @@
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session
 
-from app.core.Database import ObtenerSesion, IniciarTablas
+from app.core.Database import ObtenerSesion
+from app.core.ETag import CalcularETag, ConETag, RespuestaNoModificada
+from app.core.Paginacion import (
+    CortarPagina,
+    DecodificarCursorId,
+    EsFormatoNDJSON,
+    IterarConSesionPropia,
+    NormalizarLimite,
+    RespuestaJSON,
+    RespuestaNDJSON,
+)
 from app.services.UsuariosService import UsuariosService
 from app.services.MetasService import MetasService
+from app.services.CambiosService import CambiosService
 from app.services.exceptions import PermisoDenegadoError, ReglaNegocioError
 from app.schemas import MetaCrear, MetaActualizar, MetaRespuesta
 from app.views.AuthView import get_current_user
-from app.models.Goal import Usuario
+from app.core.CacheAuth import UsuarioSesion
 
 
 Router = APIRouter()
 Usuarios = UsuariosService()
 Metas = MetasService()
-
-
-@Router.on_event("startup")
-def AlIniciar():
-    IniciarTablas()
-
+Cambios = CambiosService()
 
 # Usuarios
 @Router.get("/usuarios")
-def ListarUsuarios(SesionBD: Session = Depends(ObtenerSesion)):
-    return Usuarios.Listar(SesionBD)
+def ListarUsuarios(
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: Optional[str] = None,
+    SesionBD: Session = Depends(ObtenerSesion),
+):
+    try:
+        despues_id = DecodificarCursorId(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    lim = NormalizarLimite(limite)
+    if EsFormatoNDJSON(formato) and lim is None:
+        filas = IterarConSesionPropia(lambda s: Usuarios.Iterar(s, DespuesDeId=despues_id))
+        return RespuestaNDJSON(u.model_dump() for u in filas)
+    res = Usuarios.Listar(SesionBD, Limite=lim + 1 if lim else None, DespuesDeId=despues_id)
+    res, siguiente = CortarPagina(res, lim, lambda u: (u.Id,))
+    if EsFormatoNDJSON(formato):
+        return RespuestaNDJSON((u.model_dump() for u in res), siguiente)
+    return RespuestaJSON([u.model_dump() for u in res], siguiente)
 
 
 # Nota: registro de usuarios se mueve a /auth/registro (este endpoint se mantiene para compatibilidad interna)
@@ -69,12 +92,37 @@ def EliminarUsuario(Id: int, SesionBD: Session = Depends(ObtenerSesion)):
 
 # Metas
 @Router.get("/metas")
-def ListarMetas(SesionBD: Session = Depends(ObtenerSesion)):
-    return Metas.ListarMetas(SesionBD)
+def ListarMetas(
+    Solicitud: Request,
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: Optional[str] = None,
+    SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
+):
+    try:
+        despues_id = DecodificarCursorId(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    lim = NormalizarLimite(limite)
+    etag = CalcularETag(Solicitud, Cambios.UltimoCursor(SesionBD), UsuarioActual.Id)
+    no_modificada = RespuestaNoModificada(Solicitud, etag)
+    if no_modificada is not None:
+        return no_modificada
+    solicitante = UsuarioActual.Id
+    if EsFormatoNDJSON(formato) and lim is None:
+        filas = IterarConSesionPropia(lambda s: Metas.IterarMetas(s, DespuesDeId=despues_id, UsuarioId=solicitante))
+        return ConETag(RespuestaNDJSON(m.model_dump() for m in filas), etag)
+    # Solo metas legibles, filtradas en la consulta keyset
+    res = Metas.ListarMetas(SesionBD, Limite=lim + 1 if lim else None, DespuesDeId=despues_id, UsuarioId=solicitante)
+    res, siguiente = CortarPagina(res, lim, lambda m: (m.Id,))
+    if EsFormatoNDJSON(formato):
+        return ConETag(RespuestaNDJSON((m.model_dump() for m in res), siguiente), etag)
+    return ConETag(RespuestaJSON([m.model_dump() for m in res], siguiente), etag)
 
 
 @Router.post("/metas", response_model=MetaRespuesta, status_code=201)
-def CrearMeta(MetaIn: MetaCrear, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: Usuario = Depends(get_current_user)):
+def CrearMeta(MetaIn: MetaCrear, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: UsuarioSesion = Depends(get_current_user)):
     # Forzar PropietarioId al usuario autenticado
     try:
         Entidad = Metas.CrearMeta(
@@ -103,7 +151,7 @@ def ObtenerMeta(Id: int, SesionBD: Session = Depends(ObtenerSesion)):
 
 
 @Router.patch("/metas/{Id}", response_model=MetaRespuesta)
-def ActualizarMeta(Id: int, Cambios: MetaActualizar, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: Usuario = Depends(get_current_user)):
+def ActualizarMeta(Id: int, Cambios: MetaActualizar, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: UsuarioSesion = Depends(get_current_user)):
     try:
         Entidad = Metas.ActualizarMeta(
             SesionBD,
@@ -123,7 +171,7 @@ def ActualizarMeta(Id: int, Cambios: MetaActualizar, SesionBD: Session = Depends
 
 
 @Router.delete("/metas/{Id}")
-def EliminarMeta(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: Usuario = Depends(get_current_user)):
+def EliminarMeta(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: UsuarioSesion = Depends(get_current_user)):
     try:
         Exito = Metas.EliminarMeta(SesionBD, Id, SolicitanteId=UsuarioActual.Id)
     except PermisoDenegadoError as exc:
@@ -136,9 +184,15 @@ def EliminarMeta(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioAct
 
 
 @Router.post("/metas/{Id}/recuperar")
-def RecuperarMeta(Id: int, SesionBD: Session = Depends(ObtenerSesion), UsuarioActual: Usuario = Depends(get_current_user)):
+def RecuperarMeta(
+    Id: int,
+    cascada: bool = False,
+    SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
+):
+    # cascada=true restaura tambien eventos y recordatorios eliminados junto con la meta
     try:
-        Entidad = Metas.RecuperarMeta(SesionBD, Id, SolicitanteId=UsuarioActual.Id)
+        Entidad = Metas.RecuperarMeta(SesionBD, Id, SolicitanteId=UsuarioActual.Id, Cascada=cascada)
     except PermisoDenegadoError as exc:
         raise HTTPException(status_code=403, detail=exc.detalle)
     except ReglaNegocioError as exc:
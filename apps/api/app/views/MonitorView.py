@@ -1,12 +1,21 @@
-from typing import Optional
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session
 
-from app.core.Database import ObtenerSesion
+from app.core.Database import ObtenerSesion, ObtenerEngine
+from app.core.Paginacion import CABECERA_CURSOR, CortarPagina, DecodificarCursor, NormalizarLimite
+from app.core.PubSub import BusNotificaciones
 from app.views.AuthView import get_current_user
-from app.models.Goal import Usuario
+from app.core.CacheAuth import UsuarioSesion
 from app.models.Notificacion import NotificacionSistema
+from app.schemas import NotificacionesLeer
 from app.services.BitacoraService import BitacoraService
 from app.services.NotificacionesService import NotificacionesService
 
@@ -17,25 +26,39 @@ Notificaciones = NotificacionesService()
 
 @Router.get("/bitacora/recuperaciones")
 def ListarRecuperaciones(
+    respuesta: Response,
     TipoEntidad: Optional[str] = None,
     SoloPropias: bool = True,
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     usuario_id = UsuarioActual.Id if SoloPropias else None
+    try:
+        valores = DecodificarCursor(cursor)
+        despues = (datetime.fromisoformat(valores[0]), int(valores[1])) if valores else None
+    except (ValueError, IndexError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+    lim = NormalizarLimite(limite)
     registros = Bitacora.ListarRecuperaciones(
         SesionBD,
         TipoEntidad=TipoEntidad,
         UsuarioId=usuario_id,
+        Limite=lim + 1 if lim is not None else None,
+        Despues=despues,
     )
-    return [registro.model_dump() for registro in registros]
+    pagina, siguiente = CortarPagina(registros, lim, lambda r: (r.RegistradoEn, r.Id))
+    if siguiente:
+        respuesta.headers[CABECERA_CURSOR] = siguiente
+    return [registro.model_dump() for registro in pagina]
 
 
 @Router.get("/notificaciones/sistema")
 def ListarNotificaciones(
     SoloNoLeidas: bool = True,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     registros = Notificaciones.ListarPendientes(
         SesionBD,
@@ -45,11 +68,131 @@ def ListarNotificaciones(
     return [registro.model_dump() for registro in registros]
 
 
+def ObtenerSegundosLatido() -> float:
+    try:
+        return max(1.0, float(os.getenv("MYPLANU_SSE_LATIDO_SEGUNDOS", "15")))
+    except Exception:
+        return 15.0
+
+
+def ObtenerSegundosRevisionSSE() -> float:
+    """Cada cuanto un stream relee la BD sin aviso del bus (cubre escrituras de otros procesos)."""
+    try:
+        return max(1.0, float(os.getenv("MYPLANU_SSE_REVISION_SEGUNDOS", "300")))
+    except Exception:
+        return 300.0
+
+
+_PAGINA_SSE = 500
+
+
+def _LeerNuevas(UsuarioId: int, DespuesDeId: int) -> list:
+    with Session(ObtenerEngine()) as SesionBD:
+        return [n.model_dump() for n in Notificaciones.ListarDesde(SesionBD, UsuarioId, DespuesDeId, Limite=_PAGINA_SSE)]
+
+
+async def _FlujoNotificaciones(
+    UsuarioId: int,
+    DespuesDeId: int,
+    Latido: float,
+    Desconectado: Optional[Callable[[], Awaitable[bool]]] = None,
+    Revision: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Genera eventos SSE. Se relee la BD al conectar y en cada aviso del bus.
+
+    El latido no consulta la base. Como el bus es local, cada Revision segundos
+    (MYPLANU_SSE_REVISION_SEGUNDOS) se relee igualmente para recoger lo que
+    escribio otro proceso. Cada lectura drena por paginas hasta ponerse al dia.
+    El Id de la notificacion es el id del evento para Last-Event-ID.
+    """
+    revision = ObtenerSegundosRevisionSSE() if Revision is None else Revision
+    suscripcion = BusNotificaciones.Suscribir(UsuarioId)
+    ultimo = DespuesDeId
+    leer = True
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if leer:
+                suscripcion.Limpiar()
+                while True:
+                    nuevas = await run_in_threadpool(_LeerNuevas, UsuarioId, ultimo)
+                    for notif in nuevas:
+                        ultimo = notif["Id"]
+                        datos = json.dumps(notif, default=str, ensure_ascii=False)
+                        yield f"id: {ultimo}\nevent: notificacion\ndata: {datos}\n\n"
+                    if len(nuevas) < _PAGINA_SSE:
+                        break
+                revisar_en = time.monotonic() + revision
+            if Desconectado is not None and await Desconectado():
+                break
+            leer = await suscripcion.Esperar(Latido)
+            if not leer:
+                yield ": latido\n\n"
+                leer = time.monotonic() >= revisar_en
+    finally:
+        BusNotificaciones.Cancelar(suscripcion)
+
+
+@Router.get("/notificaciones/stream")
+async def StreamNotificaciones(
+    request: Request,
+    desde: Optional[int] = None,
+    UltimoEventoId: Optional[str] = Header(None, alias="Last-Event-ID"),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
+):
+    """Server-sent events con las notificaciones nuevas del usuario.
+
+    Reanuda desde Last-Event-ID (o ?desde=); sin ninguno, solo envia las que
+    lleguen despues de conectar.
+    """
+    inicio = desde
+    if UltimoEventoId:
+        try:
+            inicio = int(UltimoEventoId)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID invalido")
+    if inicio is None:
+        def _Ultimo() -> int:
+            with Session(ObtenerEngine()) as SesionBD:
+                return Notificaciones.UltimoId(SesionBD, UsuarioActual.Id)
+
+        inicio = await run_in_threadpool(_Ultimo)
+    return StreamingResponse(
+        _FlujoNotificaciones(UsuarioActual.Id, inicio, ObtenerSegundosLatido(), request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@Router.get("/notificaciones/conteo")
+def ContarNotificaciones(
+    SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
+):
+    return {"NoLeidas": Notificaciones.ContarNoLeidas(SesionBD, UsuarioActual.Id)}
+
+
+@Router.post("/notificaciones/leer")
+def MarcarNotificacionesLeidas(
+    Datos: NotificacionesLeer,
+    SesionBD: Session = Depends(ObtenerSesion),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
+):
+    if Datos.Ids is None and Datos.Hasta is None:
+        raise HTTPException(status_code=400, detail="Indica Ids o Hasta")
+    hasta = Datos.Hasta
+    if hasta is not None and hasta.tzinfo is not None:
+        hasta = hasta.astimezone(timezone.utc).replace(tzinfo=None)
+    marcadas = Notificaciones.MarcarLeidas(SesionBD, UsuarioActual.Id, Ids=Datos.Ids, Hasta=hasta)
+    SesionBD.commit()
+    return {"ok": True, "Marcadas": marcadas, "NoLeidas": Notificaciones.ContarNoLeidas(SesionBD, UsuarioActual.Id)}
+
+
 @Router.post("/notificaciones/{Id}/leer")
 def MarcarNotificacionLeida(
     Id: int,
     SesionBD: Session = Depends(ObtenerSesion),
-    UsuarioActual: Usuario = Depends(get_current_user),
+    UsuarioActual: UsuarioSesion = Depends(get_current_user),
 ):
     notificacion = SesionBD.get(NotificacionSistema, Id)
     if not notificacion or notificacion.UsuarioId != UsuarioActual.Id:
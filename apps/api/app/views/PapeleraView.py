@@ -1,63 +1,44 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
 
-from app.core.Database import ObtenerSesion, IniciarTablas
+from app.core.Database import ObtenerSesion
+from app.core.Paginacion import (
+    CortarPagina,
+    DecodificarCursorId,
+    EsFormatoNDJSON,
+    IterarConSesionPropia,
+    NormalizarLimite,
+    RespuestaJSON,
+    RespuestaNDJSON,
+)
+from app.core.ZonasHorarias import AUtcNaive, ConvertidorUsuario
 from app.services.MetasService import MetasService
 from app.services.EventosService import EventosService, RecordatoriosService
-from app.services.UsuariosService import UsuariosService
-
-try:
-    from zoneinfo import ZoneInfo
-except Exception:
-    ZoneInfo = None  # type: ignore
 
 Router = APIRouter()
 Metas = MetasService()
 Eventos = EventosService()
 Recordatorios = RecordatoriosService()
-Usuarios = UsuariosService()
+CAMPOS_FECHA_META = ("CreadoEn", "ActualizadoEn", "EliminadoEn")
+CAMPOS_FECHA_EVENTO = ("Inicio", "Fin", "CreadoEn", "ActualizadoEn", "EliminadoEn")
+CAMPOS_FECHA_RECORDATORIO = ("FechaHora", "CreadoEn", "EliminadoEn")
 
-@Router.on_event("startup")
-def AlIniciar():
-    IniciarTablas()
 
-# Utilidades de zona horaria (copiadas de EventoView para consistencia)
-def _obtener_tz(SesionBD: Session, UsuarioId: Optional[int], ZonaHoraria: Optional[str]):
-    zona = ZonaHoraria
-    if zona is None and UsuarioId is not None:
-        u = Usuarios.Obtener(SesionBD, UsuarioId)
-        if u is not None and u.ZonaHoraria:
-            zona = u.ZonaHoraria
+def _decodificar_cursor(cursor: Optional[str]) -> Optional[int]:
     try:
-        if zona and ZoneInfo:
-            return ZoneInfo(zona)
-    except Exception:
-        pass
-    return timezone.utc
-
+        return DecodificarCursorId(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
 
-def _a_utc_naive(dt: Optional[datetime], ZonaEntrada: Optional[str] = None) -> Optional[datetime]:
-    if dt is None:
-        return None
-    if dt.tzinfo is not None:
-        return dt.astimezone(timezone.utc).replace(tzinfo=None)
-    if ZonaEntrada and ZoneInfo:
-        try:
-            loc = dt.replace(tzinfo=ZoneInfo(ZonaEntrada))
-            return loc.astimezone(timezone.utc).replace(tzinfo=None)
-        except Exception:
-            pass
-    return dt
 
+def _responder(formato: Optional[str], salida: list, siguiente: Optional[str]):
+    if EsFormatoNDJSON(formato):
+        return RespuestaNDJSON(salida, siguiente)
+    return RespuestaJSON(salida, siguiente)
 
-def _a_zona_iso(dt: Optional[datetime], tz) -> Optional[str]:
-    if dt is None:
-        return None
-    aware = dt.replace(tzinfo=timezone.utc)
-    return aware.astimezone(tz).isoformat()
 
 # Listados de papelera (solo soft-deleted)
 @Router.get("/papelera/metas")
@@ -68,20 +49,23 @@ def ListarMetasEliminadas(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     ZonaHorariaEntrada: Optional[str] = None,
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
 ):
-    desde_utc = _a_utc_naive(Desde, ZonaHorariaEntrada) if Desde else None
-    hasta_utc = _a_utc_naive(Hasta, ZonaHorariaEntrada) if Hasta else None
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    res = Metas.ListarMetasEliminadas(SesionBD, PropietarioId=PropietarioId, Desde=desde_utc, Hasta=hasta_utc)
-    salida = []
-    for m in res:
-        obj = m.dict()
-        obj["CreadoEn"] = _a_zona_iso(m.CreadoEn, tz)
-        obj["ActualizadoEn"] = _a_zona_iso(m.ActualizadoEn, tz) if m.ActualizadoEn else None
-        obj["EliminadoEn"] = _a_zona_iso(m.EliminadoEn, tz) if m.EliminadoEn else None
-        salida.append(obj)
-    return salida
+    despues_id = _decodificar_cursor(cursor)
+    lim = NormalizarLimite(limite)
+    desde_utc = AUtcNaive(Desde, ZonaHorariaEntrada) if Desde else None
+    hasta_utc = AUtcNaive(Hasta, ZonaHorariaEntrada) if Hasta else None
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    filtros = dict(PropietarioId=PropietarioId, Desde=desde_utc, Hasta=hasta_utc, DespuesDeId=despues_id)
+    if EsFormatoNDJSON(formato) and lim is None:
+        filas = IterarConSesionPropia(lambda s: Metas.IterarMetasEliminadas(s, **filtros))
+        return RespuestaNDJSON(conv.ConvertirCampos(m.model_dump(), CAMPOS_FECHA_META) for m in filas)
+    res = Metas.ListarMetasEliminadas(SesionBD, Limite=lim + 1 if lim else None, **filtros)
+    res, siguiente = CortarPagina(res, lim, lambda m: (m.Id,))
+    return _responder(formato, conv.ConvertirFilas((m.model_dump() for m in res), CAMPOS_FECHA_META), siguiente)
 
 
 @Router.get("/papelera/eventos")
@@ -93,28 +77,29 @@ def ListarEventosEliminados(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     ZonaHorariaEntrada: Optional[str] = None,
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
 ):
-    desde_utc = _a_utc_naive(Desde, ZonaHorariaEntrada) if Desde else None
-    hasta_utc = _a_utc_naive(Hasta, ZonaHorariaEntrada) if Hasta else None
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    res = Eventos.ListarEventosEliminados(
-        SesionBD,
+    despues_id = _decodificar_cursor(cursor)
+    lim = NormalizarLimite(limite)
+    desde_utc = AUtcNaive(Desde, ZonaHorariaEntrada) if Desde else None
+    hasta_utc = AUtcNaive(Hasta, ZonaHorariaEntrada) if Hasta else None
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    filtros = dict(
         PropietarioId=PropietarioId,
         MetaId=MetaId,
         Desde=desde_utc,
         Hasta=hasta_utc,
+        DespuesDeId=despues_id,
     )
-    salida = []
-    for ev in res:
-        obj = ev.dict()
-        obj["Inicio"] = _a_zona_iso(ev.Inicio, tz)
-        obj["Fin"] = _a_zona_iso(ev.Fin, tz)
-        obj["CreadoEn"] = _a_zona_iso(ev.CreadoEn, tz)
-        obj["ActualizadoEn"] = _a_zona_iso(ev.ActualizadoEn, tz) if ev.ActualizadoEn else None
-        obj["EliminadoEn"] = _a_zona_iso(ev.EliminadoEn, tz) if ev.EliminadoEn else None
-        salida.append(obj)
-    return salida
+    if EsFormatoNDJSON(formato) and lim is None:
+        filas = IterarConSesionPropia(lambda s: Eventos.IterarEventosEliminados(s, **filtros))
+        return RespuestaNDJSON(conv.ConvertirCampos(ev.model_dump(), CAMPOS_FECHA_EVENTO) for ev in filas)
+    res = Eventos.ListarEventosEliminados(SesionBD, Limite=lim + 1 if lim else None, **filtros)
+    res, siguiente = CortarPagina(res, lim, lambda ev: (ev.Id,))
+    return _responder(formato, conv.ConvertirFilas((ev.model_dump() for ev in res), CAMPOS_FECHA_EVENTO), siguiente)
 
 
 @Router.get("/papelera/recordatorios")
@@ -125,17 +110,20 @@ def ListarRecordatoriosEliminados(
     UsuarioId: Optional[int] = None,
     ZonaHoraria: Optional[str] = None,
     ZonaHorariaEntrada: Optional[str] = None,
+    limite: Optional[int] = None,
+    cursor: Optional[str] = None,
+    formato: Optional[str] = None,
     SesionBD: Session = Depends(ObtenerSesion),
 ):
-    desde_utc = _a_utc_naive(Desde, ZonaHorariaEntrada) if Desde else None
-    hasta_utc = _a_utc_naive(Hasta, ZonaHorariaEntrada) if Hasta else None
-    tz = _obtener_tz(SesionBD, UsuarioId, ZonaHoraria)
-    res = Recordatorios.ListarRecordatoriosEliminados(SesionBD, EventoId=EventoId, Desde=desde_utc, Hasta=hasta_utc)
-    salida = []
-    for r in res:
-        obj = r.dict()
-        obj["FechaHora"] = _a_zona_iso(r.FechaHora, tz)
-        obj["CreadoEn"] = _a_zona_iso(r.CreadoEn, tz)
-        obj["EliminadoEn"] = _a_zona_iso(r.EliminadoEn, tz) if r.EliminadoEn else None
-        salida.append(obj)
-    return salida
+    despues_id = _decodificar_cursor(cursor)
+    lim = NormalizarLimite(limite)
+    desde_utc = AUtcNaive(Desde, ZonaHorariaEntrada) if Desde else None
+    hasta_utc = AUtcNaive(Hasta, ZonaHorariaEntrada) if Hasta else None
+    conv = ConvertidorUsuario(SesionBD, UsuarioId, ZonaHoraria)
+    filtros = dict(EventoId=EventoId, Desde=desde_utc, Hasta=hasta_utc, DespuesDeId=despues_id)
+    if EsFormatoNDJSON(formato) and lim is None:
+        filas = IterarConSesionPropia(lambda s: Recordatorios.IterarRecordatoriosEliminados(s, **filtros))
+        return RespuestaNDJSON(conv.ConvertirCampos(r.model_dump(), CAMPOS_FECHA_RECORDATORIO) for r in filas)
+    res = Recordatorios.ListarRecordatoriosEliminados(SesionBD, Limite=lim + 1 if lim else None, **filtros)
+    res, siguiente = CortarPagina(res, lim, lambda r: (r.Id,))
+    return _responder(formato, conv.ConvertirFilas((r.model_dump() for r in res), CAMPOS_FECHA_RECORDATORIO), siguiente)
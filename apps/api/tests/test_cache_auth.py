@@ -0,0 +1,61 @@
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from fastapi.testclient import TestClient
+
+from app.core.CacheAuth import CacheTTL
+from app.main import Aplicacion
+
+client = TestClient(Aplicacion)
+
+
+def test_cache_ttl_expira_y_descarta_lru():
+    cache = CacheTTL(MaxEntradas=2, TTL=60)
+    cache.Poner("a", 1)
+    cache.Poner("b", 2)
+    assert cache.Obtener("a") == 1  # 'a' pasa a ser la mas reciente
+    cache.Poner("c", 3)
+    assert cache.Obtener("b") is None
+    assert cache.Obtener("a") == 1
+    cache.Poner("d", 4, TTL=0.01)
+    time.sleep(0.02)
+    assert cache.Obtener("d") is None
+
+
+def test_usuario_eliminado_invalida_la_cache():
+    correo = f"cache_{uuid.uuid4().hex[:8]}@example.com"
+    r = client.post("/auth/registro", json={"Correo": correo, "Nombre": "Cache", "Contrasena": "x"})
+    h = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    r_usuarios = client.get("/usuarios", headers=h)
+    assert r_usuarios.status_code == 200
+    uid = next(u["Id"] for u in r_usuarios.json() if u["Correo"] == correo)
+    assert client.delete(f"/usuarios/{uid}", headers=h).status_code == 200
+    # El usuario estaba en cache; Eliminar debe invalidarlo de inmediato
+    assert client.get("/usuarios", headers=h).status_code == 401
+
+
+def test_actualizar_usuario_invalida_la_cache_al_confirmar():
+    from sqlmodel import Session
+    from app.core.CacheAuth import ObtenerUsuarioSesion
+    from app.core.Database import ObtenerEngine, UnidadDeTrabajo
+    from app.services.UsuariosService import UsuariosService
+
+    correo = f"cache_tx_{uuid.uuid4().hex[:8]}@example.com"
+    r = client.post("/auth/registro", json={"Correo": correo, "Nombre": "CacheTx", "Contrasena": "x"})
+    h = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    uid = next(u["Id"] for u in client.get("/usuarios", headers=h).json() if u["Correo"] == correo)
+    motor = ObtenerEngine()
+    with Session(motor) as sesion:
+        zona_inicial = ObtenerUsuarioSesion(sesion, uid).ZonaHoraria
+        with UnidadDeTrabajo(sesion):
+            UsuariosService().Actualizar(sesion, uid, ZonaHoraria="America/Managua")
+            # Otra peticion antes del COMMIT ve (y cachea) el estado confirmado anterior
+            with Session(motor) as otra:
+                assert ObtenerUsuarioSesion(otra, uid).ZonaHoraria == zona_inicial
+    with Session(motor) as otra:
+        assert ObtenerUsuarioSesion(otra, uid).ZonaHoraria == "America/Managua"
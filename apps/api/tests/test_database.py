@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from sqlalchemy.pool import QueuePool
+
+from app.core.Database import CrearMotor, _ArgumentosMotor, _PragmasSQLite
+
+
+def _Pragma(motor, Nombre):
+    with motor.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {Nombre}").scalar()
+
+
+def test_motor_sqlite_en_archivo_aplica_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("MYPLANU_SQLITE_CACHE_KB", "4000")
+    monkeypatch.setenv("MYPLANU_SQLITE_MMAP_BYTES", "1048576")
+    monkeypatch.setenv("MYPLANU_SQLITE_BUSY_TIMEOUT_MS", "1234")
+    monkeypatch.setenv("MYPLANU_DB_POOL_SIZE", "3")
+    motor = CrearMotor(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    try:
+        assert _Pragma(motor, "journal_mode") == "wal"
+        assert _Pragma(motor, "synchronous") == 1  # NORMAL
+        assert _Pragma(motor, "cache_size") == -4000
+        assert _Pragma(motor, "mmap_size") == 1048576
+        assert _Pragma(motor, "busy_timeout") == 1234
+        assert isinstance(motor.pool, QueuePool) and motor.pool.size() == 3
+        # SAVEPOINT dentro de la transaccion que abre SQLAlchemy (pysqlite no abre la suya)
+        with motor.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+            anidada = conn.begin_nested()
+            conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+            anidada.rollback()
+            conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+        with motor.connect() as conn:
+            assert [fila[0] for fila in conn.exec_driver_sql("SELECT x FROM t")] == [2]
+    finally:
+        motor.dispose()
+
+
+def test_perfil_ninguno_no_cambia_el_journal(tmp_path, monkeypatch):
+    monkeypatch.setenv("MYPLANU_SQLITE_PERFIL", "ninguno")
+    assert _PragmasSQLite() == {}
+    motor = CrearMotor(f"sqlite:///{tmp_path / 'sin_perfil.db'}")
+    try:
+        assert _Pragma(motor, "journal_mode") == "delete"
+    finally:
+        motor.dispose()
+
+
+def test_sqlite_en_memoria_sin_opciones_de_pool_ni_wal():
+    for url in ("sqlite://", "sqlite:///:memory:"):
+        argumentos = _ArgumentosMotor(url)
+        assert "pool_size" not in argumentos and "max_overflow" not in argumentos
+        motor = CrearMotor(url)
+        try:
+            assert _Pragma(motor, "journal_mode") == "memory"
+            assert _Pragma(motor, "synchronous") == 1
+            assert _Pragma(motor, "busy_timeout") == 5000
+        finally:
+            motor.dispose()
+
+
+def test_valores_invalidos_del_entorno_usan_los_por_defecto(monkeypatch):
+    monkeypatch.setenv("MYPLANU_SQLITE_CACHE_KB", "mucho")
+    monkeypatch.setenv("MYPLANU_SQLITE_MMAP_BYTES", "")
+    monkeypatch.setenv("MYPLANU_SQLITE_BUSY_TIMEOUT_MS", "1.5")
+    monkeypatch.setenv("MYPLANU_DB_POOL_SIZE", "x")
+    monkeypatch.setenv("MYPLANU_DB_POOL_MAX_OVERFLOW", "-4")
+    monkeypatch.setenv("MYPLANU_DB_POOL_TIMEOUT", "nunca")
+    pragmas = _PragmasSQLite()
+    assert pragmas["cache_size"] == -20000
+    assert pragmas["mmap_size"] == 268435456
+    assert pragmas["busy_timeout"] == 5000
+    argumentos = _ArgumentosMotor("sqlite:///./otra.db")
+    assert argumentos["connect_args"]["timeout"] == 5.0
+    assert argumentos["pool_size"] == 10
+    assert argumentos["max_overflow"] == 0  # negativo: se acota al minimo
+    assert argumentos["pool_timeout"] == 30
+    assert argumentos["pool_pre_ping"] is False
+    assert _ArgumentosMotor("postgresql://u@h/db")["pool_pre_ping"] is True
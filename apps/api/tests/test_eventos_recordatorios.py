@@ -1,6 +1,6 @@
 from fastapi.exceptions import ResponseValidationError
 from fastapi.testclient import TestClient
-from sqlmodel import Session
+from sqlmodel import Session, select
 import sys
 from pathlib import Path
 
@@ -287,6 +287,33 @@ def test_eliminar_meta_cascada_eventos_recordatorios():
         assert rec_db is not None and rec_db.EliminadoEn is not None
 
 
+def test_eliminar_usuario_cascada_masiva():
+    import uuid
+
+    usuario, headers = crear_usuario(f"cascada_{uuid.uuid4().hex[:8]}@example.com", "CascadaUsuario")
+    meta_ids = [crear_meta(usuario["Id"], headers, titulo=f"Meta U{i}").json()["Id"] for i in range(2)]
+    eventos = []
+    for i, meta_id in enumerate(meta_ids * 2):
+        eventos.append(crear_evento({
+            "MetaId": meta_id,
+            "PropietarioId": usuario["Id"],
+            "Titulo": f"Evento U{i}",
+            "Inicio": "2031-02-01T08:00:00",
+            "Fin": "2031-02-01T09:00:00"
+        }, headers)["Id"])
+    recs = [crear_recordatorio({"EventoId": ev, "FechaHora": "2031-02-01T07:30:00", "Canal": "Local"}, headers)["Id"] for ev in eventos]
+
+    assert client.delete(f"/usuarios/{usuario['Id']}", headers=headers).status_code == 200
+
+    with Session(ObtenerEngine()) as sesion:
+        metas_db = [sesion.get(Meta, i) for i in meta_ids]
+        eventos_db = [sesion.get(Evento, i) for i in eventos]
+        recs_db = [sesion.get(Recordatorio, i) for i in recs]
+        fechas = {x.EliminadoEn for x in metas_db + eventos_db + recs_db}
+        # Todo marcado en la misma cascada (mismo instante)
+        assert len(fechas) == 1 and None not in fechas
+
+
 def test_meta_colectiva_requiere_colaborador():
     dueno, headers_dueno = crear_usuario("colectiva@example.com", "Owner")
     meta_resp = crear_meta(dueno["Id"], headers_dueno, titulo="Meta Colectiva", tipo="Colectiva")
@@ -316,6 +343,8 @@ def test_meta_colectiva_requiere_colaborador():
 
 
 def test_bitacora_registra_recuperacion_meta():
+    from app.services.BitacoraService import Escritor
+
     usuario, headers = crear_usuario("audit@example.com", "Audit")
     r_meta = crear_meta(usuario["Id"], headers, titulo="Meta Audit")
     meta_id = r_meta.json()["Id"]
@@ -323,6 +352,7 @@ def test_bitacora_registra_recuperacion_meta():
     assert r_delete.status_code == 200
     r_recuperar = client.post(f"/metas/{meta_id}/recuperar", headers=headers)
     assert r_recuperar.status_code == 200
+    Escritor.Vaciar()
 
     r_bitacora = client.get("/bitacora/recuperaciones", headers=headers)
     assert r_bitacora.status_code == 200
@@ -334,6 +364,110 @@ def test_bitacora_registra_recuperacion_meta():
             break
 
 
+def test_bitacora_diferida_solo_tras_commit_y_paginada():
+    import uuid
+    from app.services.BitacoraService import BitacoraService, Escritor
+
+    usuario, headers = crear_usuario(f"bitacora-{uuid.uuid4().hex[:8]}@example.com", "Bitacora")
+    bitacora = BitacoraService()
+    with Session(ObtenerEngine()) as sesion:
+        bitacora.RegistrarRecuperaciones(sesion, "Evento", [900001], usuario["Id"])
+        sesion.rollback()
+    assert Escritor.Pendientes() == 0
+    with Session(ObtenerEngine()) as sesion:
+        bitacora.RegistrarRecuperaciones(sesion, "Evento", [900002, 900003, 900004], usuario["Id"])
+        sesion.commit()
+    # Leer no escribe: lo encolado espera al vaciado
+    client.get("/bitacora/recuperaciones?limite=1", headers=headers)
+    assert Escritor.Pendientes() == 3
+    Escritor.Vaciar()
+
+    r1 = client.get("/bitacora/recuperaciones?limite=2", headers=headers)
+    assert r1.status_code == 200
+    cursor = r1.headers["X-Siguiente-Cursor"]
+    r2 = client.get(f"/bitacora/recuperaciones?limite=2&cursor={cursor}", headers=headers)
+    ids = [reg["EntidadId"] for reg in r1.json() + r2.json()]
+    assert sorted(ids) == [900002, 900003, 900004]
+    assert "X-Siguiente-Cursor" not in r2.headers
+    assert client.get("/bitacora/recuperaciones?cursor=xx", headers=headers).status_code == 400
+
+
+def test_bitacora_descarta_solo_el_lote_fallido_tras_agotar_reintentos(monkeypatch, caplog):
+    from app.services import BitacoraService as modulo
+
+    escritor = modulo.EscritorBitacora(MaximoCola=1000, MaximoReintentos=2)
+    caida = [True]
+    motor_real = modulo.ObtenerEngine
+
+    def MotorCaido():
+        if caida[0]:
+            raise RuntimeError("base no disponible")
+        return motor_real()
+
+    monkeypatch.setattr(modulo, "ObtenerEngine", MotorCaido)
+    escritor.Encolar([{"TipoEntidad": "Evento", "EntidadId": 1, "UsuarioId": None, "Detalle": None}])
+    assert escritor.Vaciar() == 0
+    assert escritor.Pendientes() == 1
+    escritor.Encolar([{"TipoEntidad": "Evento", "EntidadId": 2, "UsuarioId": None, "Detalle": None}])
+    with caplog.at_level("ERROR", logger=modulo.logger.name):
+        assert escritor.Vaciar() == 0
+    # Segundo fallo seguido: solo el lote que fallo va al log; lo encolado despues sigue pendiente
+    assert "(1 entradas)" in caplog.text
+    assert escritor.Pendientes() == 1
+    caida[0] = False
+    assert escritor.Vaciar() == 1
+    assert escritor.Pendientes() == 0
+
+
+def test_recuperar_meta_en_cascada_restaura_solo_lo_de_la_cascada():
+    usuario, headers = crear_usuario("undo@example.com", "Undo")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Undo").json()["Id"]
+    base = {"MetaId": meta_id, "PropietarioId": usuario["Id"], "Inicio": "2031-03-01T08:00:00", "Fin": "2031-03-01T09:00:00"}
+    ev_cascada = crear_evento({**base, "Titulo": "Ev Cascada"}, headers)["Id"]
+    ev_previo = crear_evento({**base, "Titulo": "Ev Previo"}, headers)["Id"]
+    rec = crear_recordatorio({"EventoId": ev_cascada, "FechaHora": "2031-03-01T07:30:00", "Canal": "Local"}, headers)["Id"]
+    # Eliminado antes y por separado: no debe volver con la meta
+    assert client.delete(f"/eventos/{ev_previo}", headers=headers).status_code == 200
+    assert client.delete(f"/metas/{meta_id}", headers=headers).status_code == 200
+
+    r = client.post(f"/metas/{meta_id}/recuperar?cascada=true", headers=headers)
+    assert r.status_code == 200, r.text
+
+    with Session(ObtenerEngine()) as sesion:
+        assert sesion.get(Evento, ev_cascada).EliminadoEn is None
+        assert sesion.get(Recordatorio, rec).EliminadoEn is None
+        assert sesion.get(Evento, ev_previo).EliminadoEn is not None
+    registros = client.get("/bitacora/recuperaciones", headers=headers).json()
+    recuperados = {(reg["TipoEntidad"], reg["EntidadId"]) for reg in registros}
+    assert {("Evento", ev_cascada), ("Recordatorio", rec)} <= recuperados
+    assert ("Evento", ev_previo) not in recuperados
+
+
+def test_recuperar_meta_en_cascada_reprograma_recordatorios(monkeypatch):
+    import uuid
+    from datetime import datetime
+    from sqlalchemy import update
+    from app.services import EventosService
+
+    programados = []
+    monkeypatch.setattr(EventosService.Despachador, "Programar", lambda rid, proxima: programados.append((rid, proxima)))
+    usuario, headers = crear_usuario(f"undo-rec-{uuid.uuid4().hex[:8]}@example.com", "UndoRec")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Undo Rec").json()["Id"]
+    evento_id = crear_evento({"MetaId": meta_id, "PropietarioId": usuario["Id"], "Titulo": "Ev Undo Rec", "Inicio": "2031-03-01T08:00:00", "Fin": "2031-03-01T09:00:00"}, headers)["Id"]
+    diario = crear_recordatorio({"EventoId": evento_id, "FechaHora": "2031-03-01T07:30:00", "Canal": "Push", "FrecuenciaRepeticion": "Diaria", "IntervaloRepeticion": 1}, headers)["Id"]
+    assert client.delete(f"/metas/{meta_id}", headers=headers).status_code == 200
+    with Session(ObtenerEngine()) as sesion:
+        # Disparo que quedo atras mientras estuvo eliminado
+        sesion.execute(update(Recordatorio).where(Recordatorio.Id == diario).values(ProximaEjecucion=datetime(2020, 1, 1, 7, 30)))
+        sesion.commit()
+    programados.clear()
+
+    assert client.post(f"/metas/{meta_id}/recuperar?cascada=true", headers=headers).status_code == 200
+    with Session(ObtenerEngine()) as sesion:
+        assert sesion.get(Recordatorio, diario).ProximaEjecucion == datetime(2031, 3, 1, 7, 30)
+    assert programados == [(diario, datetime(2031, 3, 1, 7, 30))]
+
+
 def test_notificaciones_evento_eliminado_para_participantes():
     dueno, headers_dueno = crear_usuario("notif-owner@example.com", "Owner")
     colab, headers_colab = crear_usuario("notif-colab@example.com", "Colab")
@@ -370,3 +504,605 @@ def test_notificaciones_evento_eliminado_para_participantes():
     notif_dueno = r_notif_dueno.json()
     assert any(n["Tipo"] == "EventoEliminado" and n["ReferenciaId"] == evento["Id"] for n in notif_dueno)
 
+
+
+def test_cascada_meta_notifica_una_vez_por_destinatario():
+    dueno, headers_dueno = crear_usuario("notif-meta-owner@example.com", "OwnerMeta")
+    colab, headers_colab = crear_usuario("notif-meta-colab@example.com", "ColabMeta")
+    meta_id = crear_meta(dueno["Id"], headers_dueno, titulo="Meta Noti Cascada").json()["Id"]
+    base = {"MetaId": meta_id, "PropietarioId": dueno["Id"], "Inicio": "2031-01-11T09:00:00", "Fin": "2031-01-11T10:00:00"}
+    eventos = [crear_evento({**base, "Titulo": f"Evento Cascada {i}"}, headers_dueno)["Id"] for i in range(3)]
+    for evento_id in eventos:
+        r = client.post(
+            f"/eventos/{evento_id}/participantes",
+            params={"UsuarioId": colab["Id"], "Rol": RolParticipante.Lector.value},
+            headers=headers_dueno,
+        )
+        assert r.status_code == 200
+
+    assert client.delete(f"/metas/{meta_id}", headers=headers_dueno).status_code == 200
+
+    for headers in (headers_colab, headers_dueno):
+        notifs = client.get("/notificaciones/sistema", headers=headers).json()
+        referencias = [n["ReferenciaId"] for n in notifs if n["Tipo"] == "EventoEliminado" and n["ReferenciaId"] in eventos]
+        assert sorted(referencias) == sorted(eventos)
+
+
+def test_conteo_no_leidas_y_marcado_masivo():
+    import uuid
+
+    sufijo = uuid.uuid4().hex[:8]
+    dueno, headers_dueno = crear_usuario(f"conteo-owner-{sufijo}@example.com", "OwnerConteo")
+    lector, headers_lector = crear_usuario(f"conteo-lector-{sufijo}@example.com", "LectorConteo")
+    meta_id = crear_meta(dueno["Id"], headers_dueno, titulo="Meta Conteo").json()["Id"]
+    base = {"MetaId": meta_id, "PropietarioId": dueno["Id"], "Inicio": "2031-01-12T09:00:00", "Fin": "2031-01-12T10:00:00"}
+    eventos = [crear_evento({**base, "Titulo": f"Evento Conteo {i}"}, headers_dueno)["Id"] for i in range(3)]
+    for evento_id in eventos:
+        client.post(
+            f"/eventos/{evento_id}/participantes",
+            params={"UsuarioId": lector["Id"], "Rol": RolParticipante.Lector.value},
+            headers=headers_dueno,
+        )
+        assert client.delete(f"/eventos/{evento_id}", headers=headers_dueno).status_code == 200
+
+    assert client.get("/notificaciones/conteo", headers=headers_lector).json()["NoLeidas"] == 3
+    notifs = client.get("/notificaciones/sistema", headers=headers_lector).json()
+
+    assert client.post(f"/notificaciones/{notifs[0]['Id']}/leer", headers=headers_lector).status_code == 200
+    assert client.get("/notificaciones/conteo", headers=headers_lector).json()["NoLeidas"] == 2
+
+    r = client.post("/notificaciones/leer", json={"Ids": [n["Id"] for n in notifs[1:2]]}, headers=headers_lector)
+    assert r.json()["Marcadas"] == 1 and r.json()["NoLeidas"] == 1
+    r = client.post("/notificaciones/leer", json={"Hasta": "2999-01-01T00:00:00Z"}, headers=headers_lector)
+    assert r.json()["Marcadas"] == 1 and r.json()["NoLeidas"] == 0
+    assert client.get("/notificaciones/sistema", headers=headers_lector).json() == []
+    assert client.post("/notificaciones/leer", json={}, headers=headers_lector).status_code == 400
+
+
+def test_proyeccion_poda_eventos_fuera_de_ventana():
+    usuario, headers = crear_usuario("ventana@example.com", "Ventana")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Ventana").json()["Id"]
+    dentro = crear_evento({
+        "MetaId": meta_id,
+        "PropietarioId": usuario["Id"],
+        "Titulo": "Dentro",
+        "Inicio": "2033-06-10T10:00:00",
+        "Fin": "2033-06-10T11:00:00",
+    }, headers)
+    fuera = crear_evento({
+        "MetaId": meta_id,
+        "PropietarioId": usuario["Id"],
+        "Titulo": "Fuera",
+        "Inicio": "2033-09-10T10:00:00",
+        "Fin": "2033-09-10T11:00:00",
+    }, headers)
+    serie = crear_evento({
+        "MetaId": meta_id,
+        "PropietarioId": usuario["Id"],
+        "Titulo": "Serie",
+        "Inicio": "2033-01-03T08:00:00",
+        "Fin": "2033-01-03T09:00:00",
+        "FrecuenciaRepeticion": "Diaria",
+        "IntervaloRepeticion": 1,
+    }, headers)
+
+    from datetime import datetime
+    from app.services.EventosService import EventosService
+
+    with Session(ObtenerEngine()) as sesion:
+        candidatos = EventosService().ListarCandidatosVentana(
+            sesion, datetime(2033, 6, 1), datetime(2033, 6, 30)
+        )
+        ids = {ev.Id for ev in candidatos}
+    assert dentro["Id"] in ids
+    assert serie["Id"] in ids
+    assert fuera["Id"] not in ids
+
+    r_proj = client.get(
+        "/eventos/proximos?Desde=2033-06-10T00:00:00&Hasta=2033-06-11T00:00:00",
+        headers=headers,
+    )
+    assert r_proj.status_code == 200, r_proj.text
+    ocurrencias = [o for o in r_proj.json() if o["EventoId"] in {dentro["Id"], fuera["Id"], serie["Id"]}]
+    assert {o["EventoId"] for o in ocurrencias} == {dentro["Id"], serie["Id"]}
+
+
+def test_ocurrencias_materializadas_se_mantienen_en_escrituras():
+    from datetime import datetime, timedelta
+    from sqlmodel import select
+    from app.models.Ocurrencia import Ocurrencia
+    from app.services.OcurrenciasService import OcurrenciasService
+
+    usuario, headers = crear_usuario("materializa@example.com", "Materializa")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Materializada").json()["Id"]
+    with Session(ObtenerEngine()) as sesion:
+        OcurrenciasService().ExtenderHorizonte(sesion, Dias=30)
+
+    base = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    evento = crear_evento({
+        "MetaId": meta_id,
+        "PropietarioId": usuario["Id"],
+        "Titulo": "Diaria Materializada",
+        "Inicio": base.isoformat(),
+        "Fin": (base + timedelta(hours=1)).isoformat(),
+        "FrecuenciaRepeticion": "Diaria",
+        "IntervaloRepeticion": 1,
+    }, headers)
+
+    def filas():
+        with Session(ObtenerEngine()) as sesion:
+            consulta = select(Ocurrencia).where(Ocurrencia.EventoId == evento["Id"])
+            return list(sesion.exec(consulta))
+
+    assert len(filas()) >= 28
+
+    r_upd = client.patch(f"/eventos/{evento['Id']}", json={"IntervaloRepeticion": 7}, headers=headers)
+    assert r_upd.status_code == 200, r_upd.text
+    assert 4 <= len(filas()) <= 5
+
+    desde = base.isoformat()
+    hasta = (base + timedelta(days=8)).isoformat()
+    r_proj = client.get(f"/eventos/proximos?Desde={desde}&Hasta={hasta}", headers=headers)
+    assert r_proj.status_code == 200, r_proj.text
+    propias = [o for o in r_proj.json() if o["EventoId"] == evento["Id"]]
+    assert len(propias) == 2
+
+    r_del = client.delete(f"/eventos/{evento['Id']}", headers=headers)
+    assert r_del.status_code == 200, r_del.text
+    assert filas() == []
+
+    r_rec = client.post(f"/eventos/{evento['Id']}/recuperar", headers=headers)
+    assert r_rec.status_code == 200, r_rec.text
+    assert 4 <= len(filas()) <= 5
+
+
+def test_materializar_usa_el_horizonte_extendido_por_otra_sesion():
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from sqlmodel import func, select
+    from app.models.Ocurrencia import HorizonteOcurrencias, Ocurrencia
+    from app.services.EventosService import EventosService
+    from app.services.OcurrenciasService import OcurrenciasService
+
+    usuario, headers = crear_usuario("horizonte-carrera@example.com", "Horizonte")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Horizonte").json()["Id"]
+    with Session(ObtenerEngine()) as sesion:
+        OcurrenciasService().ExtenderHorizonte(sesion, Dias=30)
+
+    def fijar_hasta(hasta):
+        with Session(ObtenerEngine()) as otra:
+            otra.execute(update(HorizonteOcurrencias).where(HorizonteOcurrencias.Id == 1).values(Hasta=hasta))
+            otra.commit()
+
+    with Session(ObtenerEngine(), expire_on_commit=False) as sesion:
+        servicio = EventosService()
+        # La sesion se queda con el horizonte cacheado en su mapa de identidad
+        cacheado = servicio.Ocurrencias.ObtenerHorizonte(sesion)
+        hasta_anterior = cacheado.Hasta
+        sesion.commit()
+        # Otra sesion avanza el horizonte mientras tanto
+        fijar_hasta(hasta_anterior + timedelta(days=3))
+        try:
+            base = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+            evento = servicio.CrearEvento(
+                sesion, meta_id, usuario["Id"], "Diaria Horizonte", base, base + timedelta(hours=1),
+                FrecuenciaRepeticion="Diaria", IntervaloRepeticion=1,
+            )
+            ultima = sesion.exec(select(func.max(Ocurrencia.Inicio)).where(Ocurrencia.EventoId == evento.Id)).one()
+        finally:
+            fijar_hasta(hasta_anterior)
+    # Sin releer el horizonte bajo bloqueo el evento quedaria sin filas en el tramo nuevo
+    assert ultima > hasta_anterior
+
+
+def test_agenda_limita_proyeccion_y_recordatorios_al_usuario():
+    from datetime import datetime, timedelta
+
+    dueno, headers_dueno = crear_usuario("agenda-dueno@example.com", "AgendaDueno")
+    invitado, headers_invitado = crear_usuario("agenda-invitado@example.com", "AgendaInvitado")
+    ajeno, headers_ajeno = crear_usuario("agenda-ajeno@example.com", "AgendaAjeno")
+    meta_id = crear_meta(dueno["Id"], headers_dueno, titulo="Meta Agenda").json()["Id"]
+    base = (datetime.utcnow() + timedelta(days=2)).replace(microsecond=0)
+    compartido = crear_evento({
+        "MetaId": meta_id,
+        "PropietarioId": dueno["Id"],
+        "Titulo": "Compartido",
+        "Inicio": base.isoformat(),
+        "Fin": (base + timedelta(hours=1)).isoformat(),
+    }, headers_dueno)
+    privado = crear_evento({
+        "MetaId": meta_id,
+        "PropietarioId": dueno["Id"],
+        "Titulo": "Privado",
+        "Inicio": base.isoformat(),
+        "Fin": (base + timedelta(hours=1)).isoformat(),
+    }, headers_dueno)
+    agregar_colaborador_evento(compartido["Id"], invitado["Id"], RolParticipante.Lector)
+    for ev in (compartido, privado):
+        crear_recordatorio({
+            "EventoId": ev["Id"],
+            "FechaHora": (base - timedelta(hours=1)).isoformat(),
+            "Canal": "Local",
+        }, headers_dueno)
+
+    params = {
+        "Desde": (base - timedelta(days=1)).isoformat(),
+        "Hasta": (base + timedelta(days=1)).isoformat(),
+    }
+    propios = {compartido["Id"], privado["Id"]}
+    ids_dueno = {o["EventoId"] for o in client.get("/eventos/proximos", params=params, headers=headers_dueno).json()}
+    ids_invitado = {o["EventoId"] for o in client.get("/eventos/proximos", params=params, headers=headers_invitado).json()}
+    ids_ajeno = {o["EventoId"] for o in client.get("/eventos/proximos", params=params, headers=headers_ajeno).json()}
+    assert propios <= ids_dueno
+    assert ids_invitado & propios == {compartido["Id"]}
+    assert not ids_ajeno & propios
+
+    r_recs = client.get("/recordatorios/proximos", params={"dias": 7}, headers=headers_invitado)
+    assert r_recs.status_code == 200, r_recs.text
+    assert {r["EventoId"] for r in r_recs.json()} & propios == {compartido["Id"]}
+
+
+def test_listas_paginadas_por_cursor_y_ndjson():
+    import json
+
+    usuario, headers = crear_usuario("paginas@example.com", "Paginas")
+    for i in range(3):
+        assert crear_meta(usuario["Id"], headers, titulo=f"Meta Pagina {i}").status_code == 201
+
+    completas = client.get("/metas", headers=headers).json()
+    vistos = []
+    cursor = None
+    while True:
+        params = {"limite": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/metas", params=params, headers=headers)
+        assert r.status_code == 200, r.text
+        assert len(r.json()) <= 2
+        vistos.extend(m["Id"] for m in r.json())
+        cursor = r.headers.get("X-Siguiente-Cursor")
+        if not cursor:
+            break
+    assert vistos == sorted(m["Id"] for m in completas)
+
+    r_bad = client.get("/metas", params={"cursor": "no-es-un-cursor"}, headers=headers)
+    assert r_bad.status_code == 400
+
+    r_nd = client.get("/eventos", params={"formato": "ndjson"}, headers=headers)
+    assert r_nd.status_code == 200
+    assert r_nd.headers["content-type"].startswith("application/x-ndjson")
+    lineas = [json.loads(linea) for linea in r_nd.text.splitlines() if linea]
+    assert [e["Id"] for e in lineas] == [e["Id"] for e in client.get("/eventos", headers=headers).json()]
+
+    r_pap = client.get("/papelera/metas", params={"limite": 1, "formato": "ndjson"}, headers=headers)
+    assert r_pap.status_code == 200
+    assert len([linea for linea in r_pap.text.splitlines() if linea]) <= 1
+
+
+def test_etag_devuelve_304_hasta_que_cambian_los_datos():
+    import uuid
+
+    usuario, headers = crear_usuario(f"etag-{uuid.uuid4().hex[:8]}@example.com", "ETag")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta ETag").json()["Id"]
+    url = "/eventos/proximos?Desde=2032-01-01T00:00:00&Hasta=2032-01-31T00:00:00"
+    r1 = client.get(url, headers=headers)
+    assert r1.status_code == 200
+    etag = r1.headers["ETag"]
+    r2 = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert r2.status_code == 304 and r2.content == b""
+    assert client.get("/metas", headers=headers).headers["ETag"] != etag
+
+    crear_evento({"MetaId": meta_id, "PropietarioId": usuario["Id"], "Titulo": "Nuevo", "Inicio": "2032-01-10T08:00:00", "Fin": "2032-01-10T09:00:00"}, headers)
+    r3 = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert r3.status_code == 200 and r3.headers["ETag"] != etag
+    assert [o["Titulo"] for o in r3.json()] == ["Nuevo"]
+
+
+def test_etag_de_proximos_cambia_con_el_reloj_mientras_el_rango_sigue_abierto(monkeypatch):
+    import uuid
+    from app.views import EventoView
+
+    _usuario, headers = crear_usuario(f"etag-reloj-{uuid.uuid4().hex[:8]}@example.com", "ETagReloj")
+    abierto = "/eventos/proximos?Desde=2020-01-01T00:00:00&Hasta=2040-01-01T00:00:00"
+    cerrado = "/eventos/proximos?Desde=2020-01-01T00:00:00&Hasta=2020-02-01T00:00:00"
+    monkeypatch.setattr(EventoView, "VentanaActual", lambda: 1)
+    etag_abierto = client.get(abierto, headers=headers).headers["ETag"]
+    etag_cerrado = client.get(cerrado, headers=headers).headers["ETag"]
+    monkeypatch.setattr(EventoView, "VentanaActual", lambda: 2)
+    # Lo ya pasado se recorta con max(Desde, ahora): la misma ETag no puede valer para otro tramo
+    assert client.get(abierto, headers={**headers, "If-None-Match": etag_abierto}).status_code == 200
+    assert client.get(cerrado, headers={**headers, "If-None-Match": etag_cerrado}).status_code == 304
+
+
+def test_despachador_encola_push_vencidos_y_reprograma_recurrentes():
+    import uuid
+    from datetime import datetime
+    from app.models.Salida import MensajeSalida
+    from app.services.DespachoService import DespachadorRecordatorios
+    from app.services.SalidaService import PasarelaBucle, RelaySalida
+
+    usuario, headers = crear_usuario(f"despacho-{uuid.uuid4().hex[:8]}@example.com", "Despacho")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Despacho").json()["Id"]
+    evento_id = crear_evento({"MetaId": meta_id, "PropietarioId": usuario["Id"], "Titulo": "Ev Despacho", "Inicio": "2033-01-01T10:00:00", "Fin": "2033-01-01T11:00:00"}, headers)["Id"]
+    unico = crear_recordatorio({"EventoId": evento_id, "FechaHora": "2033-01-01T08:00:00", "Canal": "Push"}, headers)["Id"]
+    diario = crear_recordatorio({"EventoId": evento_id, "FechaHora": "2033-01-01T09:00:00", "Canal": "Push", "FrecuenciaRepeticion": "Diaria", "IntervaloRepeticion": 1}, headers)["Id"]
+    local = crear_recordatorio({"EventoId": evento_id, "FechaHora": "2033-01-01T08:30:00", "Canal": "Local"}, headers)["Id"]
+
+    despachador = DespachadorRecordatorios(TamanoLote=50, TamanoCarga=100000, EsperaMaxima=30)
+    ahora = datetime(2033, 1, 1, 9, 30)
+    with Session(ObtenerEngine()) as sesion:
+        despachador.Ejecutar(sesion, Ahora=ahora)
+        salida = list(sesion.exec(select(MensajeSalida).where(MensajeSalida.UsuarioId == usuario["Id"])))
+        assert sorted(m.ReferenciaId for m in salida) == sorted([unico, diario])
+        assert all(m.Tipo == "Recordatorio" and m.EnviadoEn is None for m in salida)
+
+        rec_unico = sesion.get(Recordatorio, unico)
+        assert rec_unico.Enviado is True and rec_unico.ProximaEjecucion is None
+        rec_diario = sesion.get(Recordatorio, diario)
+        assert rec_diario.Enviado is False and rec_diario.FechaHora == datetime(2033, 1, 1, 9, 0)
+        assert rec_diario.ProximaEjecucion == datetime(2033, 1, 2, 9, 0)
+        # Local: no genera push ni queda enviado, pero ya no tiene disparos pendientes
+        rec_local = sesion.get(Recordatorio, local)
+        assert rec_local.Enviado is False and rec_local.ProximaEjecucion is None
+        # Nada nuevo vence hasta la siguiente ocurrencia
+        despachador.Ejecutar(sesion, Ahora=ahora)
+        assert len(list(sesion.exec(select(MensajeSalida).where(MensajeSalida.UsuarioId == usuario["Id"])))) == 2
+
+    # El relay agrupa los mensajes del usuario en un solo envio y los marca enviados
+    pasarela = PasarelaBucle()
+    relay = RelaySalida(pasarela, TamanoLote=100000, MaximoIntentos=3)
+    with Session(ObtenerEngine()) as sesion:
+        relay.Drenar(sesion)
+        envios = [e for e in pasarela.Vaciar() if e.UsuarioId == usuario["Id"]]
+        assert len(envios) == 1
+        assert sorted(m.ReferenciaId for m in envios[0].Mensajes) == sorted([unico, diario])
+        sesion.expire_all()
+        salida = list(sesion.exec(select(MensajeSalida).where(MensajeSalida.UsuarioId == usuario["Id"])))
+        assert all(m.EnviadoEn is not None for m in salida)
+
+
+def test_despachador_omite_recurrentes_que_otro_proceso_ya_avanzo(monkeypatch):
+    import uuid
+    from datetime import datetime
+    from sqlalchemy import update
+    from app.models.Salida import MensajeSalida
+    from app.services import DespachoService
+    from app.services.DespachoService import DespachadorRecordatorios
+
+    usuario, headers = crear_usuario(f"carrera-{uuid.uuid4().hex[:8]}@example.com", "Carrera")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Carrera").json()["Id"]
+    evento_id = crear_evento({"MetaId": meta_id, "PropietarioId": usuario["Id"], "Titulo": "Ev Carrera", "Inicio": "2034-01-01T10:00:00", "Fin": "2034-01-01T11:00:00"}, headers)["Id"]
+    diario = crear_recordatorio({"EventoId": evento_id, "FechaHora": "2034-01-01T09:00:00", "Canal": "Push", "FrecuenciaRepeticion": "Diaria", "IntervaloRepeticion": 1}, headers)["Id"]
+    semanal = crear_recordatorio({"EventoId": evento_id, "FechaHora": "2034-01-01T09:00:00", "Canal": "Push", "FrecuenciaRepeticion": "Semanal", "IntervaloRepeticion": 1}, headers)["Id"]
+
+    despachador = DespachadorRecordatorios(TamanoLote=50, TamanoCarga=100000, EsperaMaxima=30)
+    ahora = datetime(2034, 1, 1, 9, 30)
+    original = DespachoService.SiguienteOcurrencia
+
+    with Session(ObtenerEngine()) as sesion:
+        def SiguienteConCarrera(*args, **kwargs):
+            # Entre la lectura y la UPDATE otro proceso avanza el recordatorio diario
+            sesion.execute(update(Recordatorio).where(Recordatorio.Id == diario).values(ProximaEjecucion=datetime(2034, 1, 2, 9, 0)))
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(DespachoService, "SiguienteOcurrencia", SiguienteConCarrera)
+        despachados = despachador._Despachar(sesion, [diario, semanal], ahora)
+        assert despachados == 1
+        salida = list(sesion.exec(select(MensajeSalida).where(MensajeSalida.UsuarioId == usuario["Id"])))
+        assert [m.ReferenciaId for m in salida] == [semanal]
+        # Solo la fila que se avanzo vuelve al heap
+        assert [rid for _fecha, rid in despachador._Monticulo] == [semanal]
+        assert sesion.get(Recordatorio, semanal).ProximaEjecucion == datetime(2034, 1, 8, 9, 0)
+
+
+def test_relay_salida_reintenta_con_backoff_y_agota_intentos():
+    import uuid
+    from datetime import datetime, timedelta
+    from app.models.Salida import MensajeSalida
+    from app.services.SalidaService import RelaySalida, SalidaService
+
+    usuario, _headers = crear_usuario(f"relay-{uuid.uuid4().hex[:8]}@example.com", "Relay")
+
+    class PasarelaRechaza:
+        def Enviar(self, Envios):
+            return {e.UsuarioId for e in Envios if e.UsuarioId == usuario["Id"]}
+
+    with Session(ObtenerEngine()) as sesion:
+        SalidaService().Encolar(sesion, [{"UsuarioId": usuario["Id"], "Tipo": "EventoEliminado", "ReferenciaId": 1, "Titulo": "Aviso"}])
+        sesion.commit()
+        relay = RelaySalida(PasarelaRechaza(), TamanoLote=100000, MaximoIntentos=2)
+        ahora = datetime.utcnow() + timedelta(seconds=1)
+        relay.Drenar(sesion, Ahora=ahora)
+        sesion.expire_all()
+        mensaje = sesion.exec(select(MensajeSalida).where(MensajeSalida.UsuarioId == usuario["Id"])).one()
+        assert mensaje.Intentos == 1 and mensaje.EnviadoEn is None and mensaje.FallidoEn is None
+        assert mensaje.ProximoIntento > ahora
+
+        relay.Drenar(sesion, Ahora=mensaje.ProximoIntento)
+        sesion.expire_all()
+        mensaje = sesion.get(MensajeSalida, mensaje.Id)
+        assert mensaje.Intentos == 2 and mensaje.FallidoEn is not None and mensaje.EnviadoEn is None
+
+
+def test_relay_salida_reclama_el_lote_antes_de_enviar():
+    import uuid
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from app.models.Salida import MensajeSalida
+    from app.services.SalidaService import PasarelaBucle, RelaySalida, SalidaService
+
+    usuario, _headers = crear_usuario(f"reclamo-{uuid.uuid4().hex[:8]}@example.com", "Reclamo")
+    otra_pasarela = PasarelaBucle()
+    otro_relay = RelaySalida(otra_pasarela, TamanoLote=100000, MaximoIntentos=3)
+
+    class PasarelaConCompetidor(PasarelaBucle):
+        def Enviar(self, Envios):
+            # Mientras este relay envia, otro proceso drena la bandeja
+            with Session(ObtenerEngine()) as otra_sesion:
+                otro_relay.Drenar(otra_sesion, Ahora=ahora)
+            return super().Enviar(Envios)
+
+    pasarela = PasarelaConCompetidor()
+    relay = RelaySalida(pasarela, TamanoLote=100000, MaximoIntentos=3)
+    with Session(ObtenerEngine()) as sesion:
+        SalidaService().Encolar(sesion, [{"UsuarioId": usuario["Id"], "Tipo": "EventoEliminado", "ReferenciaId": 7, "Titulo": "Aviso"}])
+        sesion.commit()
+        ahora = datetime.utcnow() + timedelta(seconds=1)
+        relay.Drenar(sesion, Ahora=ahora)
+        assert [e for e in otra_pasarela.Vaciar() if e.UsuarioId == usuario["Id"]] == []
+        assert len([e for e in pasarela.Vaciar() if e.UsuarioId == usuario["Id"]]) == 1
+        mensaje = sesion.exec(select(MensajeSalida).where(MensajeSalida.UsuarioId == usuario["Id"])).one()
+        assert mensaje.EnviadoEn is not None and mensaje.Reclamado is None
+
+        # Un reclamo abandonado (relay caido a mitad de envio) se retoma cuando vence
+        SalidaService().Encolar(sesion, [{"UsuarioId": usuario["Id"], "Tipo": "EventoEliminado", "ReferenciaId": 8, "Titulo": "Aviso"}])
+        sesion.commit()
+        sesion.execute(
+            update(MensajeSalida)
+            .where(MensajeSalida.UsuarioId == usuario["Id"], MensajeSalida.EnviadoEn.is_(None))
+            .values(Reclamado="caido", ReclamadoEn=ahora)
+        )
+        sesion.commit()
+        otro_relay.Drenar(sesion, Ahora=ahora + timedelta(seconds=1))
+        assert [e for e in otra_pasarela.Vaciar() if e.UsuarioId == usuario["Id"]] == []
+        otro_relay.Drenar(sesion, Ahora=ahora + timedelta(hours=1))
+        envios = [e for e in otra_pasarela.Vaciar() if e.UsuarioId == usuario["Id"]]
+        assert [m.ReferenciaId for e in envios for m in e.Mensajes] == [8]
+
+
+def test_proximos_avanza_al_leer_recurrentes_con_proxima_ejecucion_atrasada():
+    import uuid
+    from datetime import datetime, timedelta
+    from app.services.EventosService import RecordatoriosService
+
+    usuario, headers = crear_usuario(f"atrasado-{uuid.uuid4().hex[:8]}@example.com", "Atrasado")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Atrasado").json()["Id"]
+    evento_id = crear_evento({"MetaId": meta_id, "PropietarioId": usuario["Id"], "Titulo": "Ev Atrasado", "Inicio": "2033-01-01T10:00:00", "Fin": "2033-01-01T11:00:00"}, headers)["Id"]
+    ahora = datetime.utcnow().replace(microsecond=0)
+    atrasada = ahora - timedelta(days=5, hours=-1)
+    with Session(ObtenerEngine()) as sesion:
+        # Sin despachador (MYPLANU_TAREAS_FONDO=0) el valor guardado se queda en el pasado
+        diario = Recordatorio(EventoId=evento_id, FechaHora=ahora - timedelta(days=30, hours=-1), Canal="Local", FrecuenciaRepeticion="Diaria", IntervaloRepeticion=1, ProximaEjecucion=atrasada)
+        sesion.add(diario)
+        sesion.commit()
+        diario_id = diario.Id
+        proximos = RecordatoriosService().ListarProximos(sesion, dias=2, UsuarioId=usuario["Id"])
+        assert [(r.Id, r.ProximaEjecucion) for r in proximos] == [(diario_id, ahora + timedelta(hours=1))]
+    r = client.get("/recordatorios/proximos", params={"dias": 2}, headers=headers)
+    assert diario_id in [x["Id"] for x in r.json()]
+    with Session(ObtenerEngine()) as sesion:
+        # La lectura no escribe: el avance lo persiste el despachador
+        assert sesion.get(Recordatorio, diario_id).ProximaEjecucion == atrasada
+
+
+def test_proximos_incluye_recurrentes_con_base_en_el_pasado():
+    import uuid
+    from datetime import datetime, timedelta
+    from app.services.EventosService import RecordatoriosService
+
+    usuario, headers = crear_usuario(f"proxima-{uuid.uuid4().hex[:8]}@example.com", "Proxima")
+    meta_id = crear_meta(usuario["Id"], headers, titulo="Meta Proxima").json()["Id"]
+    evento_id = crear_evento({"MetaId": meta_id, "PropietarioId": usuario["Id"], "Titulo": "Ev Proxima", "Inicio": "2033-01-01T10:00:00", "Fin": "2033-01-01T11:00:00"}, headers)["Id"]
+    servicio = RecordatoriosService()
+    ahora = datetime.utcnow().replace(microsecond=0)
+    with Session(ObtenerEngine()) as sesion:
+        # Serie diaria iniciada hace un mes: FechaHora queda fuera de la ventana, su siguiente disparo no
+        diario = Recordatorio(EventoId=evento_id, FechaHora=ahora - timedelta(days=30, hours=-1), Canal="Local", FrecuenciaRepeticion="Diaria", IntervaloRepeticion=1)
+        vencido = Recordatorio(EventoId=evento_id, FechaHora=ahora - timedelta(days=2), Canal="Local")
+        for r in (diario, vencido):
+            servicio._RecalcularProximaEjecucion(r)
+            sesion.add(r)
+        sesion.commit()
+        assert diario.ProximaEjecucion == ahora + timedelta(hours=1)
+        ids = [r.Id for r in servicio.ListarProximos(sesion, dias=2, UsuarioId=usuario["Id"])]
+    assert ids == [diario.Id]
+    r = client.get("/recordatorios/proximos", params={"dias": 2}, headers=headers)
+    assert r.status_code == 200
+    assert [x["Id"] for x in r.json()] == [diario.Id]
+
+
+def test_roles_memorizados_se_invalidan_al_cambiar_participantes():
+    import uuid
+    from sqlalchemy import event
+
+    dueno, headers = crear_usuario(f"roles-{uuid.uuid4().hex[:8]}@example.com", "Roles Dueno")
+    invitado, _ = crear_usuario(f"roles-inv-{uuid.uuid4().hex[:8]}@example.com", "Roles Invitado")
+    meta_id = crear_meta(dueno["Id"], headers, titulo="Meta Roles").json()["Id"]
+    evento_id = crear_evento({"MetaId": meta_id, "PropietarioId": dueno["Id"], "Titulo": "Ev Roles", "Inicio": "2033-02-01T10:00:00", "Fin": "2033-02-01T11:00:00"}, headers)["Id"]
+    svc = ParticipantesService()
+    with Session(ObtenerEngine()) as sesion:
+        participante_id = svc.AgregarParticipante(sesion, evento_id, invitado["Id"], RolParticipante.Lector).Id
+
+    consultas = []
+    motor = ObtenerEngine()
+
+    def contar(conn, cursor, sentencia, *args):
+        if "participanteevento" in sentencia.lower():
+            consultas.append(sentencia)
+
+    event.listen(motor, "before_cursor_execute", contar)
+    try:
+        with Session(motor) as sesion:
+            meta = sesion.get(Meta, meta_id)
+            assert svc.ObtenerRolEnEvento(sesion, evento_id, invitado["Id"]) == RolParticipante.Lector
+            assert svc.RolEnMeta(sesion, meta, invitado["Id"]) == RolParticipante.Lector
+        with Session(motor) as sesion:
+            meta = sesion.get(Meta, meta_id)
+            for _ in range(50):
+                assert svc.ObtenerRolEnEvento(sesion, evento_id, invitado["Id"]) == RolParticipante.Lector
+                assert svc.RolEnMeta(sesion, meta, invitado["Id"]) == RolParticipante.Lector
+        # Solo la primera peticion consulta participantes; las demas salen de la cache
+        assert len(consultas) == 2
+
+        with Session(motor) as sesion:
+            assert svc.CambiarRol(sesion, participante_id, RolParticipante.Colaborador) is not None
+        with Session(motor) as sesion:
+            meta = sesion.get(Meta, meta_id)
+            assert svc.ObtenerRolEnEvento(sesion, evento_id, invitado["Id"]) == RolParticipante.Colaborador
+            assert svc.RolEnMeta(sesion, meta, invitado["Id"]) == RolParticipante.Colaborador
+        with Session(motor) as sesion:
+            assert svc.QuitarParticipante(sesion, participante_id) is True
+        with Session(motor) as sesion:
+            assert svc.ObtenerRolEnEvento(sesion, evento_id, invitado["Id"]) is None
+    finally:
+        event.remove(motor, "before_cursor_execute", contar)
+
+
+def test_listas_filtran_por_permiso_de_lectura():
+    import json
+    import uuid
+
+    dueno, headers_dueno = crear_usuario(f"lect-{uuid.uuid4().hex[:8]}@example.com", "Lectura Dueno")
+    otro, headers_otro = crear_usuario(f"lect-otro-{uuid.uuid4().hex[:8]}@example.com", "Lectura Otro")
+    meta_id = crear_meta(dueno["Id"], headers_dueno, titulo="Meta Lectura").json()["Id"]
+    eventos = [
+        crear_evento({"MetaId": meta_id, "PropietarioId": dueno["Id"], "Titulo": f"Ev Lectura {i}", "Inicio": "2033-03-01T10:00:00", "Fin": "2033-03-01T11:00:00"}, headers_dueno)["Id"]
+        for i in range(3)
+    ]
+
+    assert meta_id in [m["Id"] for m in client.get("/metas", headers=headers_dueno).json()]
+    assert set(eventos) <= {e["Id"] for e in client.get("/eventos", headers=headers_dueno).json()}
+    assert meta_id not in [m["Id"] for m in client.get("/metas", headers=headers_otro).json()]
+    assert not set(eventos) & {e["Id"] for e in client.get("/eventos", headers=headers_otro).json()}
+
+    # Ningun listado de eventos o recordatorios expone filas ajenas
+    rec_id = crear_recordatorio({"EventoId": eventos[0], "FechaHora": "2033-03-01T09:00:00", "Canal": "Local"}, headers_dueno)["Id"]
+    url_proximos = "/eventos/proximos?Desde=2033-02-28T00:00:00&Hasta=2033-03-02T00:00:00"
+    assert set(eventos) <= {o["EventoId"] for o in client.get(url_proximos, headers=headers_dueno).json()}
+    assert not set(eventos) & {o["EventoId"] for o in client.get(url_proximos, headers=headers_otro).json()}
+    assert rec_id in [r["Id"] for r in client.get("/recordatorios", headers=headers_dueno).json()]
+    assert rec_id not in [r["Id"] for r in client.get("/recordatorios", headers=headers_otro).json()]
+    proximos = client.get("/recordatorios/proximos", params={"dias": 10000}, headers=headers_otro)
+    assert proximos.status_code == 200
+    assert rec_id not in [r["Id"] for r in proximos.json()]
+
+    # Paginas llenas de filas legibles: el LIMIT se aplica ya filtrado
+    pagina = client.get("/eventos", params={"limite": 2}, headers=headers_dueno)
+    assert len(pagina.json()) == 2
+
+    agregar_colaborador_evento(eventos[1], otro["Id"], RolParticipante.Lector)
+    assert meta_id in [m["Id"] for m in client.get("/metas", headers=headers_otro).json()]
+    visibles = {e["Id"] for e in client.get("/eventos", headers=headers_otro).json()}
+    assert set(eventos) & visibles == {eventos[1]}
+    r_nd = client.get("/eventos", params={"formato": "ndjson"}, headers=headers_otro)
+    assert eventos[1] in [json.loads(linea)["Id"] for linea in r_nd.text.splitlines() if linea]
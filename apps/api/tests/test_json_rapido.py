@@ -0,0 +1,32 @@
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from fastapi.encoders import jsonable_encoder
+
+import app.core.JSONRapido as JSONRapido
+from app.core.Permisos import RolParticipante
+
+
+FILAS = [
+    {
+        "Id": 1,
+        "Titulo": "Reunión",
+        "CreadoEn": datetime(2031, 1, 1, 8, 0, 0, 1500),
+        "EliminadoEn": None,
+        "Rol": RolParticipante.Dueno,
+        "DiasSemana": ["L", "M"],
+    }
+]
+
+
+def test_salida_equivale_a_jsonable_encoder_con_y_sin_orjson(monkeypatch):
+    esperado = jsonable_encoder(FILAS)
+    assert json.loads(JSONRapido.DumpsJSON(FILAS)) == esperado
+    monkeypatch.setattr(JSONRapido, "orjson", None)
+    assert json.loads(JSONRapido.DumpsJSON(FILAS)) == esperado
+    assert JSONRapido.RespuestaJSONRapida(FILAS).body == JSONRapido.DumpsJSON(FILAS)
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from sqlalchemy import create_engine, inspect
+
+import app.core.Database  # noqa: F401  # registra la metadata de los modelos
+from app.core.Database import IniciarTablas
+from app.core.Migraciones import AplicarMigraciones, LeerVersion, VERSION_ACTUAL
+
+
+def test_migra_base_legada_y_luego_solo_lee_version(tmp_path):
+    IniciarTablas()
+    motor = create_engine(f"sqlite:///{tmp_path / 'legado.db'}")
+    with motor.begin() as conn:
+        # Esquema previo a ZonaHoraria/ContrasenaHash y sin indices de agenda
+        conn.exec_driver_sql("CREATE TABLE usuario (Id INTEGER PRIMARY KEY, Nombre VARCHAR, Correo VARCHAR)")
+    assert LeerVersion(motor) is None
+
+    assert AplicarMigraciones(motor) == VERSION_ACTUAL
+    inspector = inspect(motor)
+    columnas = {c["name"] for c in inspector.get_columns("usuario")}
+    assert {"ZonaHoraria", "ContrasenaHash"} <= columnas
+    indices = {i["name"] for i in inspector.get_indexes("evento")}
+    assert "idx_evento_eliminado_inicio_fin" in indices
+    assert inspector.has_table("ocurrencia")
+    assert LeerVersion(motor) == VERSION_ACTUAL
+
+    # Segunda vez: camino rapido, sin tocar el esquema
+    with motor.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX idx_evento_propietario")
+    assert AplicarMigraciones(motor) == VERSION_ACTUAL
+    assert "idx_evento_propietario" not in {i["name"] for i in inspect(motor).get_indexes("evento")}
@@ -0,0 +1,100 @@
+import asyncio
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from sqlmodel import Session
+
+from app.core.Database import IniciarTablas, ObtenerEngine
+from app.services.EventosService import EventosService
+from app.services.MetasService import MetasService
+from app.services.NotificacionesService import NotificacionesService
+from app.services.UsuariosService import UsuariosService
+from app.views import MonitorView
+from app.views.MonitorView import _FlujoNotificaciones
+
+
+def _crear_usuario() -> int:
+    IniciarTablas()
+    with Session(ObtenerEngine()) as sesion:
+        return UsuariosService().Crear(sesion, f"sse_{uuid.uuid4().hex[:8]}@example.com", "SSE").Id
+
+
+def _notificar(usuario_id: int) -> int:
+    """Crea un evento del usuario y lo notifica como eliminado por la ruta de produccion."""
+    with Session(ObtenerEngine()) as sesion:
+        meta = MetasService().CrearMeta(sesion, usuario_id, "Meta SSE", "Individual")
+        inicio = datetime.utcnow() + timedelta(days=1)
+        evento = EventosService().CrearEvento(sesion, meta.Id, usuario_id, "Evento SSE", inicio, inicio + timedelta(hours=1))
+        NotificacionesService().NotificarEventosEliminados(sesion, [evento.Id])
+        sesion.commit()
+        return evento.Id
+
+
+def test_stream_empuja_notificacion_al_confirmar_y_reanuda_por_id():
+    usuario_id = _crear_usuario()
+
+    async def escuchar():
+        flujo = _FlujoNotificaciones(usuario_id, 0, Latido=30)
+        assert (await flujo.__anext__()).startswith("retry:")
+        pendiente = asyncio.ensure_future(flujo.__anext__())
+        await asyncio.sleep(0.05)
+        assert not pendiente.done()
+        # Latido de 30 s: si llega antes es porque el bus desperto al stream
+        evento_id = await asyncio.to_thread(_notificar, usuario_id)
+        evento = await asyncio.wait_for(pendiente, timeout=5)
+        await flujo.aclose()
+        return evento_id, evento
+
+    evento_id, evento = asyncio.run(escuchar())
+    lineas = evento.splitlines()
+    assert lineas[1] == "event: notificacion"
+    ultimo_id = int(lineas[0].split(": ")[1])
+    assert f'"ReferenciaId": {evento_id}' in lineas[2]
+
+    faltante_id = _notificar(usuario_id)
+
+    async def reanudar():
+        flujo = _FlujoNotificaciones(usuario_id, ultimo_id, Latido=30)
+        await flujo.__anext__()
+        evento = await asyncio.wait_for(flujo.__anext__(), timeout=5)
+        await flujo.aclose()
+        return evento
+
+    # Desde Last-Event-ID solo llega la que faltaba
+    assert f'"ReferenciaId": {faltante_id}' in asyncio.run(reanudar())
+
+
+def test_latido_no_consulta_y_un_aviso_drena_todas_las_paginas(monkeypatch):
+    usuario_id = _crear_usuario()
+    referencias = [_notificar(usuario_id) for _ in range(5)]
+    monkeypatch.setattr(MonitorView, "_PAGINA_SSE", 2)
+    lecturas = []
+    original = MonitorView._LeerNuevas
+
+    def contar(UsuarioId, DespuesDeId):
+        lecturas.append(DespuesDeId)
+        return original(UsuarioId, DespuesDeId)
+
+    monkeypatch.setattr(MonitorView, "_LeerNuevas", contar)
+
+    async def escuchar():
+        flujo = MonitorView._FlujoNotificaciones(usuario_id, 0, Latido=0.01, Revision=3600)
+        await flujo.__anext__()
+        eventos = [await flujo.__anext__() for _ in range(5)]
+        leidas = len(lecturas)
+        # Varios latidos seguidos sin volver a la base
+        for _ in range(3):
+            assert await flujo.__anext__() == ": latido\n\n"
+        assert len(lecturas) == leidas
+        await flujo.aclose()
+        return eventos
+
+    eventos = asyncio.run(escuchar())
+    assert [int(e.split("ReferenciaId\": ")[1].split(",")[0]) for e in eventos] == referencias
+    # Tres paginas (2 + 2 + 1) en la misma pasada, sin esperar latidos entre ellas
+    assert len(lecturas) == 3
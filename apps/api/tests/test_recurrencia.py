@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from app.core.Recurrencia import ExpandirOcurrencias
+
+
+def test_diaria_serie_antigua_llega_a_la_ventana():
+    # Mas de 1000 pasos desde la base: antes se agotaba max_iters y no devolvia nada
+    base = datetime(2000, 1, 1, 9, 0)
+    fechas = list(ExpandirOcurrencias(base, 'Diaria', 2, None, datetime(2030, 1, 1), datetime(2030, 1, 7)))
+    assert fechas == [datetime(2030, 1, 1, 9, 0), datetime(2030, 1, 3, 9, 0), datetime(2030, 1, 5, 9, 0)]
+
+
+def test_diaria_incluye_ocurrencia_en_curso_por_duracion():
+    base = datetime(2030, 1, 1, 23, 0)
+    fechas = list(
+        ExpandirOcurrencias(base, 'Diaria', 1, None, datetime(2030, 1, 5, 0, 30), datetime(2030, 1, 5, 12), timedelta(hours=2))
+    )
+    assert fechas == [datetime(2030, 1, 4, 23, 0)]
+
+
+def test_semanal_dias_y_no_antes_de_la_base():
+    base = datetime(2030, 2, 3, 10, 0)  # Domingo
+    fechas = list(ExpandirOcurrencias(base, 'Semanal', 1, 'Mie,Lun', datetime(2030, 2, 1), datetime(2030, 2, 13)))
+    assert fechas == [datetime(2030, 2, 4, 10, 0), datetime(2030, 2, 6, 10, 0), datetime(2030, 2, 11, 10, 0)]
+
+
+def test_semanal_intervalo_salta_semanas():
+    base = datetime(2020, 1, 6, 8, 0)  # Lunes
+    fechas = list(ExpandirOcurrencias(base, 'Semanal', 3, 'Lun', datetime(2030, 1, 1), datetime(2030, 3, 1)))
+    assert fechas
+    assert all(f.weekday() == 0 and ((f - base).days // 7) % 3 == 0 for f in fechas)
+
+
+def test_mensual_usa_meses_calendario():
+    base = datetime(2031, 1, 31, 12, 0)
+    fechas = list(ExpandirOcurrencias(base, 'Mensual', 1, None, datetime(2031, 1, 1), datetime(2031, 5, 1)))
+    assert fechas == [
+        datetime(2031, 1, 31, 12, 0),
+        datetime(2031, 2, 28, 12, 0),
+        datetime(2031, 3, 31, 12, 0),
+        datetime(2031, 4, 30, 12, 0),
+    ]
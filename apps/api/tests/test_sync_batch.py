@@ -1,3 +1,4 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.main import Aplicacion
 
@@ -62,3 +63,172 @@ def test_sync_eventos_create_invalid_interval():
     assert len(res["results"]) == 1
     assert res["results"][0]["ok"] is False
     assert "EventoInvalido" in res["results"][0]["error"]
+
+
+def test_sync_eventos_lote_en_una_transaccion_con_savepoints():
+    from sqlalchemy import event
+    from app.core.Database import ObtenerEngine
+
+    h = auth_headers()
+    r_meta = client.post("/metas", json={"PropietarioId":1, "Titulo":"M3", "TipoMeta":"Individual"}, headers=h)
+    meta_id = r_meta.json()["Id"]
+    evt = {"MetaId": meta_id, "Titulo": "EvtLote", "Inicio": "2036-03-01T10:00:00", "Fin": "2036-03-01T11:00:00"}
+    body = {
+        "operations": [
+            {"kind":"create","tempId":-1,"data":evt},
+            {"kind":"create","tempId":-2,"data":{**evt, "MetaId": 999999}},
+            {"kind":"update","targetId":-1,"data":{"Titulo":"EvtLote-Edit", "Fin":"2036-03-01T12:00:00Z"}},
+        ],
+        "continueOnError": True,
+    }
+    commits = []
+    escuchar = lambda _conn: commits.append(1)  # noqa: E731
+    event.listen(ObtenerEngine(), "commit", escuchar)
+    try:
+        r = client.post("/sync/eventos", json=body, headers=h)
+    finally:
+        event.remove(ObtenerEngine(), "commit", escuchar)
+    assert r.status_code == 200, r.text
+    res = r.json()
+    assert [x["ok"] for x in res["results"]] == [True, False, True]
+    assert "-2" not in res["mappings"]
+    # Un solo COMMIT para escribir el lote completo
+    assert len(commits) == 1
+    r_get = client.get(f"/eventos/{res['mappings']['-1']}", headers=h)
+    assert r_get.status_code == 200
+    assert r_get.json()["Titulo"] == "EvtLote-Edit"
+    assert r_get.json()["Fin"].startswith("2036-03-01T12:00:00")
+
+
+def test_sync_cambios_desde_cursor():
+    h = auth_headers()
+    cursor = client.get("/sync/estado", headers=h).json()["cursor"]
+    r_meta = client.post("/metas", json={"PropietarioId":1, "Titulo":"MDelta", "TipoMeta":"Individual"}, headers=h)
+    meta_id = r_meta.json()["Id"]
+    evt = {"MetaId": meta_id, "PropietarioId": r_meta.json()["PropietarioId"], "Titulo": "EvDelta", "Inicio": "2037-01-01T10:00:00", "Fin": "2037-01-01T11:00:00"}
+    ev_id = client.post("/eventos", json=evt, headers=h).json()["Id"]
+    assert client.patch(f"/eventos/{ev_id}", json={"Titulo": "EvDelta2"}, headers=h).status_code == 200
+
+    assert client.get(f"/sync/estado?desde={cursor}", headers=h).json()["pending"] >= 3
+    r = client.get(f"/sync/cambios?desde={cursor}&limite=1", headers=h)
+    assert r.status_code == 200
+    pagina = r.json()
+    assert pagina["hayMas"] is True
+    assert [(c["TipoEntidad"], c["EntidadId"]) for c in pagina["cambios"]] == [("Meta", meta_id)]
+
+    r = client.get(f"/sync/cambios?desde={pagina['cursor']}", headers=h)
+    eventos = [c for c in r.json()["cambios"] if c["TipoEntidad"] == "Evento" and c["EntidadId"] == ev_id]
+    # Un solo registro por entidad (el ultimo cambio) con el estado actual
+    assert len(eventos) == 1
+    assert eventos[0]["Operacion"] == "actualizar"
+    assert eventos[0]["Entidad"]["Titulo"] == "EvDelta2"
+
+
+def test_compresion_de_respuestas_y_lotes_sync():
+    import gzip
+    import json
+    from app.core.Compresion import ElegirCodificacion
+
+    assert ElegirCodificacion("gzip;q=0.5, identity") == "gzip"
+    assert ElegirCodificacion("identity") is None
+    assert ElegirCodificacion("gzip;q=0") is None
+    h = auth_headers()
+    for i in range(20):
+        r_meta = client.post("/metas", json={"PropietarioId": 1, "Titulo": f"Relleno compresion {i}", "TipoMeta": "Individual"}, headers=h)
+        assert r_meta.status_code == 201
+    r_lista = client.get("/metas", headers={**h, "Accept-Encoding": "gzip"})
+    assert r_lista.status_code == 200
+    assert r_lista.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r_lista.headers["vary"]
+    r_plano = client.get("/metas", headers={**h, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in r_plano.headers
+    assert r_plano.json() == r_lista.json()
+
+    body = {"operations": [{"kind": "create", "tempId": -1, "data": {"Titulo": "Gz", "TipoMeta": "Individual"}}]}
+    r = client.post(
+        "/sync/metas",
+        content=gzip.compress(json.dumps(body).encode()),
+        headers={**h, "Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert r.status_code == 200, r.text
+    assert "-1" in r.json()["mappings"]
+    r_malo = client.post(
+        "/sync/metas",
+        content=b"no-es-gzip",
+        headers={**h, "Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert r_malo.status_code == 400
+
+
+def test_bomba_brotli_en_lote_sync_devuelve_413(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    from app.core.Compresion import _Descomprimir
+
+    monkeypatch.setenv("MYPLANU_SYNC_CUERPO_MAX", str(1024 * 1024))
+    bomba = brotli.compress(b"\0" * (64 * 1024 * 1024))
+    assert len(bomba) < 1024
+    h = auth_headers()
+    r = client.post(
+        "/sync/metas",
+        content=bomba,
+        headers={**h, "Content-Type": "application/json", "Content-Encoding": "br"},
+    )
+    assert r.status_code == 413
+    # Cuerpo valido y cuerpo truncado
+    cuerpo = b'{"operations": []}' * 100
+    assert _Descomprimir(brotli.compress(cuerpo), "br", 1024 * 1024) == cuerpo
+    with pytest.raises(ValueError):
+        _Descomprimir(brotli.compress(cuerpo)[:-4], "br", 1024 * 1024)
+
+
+def _usuario_nuevo(prefijo):
+    import uuid
+
+    correo = f"{prefijo}-{uuid.uuid4().hex[:8]}@example.com"
+    token = client.post("/auth/registro", json={"Correo": correo, "Nombre": prefijo, "Contrasena": "x"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    usuario = next(u for u in client.get("/usuarios", headers=headers).json() if u["Correo"] == correo)
+    return usuario["Id"], headers
+
+
+def test_sync_cambios_revoca_lo_que_el_usuario_deja_de_ver():
+    dueno_id, h_dueno = _usuario_nuevo("revoca-dueno")
+    invitado_id, h_invitado = _usuario_nuevo("revoca-invitado")
+    meta_id = client.post("/metas", json={"PropietarioId": dueno_id, "Titulo": "MRevoca", "TipoMeta": "Individual"}, headers=h_dueno).json()["Id"]
+    evt = {"MetaId": meta_id, "PropietarioId": dueno_id, "Titulo": "EvRevoca", "Inicio": "2037-02-01T10:00:00", "Fin": "2037-02-01T11:00:00"}
+    ev_id = client.post("/eventos", json=evt, headers=h_dueno).json()["Id"]
+    rec_id = client.post("/recordatorios", json={"EventoId": ev_id, "FechaHora": "2037-02-01T09:00:00", "Canal": "Local"}, headers=h_dueno).json()["Id"]
+    r_part = client.post(f"/eventos/{ev_id}/participantes?UsuarioId={invitado_id}&Rol=Lector", headers=h_dueno)
+    assert r_part.status_code == 200, r_part.text
+    cursor = client.get("/sync/estado", headers=h_invitado).json()["cursor"]
+
+    assert client.delete(f"/participantes/{r_part.json()['Id']}", headers=h_dueno).status_code == 200
+    cambios = client.get(f"/sync/cambios?desde={cursor}", headers=h_invitado).json()["cambios"]
+    revocados = {(c["TipoEntidad"], c["EntidadId"]) for c in cambios if c["Operacion"] == "revocar"}
+    assert revocados == {("Evento", ev_id), ("Recordatorio", rec_id), ("Meta", meta_id)}
+    assert all(c["Entidad"] is None for c in cambios if c["Operacion"] == "revocar")
+    # Las revocaciones son solo del usuario afectado
+    cambios_dueno = client.get(f"/sync/cambios?desde={cursor}", headers=h_dueno).json()["cambios"]
+    assert [c["Operacion"] for c in cambios_dueno if (c["TipoEntidad"], c["EntidadId"]) == ("Evento", ev_id)] == ["actualizar"]
+    assert not any(c["Operacion"] == "revocar" for c in cambios_dueno)
+
+
+def test_sync_cambios_no_salta_huecos_recientes_del_log():
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from sqlmodel import Session
+    from app.core.Database import ObtenerEngine
+    from app.models.CambioSync import CambioSync
+    from app.services.CambiosService import CambiosService
+
+    servicio = CambiosService()
+    with Session(ObtenerEngine()) as sesion:
+        ultimo = servicio.UltimoCursor(sesion)
+        # ultimo + 1 lo tiene reservado una transaccion que aun no confirma
+        sesion.add(CambioSync(Id=ultimo + 2, TipoEntidad="Meta", EntidadId=0, Operacion="actualizar", RegistradoEn=datetime.utcnow()))
+        sesion.commit()
+        assert servicio.Listar(sesion, ultimo, 100, UsuarioId=1) == ([], ultimo, True)
+        # Pasado el margen el hueco es una transaccion deshecha y el cursor lo cruza
+        sesion.execute(update(CambioSync).where(CambioSync.Id == ultimo + 2).values(RegistradoEn=datetime.utcnow() - timedelta(hours=1)))
+        sesion.commit()
+        assert servicio.Listar(sesion, ultimo, 100, UsuarioId=1) == ([], ultimo + 2, False)
@@ -0,0 +1,38 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[3]
+sys.path.append(str(BASE_DIR / 'apps' / 'api'))
+
+from zoneinfo import ZoneInfo
+
+from app.core.ZonasHorarias import AUtcNaive, ObtenerConvertidor
+
+
+def test_convertidor_equivale_a_astimezone_incluso_en_cambios_de_horario():
+    for zona in ("America/Managua", "America/New_York", "Europe/Madrid", "Australia/Lord_Howe", "Asia/Kolkata"):
+        conv = ObtenerConvertidor(zona)
+        tz = ZoneInfo(zona)
+        # Recorre las transiciones de marzo/abril y octubre/noviembre en pasos de 7 minutos
+        for inicio in (datetime(2031, 3, 5), datetime(2031, 10, 1)):
+            for paso in range(0, 60 * 24 * 40, 7):
+                fecha = inicio + timedelta(minutes=paso, microseconds=paso)
+                esperado = fecha.replace(tzinfo=timezone.utc).astimezone(tz).isoformat()
+                assert conv.Iso(fecha) == esperado, (zona, fecha)
+
+
+def test_zona_invalida_usa_utc_y_se_comparte():
+    assert ObtenerConvertidor("No/Existe") is ObtenerConvertidor(None)
+    assert ObtenerConvertidor("America/Managua") is ObtenerConvertidor("America/Managua")
+    filas = ObtenerConvertidor(None).ConvertirFilas(
+        [{"Inicio": datetime(2031, 1, 1, 8), "Fin": None, "Titulo": "x"}], ("Inicio", "Fin")
+    )
+    assert filas == [{"Inicio": "2031-01-01T08:00:00+00:00", "Fin": None, "Titulo": "x"}]
+
+
+def test_entrada_a_utc_naive():
+    assert AUtcNaive("2031-01-01T08:00:00Z") == datetime(2031, 1, 1, 8)
+    assert AUtcNaive(datetime(2031, 1, 1, 2), "America/Managua") == datetime(2031, 1, 1, 8)
+    assert AUtcNaive(datetime(2031, 1, 1, 2), None, "America/Managua") == datetime(2031, 1, 1, 8)
+    assert AUtcNaive(datetime(2031, 1, 1, 2), "No/Existe") == datetime(2031, 1, 1, 2)